@@ -0,0 +1,52 @@
+"""Router dispatch benchmark.
+
+Run from the repository root:  python -m benchmarks.bench_routing
+"""
+import re
+import timeit
+
+from src.webserver.routing import Router
+
+
+def _handler(_path, _params):
+    return b'', 'text/plain'
+
+
+def build(n: int) -> Router:
+    router = Router(builtin=False)
+    for i in range(n):
+        router.register(f'/api/v1/resource{i}/{{id:int}}', _handler)
+        router.register(f'/api/v1/resource{i}/{{id:int}}/items/{{name}}', _handler)
+    return router
+
+
+def build_linear(n: int):
+    # Baseline: one compiled regex per route, scanned in order.
+    routes = []
+    for i in range(n):
+        routes.append(re.compile(rf'^/api/v1/resource{i}/(?P<id>\d+)$'))
+        routes.append(re.compile(rf'^/api/v1/resource{i}/(?P<id>\d+)/items/(?P<name>[^/]+)$'))
+
+    def dispatch(path):
+        for pattern in routes:
+            m = pattern.match(path)
+            if m:
+                return m.groupdict()
+        raise KeyError(path)
+    return dispatch
+
+
+def main():
+    number = 20000
+    print(f"{'routes':>8} {'trie us/op':>12} {'linear us/op':>14}")
+    for n in (10, 100, 1000):
+        router = build(n)
+        linear = build_linear(n)
+        path = f'/api/v1/resource{n - 1}/1234/items/widget'
+        trie = timeit.timeit(lambda: router.dispatch(path), number=number) / number * 1e6
+        scan = timeit.timeit(lambda: linear(path), number=number // 10) / (number // 10) * 1e6
+        print(f"{2 * n:>8} {trie:>12.2f} {scan:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from . import autoindex
+from .handlers import HTTPError
+from .routing import router as main_router
+from .tracing import _require_local
+from .utils import LOG_LEVELS, get_log_level, log, safe_path, set_log_level
+
+# Runtime-tunable ServerConfig fields: name -> (type, minimum). Read on every
+# request or connection, so a new value applies from the next one on.
+TIMEOUTS: Dict[str, Tuple[type, float]] = {
+    'timeout': (float, 0.001),
+    'header_timeout': (float, 0.001),
+    'body_timeout': (float, 0.001),
+    'idle_timeout': (float, 0.001),
+    'send_grace': (float, 0.0),
+    'min_send_rate': (float, 0.0),
+    'max_conn_requests': (int, 0),
+    'max_body_size': (int, 0),
+}
+CACHE_LIMITS = {'cache_max_entries': 'capacity', 'cache_max_file_size': 'max_size', 'cache_max_bytes': 'max_bytes'}
+
+
+def _json(body: Any) -> Tuple[bytes, str]:
+    return json.dumps(body).encode('utf-8'), 'application/json'
+
+
+def _read_json(request) -> Dict[str, Any]:
+    raw = request.body.read() if request.body is not None else b''
+    if not raw:
+        return {}
+    try:
+        body = json.loads(raw)
+    except ValueError as e:
+        raise HTTPError(400, f'Invalid JSON: {e}')
+    if not isinstance(body, dict):
+        raise HTTPError(400, 'Expected a JSON object')
+    return body
+
+
+def _number(name: str, value: Any, kind: type, minimum: float):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind is int and value != int(value)):
+        raise HTTPError(400, f'{name} must be {"an integer" if kind is int else "a number"}')
+    if value < minimum:
+        raise HTTPError(400, f'{name} must be >= {minimum}')
+    return kind(value)
+
+
+class RuntimeControl:
+    """Inspect and change a running server's settings without a restart.
+
+    Works on the live :class:`ServerContext`: the worker pool is resized and
+    caches shrink or grow in place, so warm entries that still fit survive a
+    change.
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def caches(self) -> List[Tuple[str, Any, str]]:
+        """(site name, cache, root) for the main cache and every virtual host with its own."""
+        ctx = self.ctx
+        result = [('default', ctx.cache, ctx.config.root)]
+        for site in ctx.sites.sites() if ctx.sites is not None else []:
+            if site.cache is not ctx.cache:
+                result.append((site.name, site.cache, site.root))
+        return result
+
+    def settings(self) -> Dict[str, Any]:
+        config, cache = self.ctx.config, self.ctx.cache
+        values: Dict[str, Any] = {name: getattr(config, name) for name in TIMEOUTS}
+        values.update({name: getattr(cache, attr) for name, attr in CACHE_LIMITS.items()})
+        values['vhost_cache_bytes'] = config.vhost_cache_bytes
+        values['workers'] = self.ctx.workers.size if self.ctx.workers is not None else config.workers
+        values['log_level'] = get_log_level()
+        return values
+
+    def update(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate every change first, then apply them all."""
+        apply: List[Callable[[], None]] = []
+        config, cache = self.ctx.config, self.ctx.cache
+        for name, value in changes.items():
+            if name in TIMEOUTS:
+                value = _number(name, value, *TIMEOUTS[name])
+                apply.append(lambda name=name, value=value: setattr(config, name, value))
+            elif name in CACHE_LIMITS:
+                value = _number(name, value, int, 1 if name == 'cache_max_entries' else 0)
+                attr = CACHE_LIMITS[name]
+                apply.append(lambda attr=attr, value=value: cache.resize(**{attr: value}))
+                if hasattr(config, name):
+                    apply.append(lambda name=name, value=value: setattr(config, name, value))
+            elif name == 'vhost_cache_bytes':
+                value = _number(name, value, int, 0)
+                for _site, site_cache, _root in self.caches()[1:]:
+                    apply.append(lambda c=site_cache, value=value: c.resize(max_bytes=value))
+                apply.append(lambda value=value: setattr(config, 'vhost_cache_bytes', value))
+            elif name == 'workers':
+                value = _number(name, value, int, 1)
+                if self.ctx.workers is not None:
+                    apply.append(lambda value=value: self.ctx.workers.resize(value))
+                apply.append(lambda value=value: setattr(config, 'workers', value))
+            elif name == 'log_level':
+                if not isinstance(value, str) or value.upper() not in LOG_LEVELS:
+                    raise HTTPError(400, f'log_level must be one of {", ".join(LOG_LEVELS)}')
+                apply.append(lambda value=value: set_log_level(value))
+            else:
+                raise HTTPError(400, f'Unknown setting {name!r}')
+        for fn in apply:
+            fn()
+        if changes:
+            log('INFO', f"Runtime settings changed: {changes}")
+        return self.settings()
+
+    def cache_stats(self) -> List[Dict[str, Any]]:
+        return [{'site': name, 'root': root, 'entries': len(cache), 'bytes': cache.size_bytes,
+                 'max_entries': cache.capacity, 'max_bytes': cache.max_bytes, 'max_file_size': cache.max_size,
+                 'hits': cache.hits, 'misses': cache.misses} for name, cache, root in self.caches()]
+
+    def _select(self, site: Any) -> List[Tuple[str, Any, str]]:
+        caches = self.caches()
+        if site is None:
+            return caches
+        chosen = [entry for entry in caches if entry[0] == site]
+        if not chosen:
+            raise HTTPError(404, f'Unknown site {site!r}')
+        return chosen
+
+    @staticmethod
+    def _paths(body: Dict[str, Any]) -> List[str]:
+        paths = body.get('paths', [])
+        if not isinstance(paths, list) or not all(isinstance(p, str) and p.startswith('/') for p in paths):
+            raise HTTPError(400, 'paths must be a list of URL paths starting with /')
+        return paths
+
+    def purge(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop the given URL paths (directories drop everything below them), or every cached entry."""
+        paths = self._paths(body)
+        purged = 0
+        for _name, cache, root in self._select(body.get('site')):
+            if not paths:
+                purged += len(cache)
+                cache.clear()
+                continue
+            for path in paths:
+                key = os.path.abspath(safe_path(root, path))
+                prefix = key.rstrip('/') + '/'
+                for cached in cache.keys():
+                    name = os.path.abspath(cached.partition('\0')[0])  # hashed assets are keyed path\0digest
+                    if name == key or name.startswith(prefix):
+                        purged += cache.delete(cached)
+        if not paths and body.get('site') is None:
+            main_router.response_cache.clear()
+            autoindex.listings.clear()
+        return {'purged': purged}
+
+    def _assets(self, name: str):
+        if name == 'default':
+            return self.ctx.assets
+        return next((site.assets for site in self.ctx.sites.sites() if site.name == name), None)
+
+    def preload(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Read files (directories recursively) into the cache ahead of the first request."""
+        paths = self._paths(body) or ['/']
+        loaded = skipped = 0
+        for name, cache, root in self._select(body.get('site')):
+            assets = self._assets(name)
+            for path in paths:
+                # Keys match the static handler's: str(Path(safe_path(root, url_path))), or the asset's cache key.
+                start = Path(safe_path(root, path)) if path != '/' else Path(root)
+                files = [start] if start.is_file() else sorted(p for p in start.rglob('*') if p.is_file())
+                for p in files:
+                    key = str(p)
+                    if assets is not None:
+                        asset = assets.lookup(os.path.relpath(os.path.abspath(p), assets.root).replace(os.sep, '/'))
+                        key = assets.cache_key(asset) if asset is not None else key
+                    try:
+                        stored = p.stat().st_size <= cache.max_size and cache.put(key, p.read_bytes())
+                    except OSError:
+                        stored = False
+                    loaded += stored
+                    skipped += not stored
+        return {'loaded': loaded, 'skipped': skipped}
+
+
+def register_control_routes(router, control: RuntimeControl):
+    """Settings and cache endpoints; only for the separate admin listener, never the public port."""
+    def get_settings(_path, _params, request):
+        _require_local(request)
+        return _json(control.settings())
+
+    def put_settings(_path, _params, request):
+        _require_local(request)
+        return _json(control.update(_read_json(request)))
+
+    def caches(_path, _params, request):
+        _require_local(request)
+        return _json(control.cache_stats())
+
+    def purge(_path, _params, request):
+        _require_local(request)
+        return _json(control.purge(_read_json(request)))
+
+    def preload(_path, _params, request):
+        _require_local(request)
+        return _json(control.preload(_read_json(request)))
+
+    router.register('/settings', get_settings, pass_request=True)
+    router.register('/settings', put_settings, methods=['POST', 'PUT'], pass_request=True)
+    router.register('/cache', caches, pass_request=True)
+    router.register('/cache/purge', purge, methods=['POST'], pass_request=True)
+    router.register('/cache/preload', preload, methods=['POST'], pass_request=True)
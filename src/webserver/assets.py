@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import posixpath
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from .utils import log
+from .workers import WorkerPool
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+READ_CHUNK = 1024 * 1024
+
+
+@dataclass
+class Asset:
+    logical: str  # path relative to the root, '/'-separated
+    hashed: str  # same path with the digest before the extension
+    digest: str
+    size: int
+    mtime_ns: int
+
+
+def hashed_name(logical: str, digest: str) -> str:
+    """``js/app.min.js`` -> ``js/app.min.<digest>.js``; names without an extension get ``.<digest>`` appended."""
+    head, name = posixpath.split(logical)
+    stem, _, ext = name.rpartition('.')
+    name = f'{stem}.{digest}.{ext}' if stem else f'{name}.{digest}'
+    return posixpath.join(head, name) if head else name
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(READ_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class AssetHasher:
+    """Content hashes of the files under ``root``, for immutable hashed URLs.
+
+    A scanner thread walks the tree every ``interval`` seconds and hands only
+    new or changed files (by size and mtime) to a worker pool for hashing. An
+    asset is served under its hashed name only while the file on disk still
+    matches what was hashed, so a hashed URL never returns other content.
+    """
+
+    def __init__(self, root: str, workers: int = 2, interval: float = 5.0, digest_len: int = 8):
+        self.root = os.path.abspath(root)
+        self.interval = interval
+        self.digest_len = digest_len
+        self._pool = WorkerPool(workers, 'asset-hash')
+        self._lock = threading.Condition()
+        self._assets: Dict[str, Asset] = {}  # logical -> asset
+        self._by_hashed: Dict[str, str] = {}  # hashed -> logical
+        self._pending: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.version = 0  # bumped on every manifest change
+        self.hashed_files = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='asset-scan', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.scan()
+            except OSError as e:
+                log('ERROR', f"Asset scan of {self.root} failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def _walk(self):
+        stack = [('', self.root)]
+        while stack:
+            prefix, directory = stack.pop()
+            try:
+                it = os.scandir(directory)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    logical = prefix + entry.name
+                    try:
+                        if entry.is_dir():
+                            stack.append((logical + '/', entry.path))
+                        elif entry.is_file():
+                            st = entry.stat()
+                            yield logical, st.st_size, st.st_mtime_ns
+                    except OSError:
+                        continue
+
+    def scan(self) -> int:
+        """One pass over the tree: queue changed files for hashing and forget deleted ones."""
+        seen = set()
+        queued = 0
+        for logical, size, mtime_ns in self._walk():
+            seen.add(logical)
+            with self._lock:
+                asset = self._assets.get(logical)
+                if (asset is not None and (asset.size, asset.mtime_ns) == (size, mtime_ns)) or logical in self._pending:
+                    continue
+                self._pending.add(logical)
+            queued += 1
+            self._pool.submit(self._hash, logical, size, mtime_ns)
+        with self._lock:
+            for logical in [name for name in self._assets if name not in seen]:
+                self._forget(logical)
+        return queued
+
+    def _hash(self, logical: str, size: int, mtime_ns: int):
+        path = os.path.join(self.root, logical)
+        try:
+            digest = file_digest(path)[:self.digest_len]
+            st = os.stat(path)
+        except OSError:
+            digest, st = None, None
+        with self._lock:
+            self._pending.discard(logical)
+            # Changed again while hashing: the next scan picks it up.
+            if digest is not None and (st.st_size, st.st_mtime_ns) == (size, mtime_ns):
+                self._forget(logical)
+                asset = Asset(logical, hashed_name(logical, digest), digest, size, mtime_ns)
+                self._assets[logical] = asset
+                self._by_hashed[asset.hashed] = logical
+                self.hashed_files += 1
+                self.version += 1
+            self._lock.notify_all()
+
+    def _forget(self, logical: str):
+        asset = self._assets.pop(logical, None)
+        if asset is not None:
+            self._by_hashed.pop(asset.hashed, None)
+            self.version += 1
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Wait until every queued file is hashed."""
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._pending, timeout)
+
+    def _current(self, asset: Optional[Asset]) -> Optional[Asset]:
+        if asset is None:
+            return None
+        try:
+            st = os.stat(os.path.join(self.root, asset.logical))
+        except OSError:
+            return None
+        return asset if (st.st_size, st.st_mtime_ns) == (asset.size, asset.mtime_ns) else None
+
+    def resolve(self, hashed: str) -> Optional[Asset]:
+        """The asset served at hashed path ``hashed``, if the file still has that content."""
+        logical = self._by_hashed.get(hashed)
+        return self._current(self._assets.get(logical)) if logical is not None else None
+
+    def lookup(self, logical: str) -> Optional[Asset]:
+        """The current asset for logical path ``logical`` (None until hashed, or when stale)."""
+        return self._current(self._assets.get(logical))
+
+    def cache_key(self, asset: Asset) -> str:
+        """Static cache key of this asset's content: a new digest never hits bytes cached under the old one."""
+        return f'{os.path.join(self.root, asset.logical)}\0{asset.digest}'
+
+    def url_for(self, logical: str) -> str:
+        """Hashed URL of ``logical`` once known, else the plain one."""
+        logical = logical.lstrip('/')
+        asset = self._assets.get(logical)
+        return '/' + (asset.hashed if asset is not None else logical)
+
+    def manifest(self) -> Dict[str, str]:
+        with self._lock:
+            return {logical: asset.hashed for logical, asset in sorted(self._assets.items())}
+
+    def manifest_json(self) -> Tuple[bytes, str]:
+        """Manifest body and its ETag."""
+        with self._lock:
+            version = self.version
+        return json.dumps(self.manifest(), indent=1).encode('utf-8'), f'"m{version:x}"'
@@ -0,0 +1,151 @@
+import html
+import json
+import os
+import threading
+import urllib.parse
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Iterator, List, Optional, Tuple
+
+ROWS_PER_CHUNK = 256  # rows joined into one streamed piece
+
+# (name, is_dir, size, mtime)
+Entry = Tuple[str, bool, int, float]
+
+
+class Listing:
+    """One scan of a directory, valid while its mtime is unchanged.
+
+    Rows are rendered at most once per format and reused by every page and
+    every later hit.
+    """
+
+    def __init__(self, path: str, mtime_ns: int, entries: List[Entry]):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.entries = entries
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def etag(self, fmt: str) -> str:
+        return f'"{self.mtime_ns:x}-{len(self.entries)}-{fmt}"'
+
+    def rows(self, fmt: str) -> List[bytes]:
+        rows = self._rows.get(fmt)
+        if rows is None:
+            with self._lock:
+                rows = self._rows.get(fmt)
+                if rows is None:
+                    render = _json_row if fmt == 'json' else _html_row
+                    rows = self._rows[fmt] = [render(entry) for entry in self.entries]
+        return rows
+
+
+def _html_row(entry: Entry) -> bytes:
+    name, is_dir, size, mtime = entry
+    label = name + '/' if is_dir else name
+    href = urllib.parse.quote(label)
+    return (f'<tr><td><a href="{href}">{html.escape(label)}</a></td>'
+            f'<td>{"-" if is_dir else size}</td><td>{formatdate(mtime, usegmt=True)}</td></tr>\n').encode('utf-8')
+
+
+def _json_row(entry: Entry) -> bytes:
+    name, is_dir, size, mtime = entry
+    return json.dumps({'name': name, 'type': 'directory' if is_dir else 'file', 'size': None if is_dir else size,
+                       'mtime': int(mtime)}).encode('utf-8')
+
+
+def scan(path: str) -> List[Entry]:
+    """Directories first, then files, case-insensitively by name. Dotfiles are left out."""
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                is_dir = entry.is_dir()
+                st = entry.stat()
+            except OSError:  # vanished, or a dangling symlink
+                continue
+            entries.append((entry.name, is_dir, 0 if is_dir else st.st_size, st.st_mtime))
+    entries.sort(key=lambda e: (not e[1], e[0].casefold(), e[0]))
+    return entries
+
+
+class DirectoryIndex:
+    """Directory listings kept across requests, revalidated with one ``stat`` per hit.
+
+    A directory is rescanned only when its mtime changes, which happens when
+    entries are added, removed or renamed. Sizes of files rewritten in place
+    stay as scanned until then. At most ``capacity`` directories are kept,
+    least recently used first out.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self._listings: 'OrderedDict[str, Listing]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.scans = 0
+
+    def get(self, path: str) -> Listing:
+        mtime_ns = os.stat(path).st_mtime_ns
+        with self._lock:
+            listing = self._listings.get(path)
+            if listing is not None and listing.mtime_ns == mtime_ns:
+                self._listings.move_to_end(path)
+                return listing
+        listing = Listing(path, mtime_ns, scan(path))
+        with self._lock:
+            self.scans += 1
+            self._listings[path] = listing
+            self._listings.move_to_end(path)
+            while len(self._listings) > self.capacity:
+                self._listings.popitem(last=False)
+        return listing
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
+
+listings = DirectoryIndex()
+
+
+def page_bounds(total: int, page: int, page_size: int) -> Tuple[int, int, int]:
+    """(page, pages, first index) with ``page`` clamped to the existing pages."""
+    pages = max(1, -(-total // page_size))
+    page = min(max(page, 1), pages)
+    return page, pages, (page - 1) * page_size
+
+
+def render(listing: Listing, url_path: str, fmt: str, page: int, page_size: int) -> Iterator[bytes]:
+    """Stream one page of a listing as HTML or JSON."""
+    page, pages, start = page_bounds(len(listing.entries), page, page_size)
+    rows = listing.rows(fmt)[start:start + page_size]
+    if fmt == 'json':
+        yield (f'{{"path": {json.dumps(url_path)}, "page": {page}, "pages": {pages}, '
+               f'"total": {len(listing.entries)}, "entries": [').encode('utf-8')
+        for i in range(0, len(rows), ROWS_PER_CHUNK):
+            yield (b',' if i else b'') + b','.join(rows[i:i + ROWS_PER_CHUNK])
+        yield b']}'
+        return
+    title = html.escape(f'Index of {url_path}')
+    yield (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{title}</title></head>\n'
+           f'<body><h1>{title}</h1>\n<table>\n<tr><th>Name</th><th>Size</th><th>Modified</th></tr>\n'
+           + ('<tr><td><a href="../">../</a></td><td></td><td></td></tr>\n' if url_path != '/' else '')).encode('utf-8')
+    for i in range(0, len(rows), ROWS_PER_CHUNK):
+        yield b''.join(rows[i:i + ROWS_PER_CHUNK])
+    nav = [f'Page {page} of {pages} ({len(listing.entries)} entries)']
+    if page > 1:
+        nav.insert(0, f'<a href="?page={page - 1}">previous</a>')
+    if page < pages:
+        nav.append(f'<a href="?page={page + 1}">next</a>')
+    yield f'</table>\n<p>{" | ".join(nav)}</p>\n</body></html>\n'.encode('utf-8')
+
+
+def wants_json(params: dict, accept: Optional[str]) -> bool:
+    fmt = params.get('format')
+    if fmt:
+        return fmt == 'json'
+    accept = (accept or '').lower()
+    return 'application/json' in accept and 'text/html' not in accept
@@ -0,0 +1,471 @@
+"""Load-generation benchmark for PyNetLite.
+
+Launches the server in a subprocess against a generated fixture root, drives
+it with an asyncio load generator and prints throughput plus latency
+percentiles per scenario as JSON::
+
+    python -m src.webserver.bench --duration 5 --concurrency 32 --output bench.json
+    python -m src.webserver.bench --baseline bench.json --tolerance 0.15
+
+With ``--baseline`` the exit status is 1 when any scenario's throughput drops,
+or its p99 latency grows, by more than ``--tolerance``.
+
+``--http2`` enables HTTP/2 on the server and adds page-load scenarios. Each
+fetches one page's worth of assets: over six HTTP/1.1 connections, like a
+browser, or multiplexed on a single HTTP/2 connection (needs the ``h2``
+package).
+
+``--tls`` serves over HTTPS with a throwaway self-signed certificate (needs the
+``openssl`` binary). It also adds two handshake scenarios: full handshakes,
+and handshakes that resume a saved session.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import h2.connection
+    import h2.events
+except ImportError:  # only needed for the HTTP/2 page-load scenario
+    h2 = None
+
+MISS_FILES = 128  # more than the default cache_max_entries, so round-robin always misses
+PAGE_ASSETS = 48
+BROWSER_CONNECTIONS = 6  # parallel HTTP/1.1 connections a browser opens per origin
+
+
+@dataclass
+class Scenario:
+    name: str
+    paths: Sequence[str]
+    keep_alive: bool = True
+
+
+@dataclass
+class Target:
+    host: str
+    port: int
+    tls: Optional[ssl.SSLContext] = None
+    unix: Optional[str] = None  # connect to this Unix socket instead of host:port
+
+
+def open_stream(target: Target, tls: Optional[ssl.SSLContext] = None):
+    if target.unix:
+        return asyncio.open_unix_connection(target.unix, ssl=tls, server_hostname=target.host if tls else None)
+    return asyncio.open_connection(target.host, target.port, ssl=tls)
+
+
+def build_fixtures(root: Path):
+    root.mkdir(parents=True, exist_ok=True)
+    (root / 'index.html').write_bytes(b'<html><body>bench</body></html>')
+    (root / 'small.txt').write_bytes(b'x' * 1024)
+    (root / 'large.bin').write_bytes(os.urandom(1024 * 1024))
+    miss = root / 'miss'
+    miss.mkdir(exist_ok=True)
+    for i in range(MISS_FILES):
+        (miss / f'{i}.txt').write_bytes(b'm' * 2048)
+    assets = root / 'assets'
+    assets.mkdir(exist_ok=True)
+    for i in range(PAGE_ASSETS):
+        (assets / f'{i}.css').write_bytes(b'a' * (4096 + 512 * i))
+
+
+def default_scenarios() -> List[Scenario]:
+    mix: List[str] = []
+    for i in range(MISS_FILES):
+        mix.extend(['/small.txt'] * 9 + [f'/miss/{i}.txt'])
+    return [
+        Scenario('static-small-keepalive', ['/small.txt']),
+        Scenario('static-small-fresh', ['/small.txt'], keep_alive=False),
+        Scenario('static-large-keepalive', ['/large.bin']),
+        Scenario('cache-mix-90-10', mix),
+        Scenario('cache-miss', [f'/miss/{i}.txt' for i in range(MISS_FILES)]),
+        Scenario('api-time', ['/api/time']),
+        Scenario('api-echo', ['/api/echo?msg=bench']),
+        Scenario('api-fresh', ['/api/time'], keep_alive=False),
+    ]
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bool]:
+    """Read one response; returns (status, server_closed)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('iso-8859-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';', 1)[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, True
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def _worker(target: Target, scenario: Scenario, deadline: float, offset: int, step: int,
+                  latencies: List[float], errors: List[int]):
+    conn: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+    connection = 'keep-alive' if scenario.keep_alive else 'close'
+    i = offset
+    while time.perf_counter() < deadline:
+        path = scenario.paths[i % len(scenario.paths)]
+        i += step
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = await open_stream(target, target.tls)
+            reader, writer = conn
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {target.host}\r\nConnection: {connection}\r\n\r\n".encode())
+            status, closed = await _read_response(reader)
+            if 200 <= status < 400:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[0] += 1
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            errors[0] += 1
+            closed = True
+        if closed or not scenario.keep_alive:
+            if conn is not None:
+                conn[1].close()
+            conn = None
+    if conn is not None:
+        conn[1].close()
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(target: Target, scenario: Scenario, duration: float, concurrency: int,
+                       warmup: float = 0.5) -> Dict[str, float]:
+    if warmup:
+        await asyncio.gather(*(_worker(target, scenario, time.perf_counter() + warmup, n, concurrency, [], [0])
+                               for n in range(concurrency)))
+    latencies: List[float] = []
+    errors = [0]
+    start = time.perf_counter()
+    await asyncio.gather(*(_worker(target, scenario, start + duration, n, concurrency, latencies, errors)
+                           for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def _page_http1(target: Target, paths: Sequence[str]):
+    queue = list(paths)
+
+    async def fetch():
+        reader, writer = await open_stream(target, target.tls)
+        try:
+            while queue:
+                path = queue.pop()
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: {target.host}\r\n\r\n".encode())
+                status, _closed = await _read_response(reader)
+                if status != 200:
+                    raise ValueError(f'{path}: status {status}')
+        finally:
+            writer.close()
+    await asyncio.gather(*(fetch() for _ in range(BROWSER_CONNECTIONS)))
+
+
+async def _page_http2(target: Target, paths: Sequence[str]):
+    tls = None
+    if target.tls is not None:
+        tls = client_context()
+        tls.set_alpn_protocols(['h2'])
+    reader, writer = await open_stream(target, tls)
+    try:
+        conn = h2.connection.H2Connection()
+        conn.initiate_connection()
+        pending = set()
+        for path in paths:
+            stream_id = conn.get_next_available_stream_id()
+            conn.send_headers(stream_id, [(':method', 'GET'), (':path', path), (':authority', target.host),
+                                          (':scheme', 'https' if tls else 'http')], end_stream=True)
+            pending.add(stream_id)
+        writer.write(conn.data_to_send())
+        while pending:
+            data = await reader.read(65536)
+            if not data:
+                raise ConnectionError('Server closed the HTTP/2 connection')
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.ResponseReceived):
+                    status = dict(event.headers)[b':status']
+                    if status != b'200':
+                        raise ValueError(f'stream {event.stream_id}: status {status.decode()}')
+                elif isinstance(event, h2.events.DataReceived):
+                    conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    pending.discard(event.stream_id)
+                elif isinstance(event, h2.events.StreamReset):
+                    raise ConnectionError(f'stream {event.stream_id} reset')
+            writer.write(conn.data_to_send())
+    finally:
+        writer.close()
+
+
+async def run_page_loads(target: Target, duration: float, http2: bool = False) -> Dict[str, float]:
+    """Load the asset page back to back for ``duration`` seconds; latencies are whole-page times."""
+    paths = [f'/assets/{i}.css' for i in range(PAGE_ASSETS)]
+    load = _page_http2 if http2 else _page_http1
+    latencies: List[float] = []
+    errors = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        begin = time.perf_counter()
+        try:
+            await load(target, paths)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'connections': 1 if http2 else BROWSER_CONNECTIONS,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, base in baseline.get('scenarios', {}).items():
+        now = current['scenarios'].get(name)
+        if now is None:
+            continue
+        if now['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: rps {now['rps']} < baseline {base['rps']}")
+        if base['p99_ms'] and now['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {now['p99_ms']}ms > baseline {base['p99_ms']}ms")
+    return regressions
+
+
+def make_certificate(directory: Path) -> Tuple[str, str]:
+    """Self-signed localhost certificate for TLS runs; returns (certfile, keyfile)."""
+    cert, key = directory / 'cert.pem', directory / 'key.pem'
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', str(key),
+                    '-out', str(cert), '-days', '1', '-subj', '/CN=localhost'],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return str(cert), str(key)
+
+
+def client_context() -> ssl.SSLContext:
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+def _handshake(target: Target, session: Optional[ssl.SSLSession] = None) -> Tuple[float, ssl.SSLSocket]:
+    raw = socket.create_connection((target.host, target.port), timeout=5)
+    start = time.perf_counter()
+    sock = target.tls.wrap_socket(raw, server_hostname=target.host, session=session)
+    return time.perf_counter() - start, sock
+
+
+def _fetch_session(target: Target) -> ssl.SSLSession:
+    _elapsed, sock = _handshake(target)
+    with sock:
+        # TLS 1.3 tickets arrive after the handshake, so read a response first.
+        sock.sendall(f"GET /small.txt HTTP/1.1\r\nHost: {target.host}\r\nConnection: close\r\n\r\n".encode())
+        while sock.recv(65536):
+            pass
+        return sock.session
+
+
+def run_handshakes(target: Target, count: int = 200, resume: bool = False) -> Dict[str, float]:
+    """Time ``count`` sequential handshakes, optionally offering a saved session each time."""
+    session = _fetch_session(target) if resume else None
+    latencies: List[float] = []
+    errors = resumed = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        try:
+            elapsed, sock = _handshake(target, session)
+        except OSError:
+            errors += 1
+            continue
+        latencies.append(elapsed)
+        resumed += sock.session_reused
+        sock.close()
+    total = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / total, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'resumed_ratio': round(resumed / max(1, len(latencies)), 3),
+    }
+
+
+def _free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(target: Target, proc: subprocess.Popen, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'Server exited with status {proc.returncode}')
+        try:
+            socket.create_connection((target.host, target.port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('Server did not start listening in time')
+
+
+def launch_server(root: Path, host: str, extra_args: Sequence[str] = (),
+                  unix: Optional[str] = None) -> Tuple[subprocess.Popen, Target]:
+    target = Target(host, _free_port(host))
+    if unix:
+        # Readiness is still checked over TCP; the load then goes to the Unix socket.
+        extra_args = [*extra_args, '--listen', f'{host}:{target.port}', '--listen', f'unix:{unix}']
+    # Run the server module from the same import root this module was loaded from.
+    import_root = Path(__file__).resolve().parents[__package__.count('.') + 1]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(import_root), os.environ.get('PYTHONPATH')])))
+    cmd = [sys.executable, '-m', f'{__package__}.server', '--host', host, '--port', str(target.port),
+           '--root', str(root), '--quiet', *extra_args]
+    # stderr goes to an unlinked temp file, not a pipe nobody drains during the run.
+    with tempfile.TemporaryFile() as log:
+        proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=log)
+        try:
+            _wait_ready(target, proc)
+        except RuntimeError as e:
+            proc.kill()
+            proc.wait()
+            log.seek(0)
+            tail = log.read().decode(errors='replace').strip().splitlines()[-20:]
+            raise RuntimeError('\n'.join([str(e), *tail])) from None
+    target.unix = unix
+    return proc, target
+
+
+def run(target: Target, scenarios: Sequence[Scenario], duration: float, concurrency: int,
+        http2: bool = False) -> Dict:
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = asyncio.run(run_scenario(target, scenario, duration, concurrency))
+        print(f"{scenario.name:<24} {results[scenario.name]}", file=sys.stderr)
+    if http2:
+        for name, multiplexed in (('page-load-http1', False), ('page-load-http2', True)):
+            results[name] = asyncio.run(run_page_loads(target, duration, multiplexed))
+            print(f"{name:<24} {results[name]}", file=sys.stderr)
+    if target.tls is not None:
+        for name, resume in (('tls-handshake-full', False), ('tls-handshake-resumed', True)):
+            results[name] = run_handshakes(target, resume=resume)
+            print(f"{name:<24} {results[name]}", file=sys.stderr)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'duration': duration,
+            'concurrency': concurrency,
+            'tls': target.tls is not None,
+            'http2': http2,
+            'unix': target.unix is not None,
+        },
+        'scenarios': results,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='PyNetLite load benchmark')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--target', help='host:port of an already running server serving the fixtures')
+    parser.add_argument('--root', help='fixture directory (default: a temporary directory)')
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per scenario')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--scenarios', help='comma-separated scenario names to run')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--baseline', help='compare against a stored results file')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    parser.add_argument('--http2', action='store_true', help="add HTTP/1.1 vs HTTP/2 page-load scenarios (needs 'h2')")
+    parser.add_argument('--unix', action='store_true',
+                        help='send the load over a Unix domain socket (the server also listens on --host)')
+    parser.add_argument('--tls', action='store_true', help='benchmark over HTTPS with a self-signed certificate')
+    args = parser.parse_args(argv)
+
+    if args.http2 and h2 is None:
+        parser.error("--http2 needs the optional 'h2' package")
+    scenarios = default_scenarios()
+    if args.scenarios:
+        wanted = set(args.scenarios.split(','))
+        scenarios = [s for s in scenarios if s.name in wanted]
+
+    proc = None
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.root or tmp)
+        build_fixtures(root)
+        if args.target:
+            host, _, port = args.target.rpartition(':')
+            target = Target(host, int(port))
+        else:
+            extra: List[str] = ['--http2'] if args.http2 else []
+            if args.tls:
+                cert, key = make_certificate(Path(tmp))
+                extra += ['--cert', cert, '--key', key]
+            proc, target = launch_server(root, args.host, extra, str(Path(tmp) / 'bench.sock') if args.unix else None)
+        if args.tls:
+            target.tls = client_context()
+        try:
+            report = run(target, scenarios, args.duration, args.concurrency, args.http2)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(5)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
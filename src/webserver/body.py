@@ -0,0 +1,138 @@
+import re
+import socket
+import tempfile
+import time
+from typing import BinaryIO, Callable, Iterator, Optional
+from .http import HTTPParseError
+from .stream import DeadlineExceeded, SocketReader
+
+CHUNK_LINE_MAX = 4096
+CHUNK_SIZE = re.compile(rb'[0-9A-Fa-f]+')  # int(x, 16) would also take '0x5', '+5' and '1_0'
+
+class BodyTooLarge(HTTPParseError):
+    pass
+
+
+class BodyTooSlow(DeadlineExceeded):
+    pass
+
+
+class RequestBody:
+    """Lazily read POST/PUT body, decoded from ``Content-Length`` or chunked framing.
+
+    Handlers can stream it (iterate over chunks), ``spool()`` it into a temporary
+    file that only moves to disk above ``spool_threshold`` bytes, or ``read()``
+    it whole for small payloads. The body can only be consumed once.
+
+    With ``min_rate``, the whole body must arrive within ``grace`` seconds
+    plus ``received / min_rate`` from the first read. A client trickling bytes
+    just inside the socket timeout is cut off instead of holding a worker.
+    """
+
+    def __init__(self, reader: SocketReader, length: Optional[int] = None, chunked: bool = False,
+                 max_size: int = 10 * 1024 * 1024, spool_threshold: int = 1024 * 1024,
+                 on_first_read: Optional[Callable[[], None]] = None, min_rate: float = 0.0, grace: float = 10.0):
+        self._reader = reader
+        self._remaining = length
+        self._chunked = chunked
+        self.max_size = max_size
+        self.spool_threshold = spool_threshold
+        self._on_first_read = on_first_read
+        self.min_rate = min_rate
+        self.grace = grace
+        self._started_at = 0.0
+        self.received = 0
+        self.complete = not chunked and not length
+        self._started = False
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._started:
+            raise RuntimeError('Request body already consumed')
+        self._started = True
+        if self.complete:
+            return
+        if self._on_first_read is not None:
+            self._on_first_read()
+        self._started_at = time.monotonic()
+        for chunk in self._chunks():
+            self.received += len(chunk)
+            if self.received > self.max_size:
+                raise BodyTooLarge('Request body too large')
+            yield chunk
+        self.complete = True
+
+    def _chunks(self) -> Iterator[bytes]:
+        return self._iter_chunked() if self._chunked else self._iter_length()
+
+    def _within_deadline(self, read: Callable, *args):
+        """``read(*args)`` on the reader, cut short when the body falls below ``min_rate``."""
+        if self.min_rate <= 0:
+            return read(*args)
+        remaining = self._started_at + self.grace + self.received / self.min_rate - time.monotonic()
+        if remaining <= 0:
+            raise BodyTooSlow('Client sending below minimum transfer rate')
+        sock = self._reader.sock
+        previous = sock.gettimeout()
+        limited = previous is None or remaining < previous
+        if limited:
+            sock.settimeout(remaining)
+        try:
+            return read(*args)
+        except socket.timeout:
+            if limited:
+                raise BodyTooSlow('Client sending below minimum transfer rate')
+            raise
+        finally:
+            if limited:
+                sock.settimeout(previous)
+
+    def _iter_length(self) -> Iterator[bytes]:
+        while self._remaining:
+            chunk = self._within_deadline(self._reader.read, min(self._remaining, self._reader.bufsize))
+            if not chunk:
+                raise HTTPParseError('Unexpected end of body')
+            self._remaining -= len(chunk)
+            yield chunk
+
+    def _iter_chunked(self) -> Iterator[bytes]:
+        while True:
+            line = self._within_deadline(self._reader.readline, CHUNK_LINE_MAX)
+            size_text = line.split(b';', 1)[0].strip()
+            if not CHUNK_SIZE.fullmatch(size_text):
+                raise HTTPParseError('Malformed chunk size')
+            size = int(size_text, 16)
+            if size == 0:
+                break
+            if self.received + size > self.max_size:
+                raise BodyTooLarge('Request body too large')
+            while size:
+                chunk = self._within_deadline(self._reader.read, min(size, self._reader.bufsize))
+                if not chunk:
+                    raise HTTPParseError('Unexpected end of body')
+                size -= len(chunk)
+                yield chunk
+            if self._within_deadline(self._reader.readline, CHUNK_LINE_MAX) != b'':
+                raise HTTPParseError('Malformed chunk terminator')
+        # Trailer fields are read and discarded.
+        while self._within_deadline(self._reader.readline, CHUNK_LINE_MAX):
+            pass
+
+    def read(self) -> bytes:
+        return b''.join(self)
+
+    def spool(self) -> BinaryIO:
+        """Copy the body into a SpooledTemporaryFile positioned at offset 0."""
+        f = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold)
+        for chunk in self:
+            f.write(chunk)
+        f.seek(0)
+        return f
+
+    def drain(self):
+        if not self._started:
+            for _chunk in self:
+                pass
@@ -1,23 +1,173 @@
+import threading
+import time
 from collections import OrderedDict
-from typing import Optional
+from typing import Callable, Dict, Optional, Tuple
 
 class LRUCache:
-    def __init__(self, capacity: int, max_size: int):
+    """Static file cache bounded by entry count and, optionally, total bytes (0 = no byte budget)."""
+
+    def __init__(self, capacity: int, max_size: int, max_bytes: int = 0):
         self.capacity = capacity
         self.max_size = max_size
+        self.max_bytes = max_bytes
         self._store: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
 
     def get(self, key: str) -> Optional[bytes]:
-        if key in self._store:
+        with self._lock:
+            value = self._store.get(key)
+            if value is None:
+                self.misses += 1
+                return None
             self._store.move_to_end(key)
-            return self._store[key]
-        return None
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: bytes) -> bool:
+        if len(value) > self.max_size or (self.max_bytes and len(value) > self.max_bytes):
+            return False
+        with self._lock:
+            old = self._store.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._store[key] = value
+            self._bytes += len(value)
+            self._evict_over_budget()
+        return True
+
+    def _evict_over_budget(self):
+        while len(self._store) > self.capacity or (self.max_bytes and self._bytes > self.max_bytes):
+            _key, evicted = self._store.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            value = self._store.pop(key, None)
+            if value is None:
+                return False
+            self._bytes -= len(value)
+            return True
+
+    def keys(self):
+        with self._lock:
+            return list(self._store)
+
+    def resize(self, capacity: Optional[int] = None, max_size: Optional[int] = None, max_bytes: Optional[int] = None):
+        """Change the limits in place; entries over the new budget are evicted now, the rest stay warm."""
+        with self._lock:
+            if capacity is not None:
+                self.capacity = capacity
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if max_size is not None:
+                self.max_size = max_size
+                for key in [k for k, v in self._store.items() if len(v) > max_size]:
+                    self._bytes -= len(self._store.pop(key))
+            self._evict_over_budget()
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._bytes = 0
+
+
+class _Flight:
+    __slots__ = ('event', 'result', 'error')
 
-    def put(self, key: str, value: bytes):
-        if len(value) > self.max_size:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """TTL + size bounded cache for dynamic responses with single-flight misses.
+
+    Concurrent misses for the same key share one computation: the first caller
+    runs ``compute`` while the others wait for its result.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 4 * 1024 * 1024, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._store: OrderedDict[str, Tuple[float, Tuple[bytes, str]]] = OrderedDict()
+        self._bytes = 0
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: str) -> Optional[Tuple[bytes, str]]:
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= self._clock():
+            self._evict(key)
+            return None
+        self._store.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Tuple[bytes, str], ttl: float):
+        size = len(value[0])
+        if size > self.max_bytes:
             return
-        if key in self._store:
-            self._store.move_to_end(key)
-        self._store[key] = value
-        if len(self._store) > self.capacity:
-            self._store.popitem(last=False)
+        with self._lock:
+            if key in self._store:
+                self._evict(key)
+            self._store[key] = (self._clock() + ttl, value)
+            self._bytes += size
+            while len(self._store) > self.max_entries or self._bytes > self.max_bytes:
+                self._evict(next(iter(self._store)))
+
+    def _evict(self, key: str):
+        _expires, value = self._store.pop(key)
+        self._bytes -= len(value[0])
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._bytes = 0
+
+    def get_or_compute(self, key: str, ttl: float, compute: Callable[[], Tuple[bytes, str]]) -> Tuple[bytes, str]:
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = compute()
+            self.put(key, flight.result, ttl)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
@@ -1,17 +1,59 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
 @dataclass
 class ServerConfig:
     host: str = "127.0.0.1"
     port: int = 8080
     root: str = "public"
+    listen: List[str] = field(default_factory=list)  # 'host:port', '[::]:port', 'unix:/path', 'fd:N', 'systemd'; empty = host:port
+    ipv6_only: bool = False  # IPv6 listeners are dual-stack unless set
     backlog: int = 64
-    max_conn_requests: int = 25  # per keep-alive connection
+    max_conn_requests: int = 1000  # per keep-alive connection, 0 = unlimited
     recv_buffer: int = 8192
     header_max: int = 16384
-    timeout: float = 5.0  # socket read timeout seconds
+    max_body_size: int = 10 * 1024 * 1024  # bytes, POST/PUT request bodies
+    body_spool_threshold: int = 1024 * 1024  # spooled bodies move to disk above this
+    timeout: float = 5.0  # socket timeout while handling a request and sending the response
+    header_timeout: float = 10.0  # total time to receive a request's headers once they start
+    body_timeout: float = 30.0  # between reads of a request body
+    idle_timeout: float = 15.0  # keep-alive connection parked with no request in flight
+    max_idle_connections: int = 1024  # least recently parked idle connections are closed beyond this
+    workers: int = 32  # threads serving readable connections
+    min_send_rate: float = 1024.0  # bytes/second a client must read at, 0 = no limit
+    send_grace: float = 10.0  # seconds added to every send deadline
+    min_recv_rate: float = 1024.0  # bytes/second a client must send a request body at, 0 = no limit
+    recv_grace: float = 10.0  # seconds added to every request body deadline
+    rate_limit_rps: float = 0.0  # per-client request rate, 0 = unlimited
+    rate_limit_burst: int = 50
+    max_connections_per_ip: int = 0  # 0 = unlimited
+    rate_limit_max_clients: int = 10000  # tracked client addresses (least recently seen dropped)
     cache_enabled: bool = True
     cache_max_entries: int = 32
     cache_max_file_size: int = 64 * 1024  # bytes
     log_enabled: bool = True
+    slow_request_ms: float = 0.0  # >0 records per-phase timings and logs slower requests
+    admin_enabled: bool = False  # local-only /_admin/* profiler and slow-log endpoints
+    admin_listen: Optional[str] = None  # 'host:port' (loopback) or 'unix:/path'; admin API incl. runtime settings
+    log_level: str = 'DEBUG'  # DEBUG, INFO, WARN or ERROR
     server_name: str = "PyNetLite/0.1"
+    tls_cert: Optional[str] = None  # PEM chain; enables HTTPS
+    tls_key: Optional[str] = None
+    tls_reload_interval: float = 30.0  # seconds between certificate mtime checks
+    http2: bool = False  # h2c with prior knowledge, and h2 via ALPN over TLS (needs the 'h2' package)
+    http2_max_streams: int = 100  # concurrent streams per HTTP/2 connection
+    http2_workers: int = 32  # threads running HTTP/2 stream handlers, apart from the connection workers
+    proxy_routes: Dict[str, List[str]] = field(default_factory=dict)  # path prefix -> ['host:port', ...]
+    proxy_balance: str = 'round_robin'  # or 'least_conn'
+    proxy_timeout: float = 30.0  # upstream response deadline and per-read timeout
+    proxy_health_path: str = '/'
+    proxy_health_interval: float = 5.0  # seconds between upstream health checks, 0 = passive only
+    virtual_hosts: Dict[str, str] = field(default_factory=dict)  # 'name[,alias...]' -> document root
+    vhost_cache_bytes: int = 4 * 1024 * 1024  # static cache budget of each virtual host
+    vhost_strict: bool = False  # unknown Host -> 404 instead of the default root
+    autoindex: bool = False  # HTML/JSON listings for directories without index.html
+    autoindex_page_size: int = 1000  # entries per listing page (?page=N)
+    asset_hashing: bool = False  # app.<hash>.js URLs served immutable; other files get no-cache + ETag
+    asset_hash_workers: int = 2
+    asset_rescan_interval: float = 5.0  # seconds between scans for new or changed files
+    asset_manifest_path: str = '/asset-manifest.json'  # logical name -> hashed name
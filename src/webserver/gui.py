@@ -6,72 +6,33 @@ import sys
 import os
 from pathlib import Path
 from datetime import datetime
-import io
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.webserver.config import ServerConfig
-from src.webserver.cache import LRUCache
+from src.webserver.stats import metrics
+from src.webserver.utils import set_log_sink
 
-
-class GUILogHandler:
-    """Custom log handler to redirect server logs to GUI"""
-    def __init__(self, gui):
-        self.gui = gui
-    
-    def write(self, message):
-        if message.strip():
-            # Parse log level from colorama output
-            msg = message.strip()
-            if '[INFO]' in msg:
-                level = 'INFO'
-                msg = msg.split('[INFO]', 1)[1].strip() if '[INFO]' in msg else msg
-            elif '[ERROR]' in msg:
-                level = 'ERROR'
-                msg = msg.split('[ERROR]', 1)[1].strip() if '[ERROR]' in msg else msg
-            elif '[WARN]' in msg:
-                level = 'WARN'
-                msg = msg.split('[WARN]', 1)[1].strip() if '[WARN]' in msg else msg
-            elif '[DEBUG]' in msg:
-                level = 'DEBUG'
-                msg = msg.split('[DEBUG]', 1)[1].strip() if '[DEBUG]' in msg else msg
-            else:
-                level = 'INFO'
-            
-            # Remove ANSI color codes
-            import re
-            ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-            msg = ansi_escape.sub('', msg)
-            
-            # Remove timestamp if present (we'll add our own)
-            if msg and len(msg) > 10 and msg[0] == '[' and ']' in msg[:10]:
-                msg = msg.split(']', 1)[1].strip() if ']' in msg else msg
-            
-            self.gui.root.after(0, lambda: self.gui.log(level, msg))
-    
-    def flush(self):
-        pass
+POLL_MS = 250  # how often the panel reads the server's stats and event feed
+MAX_EVENTS_PER_POLL = 500  # the rest waits for the next poll (the feed itself is bounded)
+MAX_LOG_LINES = 2000  # older lines are trimmed from the log view
 
 
 class ServerGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("PyNetLite Web Server - Control Panel")
-        self.root.geometry("1000x750")
+        self.root.geometry("1000x820")
         self.root.resizable(True, True)
-        self.root.minsize(900, 700)
+        self.root.minsize(900, 770)
         
         # Server state
         self.server_thread = None
         self.server_running = False
         self.config = ServerConfig()
         self.theme_mode = 'dark'  # 'dark' or 'light'
-        
-        # Capture stdout/stderr for server logs
-        self.log_handler = GUILogHandler(self)
-        self.original_stdout = sys.stdout
-        self.original_stderr = sys.stderr
+        self.poll_job = None
         
         # Apply modern dark theme
         self.setup_theme()
@@ -466,6 +427,24 @@ class ServerGUI:
         self.uptime_label.pack(pady=10)
         
         self.start_time = None
+        
+        # Live metrics, refreshed by poll_server()
+        metrics_frame = tk.Frame(status_container, bg=self.colors['bg_main'])
+        metrics_frame.pack(fill=tk.X, pady=(12, 0))
+        self.metric_labels = {}
+        cards = [('rps', "Requests / sec"), ('latency', "Latency p50 / p95 / p99"),
+                 ('connections', "Connections (busy / idle)"), ('cache', "Cache Hit Ratio")]
+        for index, (key, title) in enumerate(cards):
+            card = self.create_status_card(metrics_frame, title)
+            padx = (0, 8) if index == 0 else (8, 0) if index == len(cards) - 1 else 4
+            card.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=padx)
+            label = tk.Label(card,
+                             text="-",
+                             font=('Segoe UI', 12, 'bold'),
+                             bg=self.colors['bg_card'],
+                             fg=self.colors['text'])
+            label.pack(pady=(0, 10))
+            self.metric_labels[key] = label
     
     def create_status_card(self, parent, title):
         """Create a status card with title"""
@@ -611,12 +590,9 @@ class ServerGUI:
             self.server_thread = threading.Thread(target=self._run_server, daemon=True)
             self.server_thread.start()
             
-            # Redirect stdout/stderr to GUI
-            sys.stdout = self.log_handler
-            sys.stderr = self.log_handler
-            
             self.start_time = datetime.now()
             self.update_uptime()
+            self.poll_server()
             
             self.log("SUCCESS", f"Server started on {self.config.host}:{self.config.port}")
             self.log("INFO", f"Root directory: {self.config.root}")
@@ -633,9 +609,11 @@ class ServerGUI:
         """Internal method to run server"""
         try:
             from src.webserver.server import serve
+            # Server log lines go to the event feed; poll_server() shows them
+            set_log_sink(metrics.publish)
             serve(self.config)
         except Exception as e:
-            self.log("ERROR", f"Server error: {str(e)}")
+            metrics.publish("ERROR", f"Server error: {str(e)}")
             self.root.after(0, lambda: self.stop_server())
     
     def stop_server(self):
@@ -643,11 +621,12 @@ class ServerGUI:
         if not self.server_running:
             return
         
-        # Restore stdout/stderr
-        sys.stdout = self.original_stdout
-        sys.stderr = self.original_stderr
-        
         self.server_running = False
+        if self.poll_job is not None:
+            self.root.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.poll_server(reschedule=False)  # show what is still queued
+        set_log_sink(None)
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.browser_btn.config(state=tk.DISABLED)
@@ -683,18 +662,41 @@ class ServerGUI:
     
     def log(self, level, message):
         """Add log entry with timestamp and formatting"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        
-        # Insert timestamp
-        self.log_text.insert(tk.END, f"[{timestamp}] ", 'timestamp')
-        
-        # Insert level with color
+        self._insert_log(datetime.now(), level, message)
+        self._trim_log()
+        self.log_text.see(tk.END)
+    
+    def _insert_log(self, when, level, message):
+        self.log_text.insert(tk.END, f"[{when.strftime('%H:%M:%S')}] ", 'timestamp')
         self.log_text.insert(tk.END, f"[{level:>7}] ", level)
-        
-        # Insert message
         self.log_text.insert(tk.END, f"{message}\n")
-        
-        self.log_text.see(tk.END)
+    
+    def _trim_log(self):
+        """Keep the log view bounded so inserts stay cheap on a long-running server"""
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - MAX_LOG_LINES
+        if excess > 0:
+            self.log_text.delete('1.0', f'{excess + 1}.0')
+    
+    def poll_server(self, reschedule=True):
+        """Pull queued server events and the stats snapshot at a fixed rate"""
+        events = metrics.drain_events(MAX_EVENTS_PER_POLL)
+        for at, level, message in events:
+            self._insert_log(datetime.fromtimestamp(at), level, message)
+        if events:
+            self._trim_log()
+            self.log_text.see(tk.END)
+        
+        stats = metrics.snapshot()
+        latency = stats['latency_ms']
+        conns = stats['connections']
+        ratio = stats['cache_hit_ratio']
+        self.metric_labels['rps'].config(text=f"{stats['requests_per_sec']:.1f}")
+        self.metric_labels['latency'].config(text=f"{latency['p50']:.1f} / {latency['p95']:.1f} / {latency['p99']:.1f} ms")
+        self.metric_labels['connections'].config(text=f"{conns['busy']} / {conns['idle']}")
+        self.metric_labels['cache'].config(text="-" if ratio is None else f"{ratio:.0%}")
+        
+        if reschedule and self.server_running:
+            self.poll_job = self.root.after(POLL_MS, self.poll_server)
     
     def toggle_theme(self):
         """Toggle between dark and light theme (placeholder for now)"""
@@ -737,10 +739,6 @@ class ServerGUI:
     
     def on_closing(self):
         """Handle window close event"""
-        # Restore stdout/stderr before closing
-        sys.stdout = self.original_stdout
-        sys.stderr = self.original_stderr
-        
         if self.server_running:
             if messagebox.askokcancel("Quit", "Server is running. Do you want to stop it and quit?"):
                 self.stop_server()
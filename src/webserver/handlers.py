@@ -0,0 +1,166 @@
+import asyncio
+import inspect
+import threading
+import urllib.parse
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional, Tuple
+from .cache import ResponseCache
+from .response import is_streaming
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_CONCURRENCY = 4
+THREAD_WORKERS = 8
+
+class HandlerTimeout(Exception):
+    pass
+
+class HandlerBusy(Exception):
+    pass
+
+class HTTPError(Exception):
+    """Raised by a handler to answer with a non-200 status."""
+    def __init__(self, status: int, message: str = '', headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.headers = dict(headers or {})
+        super().__init__(message)
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_pools: Dict[str, Executor] = {}
+
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    """Shared background loop that runs every ``async def`` handler."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='handler-loop', daemon=True).start()
+        return _loop
+
+
+def run_coroutine(coro, timeout: Optional[float]):
+    future = asyncio.run_coroutine_threadsafe(coro, event_loop())
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise HandlerTimeout('Handler timed out')
+
+
+def iterate_async(agen, timeout: Optional[float] = DEFAULT_TIMEOUT):
+    """Drive an async iterator on the handler loop, yielding its items to a sync caller."""
+    iterator = agen.__aiter__()
+    try:
+        while True:
+            try:
+                yield run_coroutine(iterator.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        aclose = getattr(iterator, 'aclose', None)
+        if aclose is not None:
+            asyncio.run_coroutine_threadsafe(aclose(), event_loop())
+
+
+def executor(kind: str) -> Executor:
+    if kind not in ('thread', 'process'):
+        raise ValueError(f'Unknown executor kind: {kind}')
+    with _lock:
+        pool = _pools.get(kind)
+        if pool is None:
+            if kind == 'thread':
+                pool = ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix='blocking-handler')
+            else:
+                pool = ProcessPoolExecutor()
+            _pools[kind] = pool
+        return pool
+
+
+class AsyncHandler:
+    def __init__(self, func: Callable, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.func = func
+        self.timeout = timeout
+
+    def __call__(self, path: str, params: Dict[str, Any], *args) -> Tuple[bytes, str]:
+        return run_coroutine(self.func(path, params, *args), self.timeout)
+
+
+class BlockingHandler:
+    """Runs a handler on a shared thread or process pool.
+
+    At most ``max_concurrency`` calls of this route run at once; extra calls
+    fail fast with :class:`HandlerBusy` instead of queueing behind them.
+    Process-pool handlers must be picklable module-level functions and cannot
+    take the request object.
+    """
+
+    def __init__(self, func: Callable, kind: str = 'thread', max_concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.func = func
+        self.kind = kind
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        executor(kind)  # validate kind eagerly
+
+    def __call__(self, path: str, params: Dict[str, Any], *args) -> Tuple[bytes, str]:
+        if not self._slots.acquire(blocking=False):
+            raise HandlerBusy('Route concurrency limit reached')
+        try:
+            future = executor(self.kind).submit(self.func, path, params, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Release on completion, not on timeout, so the limit tracks work still running.
+        future.add_done_callback(lambda _f: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise HandlerTimeout('Handler timed out')
+
+
+class CachedHandler:
+    """Serves repeated calls from a :class:`ResponseCache` keyed on path + sorted params."""
+
+    def __init__(self, func: Callable, cache: ResponseCache, ttl: float):
+        self.func = func
+        self.cache = cache
+        self.ttl = ttl
+
+    @staticmethod
+    def cache_key(path: str, params: Dict[str, Any]) -> str:
+        return path + '?' + urllib.parse.urlencode(sorted((k, str(v)) for k, v in params.items()))
+
+    def __call__(self, path: str, params: Dict[str, Any], *args) -> Tuple[bytes, str]:
+        return self.cache.get_or_compute(self.cache_key(path, params), self.ttl, lambda: self._compute(path, params, *args))
+
+    def _compute(self, path: str, params: Dict[str, Any], *args) -> Tuple[bytes, str]:
+        body, ctype = self.func(path, params, *args)
+        if is_streaming(body):
+            # A cached body is shared between callers, so streams are materialized once.
+            body = b''.join(iterate_async(body) if hasattr(body, '__aiter__') else body)
+        return body, ctype
+
+
+class PathParamsOnly:
+    """Adapts a classic ``(path, params)`` handler to the ``(path, params, request)`` call."""
+    __slots__ = ('func',)
+
+    def __init__(self, func: Callable):
+        self.func = func
+
+    def __call__(self, path: str, params: Dict[str, Any], request=None) -> Tuple[bytes, str]:
+        return self.func(path, params)
+
+
+def wrap_handler(handler: Callable, blocking: bool = False, executor_kind: str = 'thread',
+                 max_concurrency: int = DEFAULT_CONCURRENCY, timeout: Optional[float] = DEFAULT_TIMEOUT,
+                 pass_request: bool = False) -> Callable:
+    if pass_request and blocking and executor_kind == 'process':
+        raise ValueError('Process-pool handlers cannot receive the request')
+    if inspect.iscoroutinefunction(handler):
+        handler = AsyncHandler(handler, timeout)
+    elif blocking:
+        handler = BlockingHandler(handler, executor_kind, max_concurrency, timeout)
+    return handler if pass_request else PathParamsOnly(handler)
@@ -1,4 +1,4 @@
-from typing import Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 from dataclasses import dataclass
 
 @dataclass
@@ -7,6 +7,8 @@ class HTTPRequest:
     path: str
     version: str
     headers: Dict[str, str]
+    body: Optional[Any] = None  # RequestBody, attached by the server for POST/PUT
+    client: Optional[Any] = None  # peer address, set by the server
 
     @property
     def keep_alive(self) -> bool:
@@ -15,11 +17,32 @@ class HTTPRequest:
             return connection != 'close'
         return connection == 'keep-alive'
 
-SUPPORTED_METHODS = {'GET', 'HEAD'}
+    @property
+    def chunked(self) -> bool:
+        return self.headers.get('transfer-encoding', '').lower() == 'chunked'
+
+    @property
+    def content_length(self) -> Optional[int]:
+        value = self.headers.get('content-length')
+        if value is None:
+            return None
+        if not is_decimal(value):
+            raise HTTPParseError('Invalid Content-Length')
+        return int(value)
+
+    @property
+    def expects_continue(self) -> bool:
+        return self.headers.get('expect', '').lower() == '100-continue'
+
+SUPPORTED_METHODS = {'GET', 'HEAD', 'POST', 'PUT'}
 
 class HTTPParseError(Exception):
     pass
 
+def is_decimal(value: str) -> bool:
+    # str.isdigit() alone also accepts non-ASCII digits such as '²'.
+    return value.isascii() and value.isdigit()
+
 def parse_request(raw: bytes, header_max: int) -> HTTPRequest:
     if len(raw) > header_max:
         raise HTTPParseError('Header section too large')
@@ -50,4 +73,13 @@ def parse_request(raw: bytes, header_max: int) -> HTTPRequest:
     # Basic HTTP/1.1 compliance: Host header required.
     if version == 'HTTP/1.1' and 'host' not in headers:
         raise HTTPParseError('Missing Host header')
+    if 'transfer-encoding' in headers:
+        if headers['transfer-encoding'].lower() != 'chunked':
+            raise HTTPParseError('Unsupported Transfer-Encoding')
+        if 'content-length' in headers:
+            raise HTTPParseError('Both Content-Length and Transfer-Encoding present')
+    elif 'content-length' in headers:
+        length = headers['content-length']
+        if not is_decimal(length):
+            raise HTTPParseError('Invalid Content-Length')
     return HTTPRequest(method=method.upper(), path=path, version=version, headers=headers)
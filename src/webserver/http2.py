@@ -0,0 +1,374 @@
+import collections
+import select
+import socket
+import ssl
+import threading
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+except ImportError:  # optional dependency: pip install h2
+    h2 = None
+
+from .body import BodyTooLarge, RequestBody
+from .config import ServerConfig
+from .handlers import HTTPError
+from .http import HTTPParseError, HTTPRequest
+from .response import HTTPResponse, make_response
+from .stream import send_all
+from .utils import log
+
+PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+# Connection-specific HTTP/1.1 headers are forbidden in HTTP/2 (RFC 9113, 8.2.2).
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'}
+FILE_CHUNK = 64 * 1024
+
+
+def available() -> bool:
+    return h2 is not None
+
+
+class StreamBody(RequestBody):
+    """Request body of one stream, fed with DATA frames by the connection's reader.
+
+    Consuming a chunk returns its bytes to the peer's flow-control window, so a
+    slow handler holds the client back instead of buffering the whole upload.
+    """
+
+    def __init__(self, session: 'H2Session', stream_id: int, length: Optional[int], max_size: int,
+                 spool_threshold: int, timeout: float):
+        super().__init__(None, length=length, chunked=True, max_size=max_size, spool_threshold=spool_threshold)
+        self._session = session
+        self._stream_id = stream_id
+        self._timeout = timeout
+        self._queue: Deque[Tuple[bytes, int]] = collections.deque()
+        self._cond = threading.Condition()
+        self.ended = False
+        self._error: Optional[str] = None
+
+    def feed(self, data: bytes, flow_controlled: int):
+        with self._cond:
+            self._queue.append((data, flow_controlled))
+            self._cond.notify()
+
+    def end(self, error: Optional[str] = None):
+        with self._cond:
+            self.ended = True
+            self._error = error
+            self._cond.notify()
+
+    def discard(self) -> int:
+        """Drop unread DATA; returns its flow-controlled size, still owed to the peer's windows."""
+        with self._cond:
+            owed = sum(flow_controlled for _data, flow_controlled in self._queue)
+            self._queue.clear()
+            self.ended = True
+            return owed
+
+    def _chunks(self):
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._queue or self.ended, self._timeout):
+                    raise HTTPParseError('Timed out waiting for request body')
+                if not self._queue:
+                    if self._error:
+                        raise HTTPParseError(self._error)
+                    return
+                data, flow_controlled = self._queue.popleft()
+            self._session.acknowledge(self._stream_id, flow_controlled)
+            if data:
+                yield data
+
+
+class H2Stream:
+    """Response side of one HTTP/2 stream; ``send_response`` hands its responses here."""
+
+    def __init__(self, session: 'H2Session', stream_id: int, request: HTTPRequest):
+        self.session = session
+        self.stream_id = stream_id
+        self.request = request
+        self.headers_sent = False
+        self.ended = False
+        self.reset = False
+
+    def respond(self, resp: HTTPResponse, head_only: bool = False, file=None, size: int = 0):
+        headers = [(':status', str(resp.status_code))]
+        for name, values in resp.headers.items():
+            if name.lower() not in HOP_BY_HOP:
+                headers += [(name.lower(), v) for v in (values if isinstance(values, list) else (values,))]
+        if file is not None:
+            if not head_only:
+                self._send_headers(headers, end=False, flush=False)
+                while size > 0:
+                    piece = file.read(min(FILE_CHUNK, size))
+                    if not piece:
+                        raise ConnectionError('File shrank while sending')
+                    size -= len(piece)
+                    self._send_data(piece, end=size <= 0)
+                return
+        elif resp.streaming:
+            if not head_only:
+                self._send_headers(headers, end=False)
+                for piece in resp.body:
+                    if piece:
+                        self._send_data(piece, end=False)
+                self._send_data(b'', end=True)
+                return
+            close = getattr(resp.body, 'close', None)
+            if close is not None:
+                close()
+        elif not head_only and resp.body:
+            self._send_headers(headers, end=False, flush=False)
+            self._send_data(resp.body, end=True)
+            return
+        self._send_headers(headers, end=True)
+
+    def _send_headers(self, headers, end: bool, flush: bool = True):
+        session = self.session
+        with session.lock:
+            if self.reset:
+                raise ConnectionResetError('Stream reset by peer')
+            session.conn.send_headers(self.stream_id, headers, end_stream=end)
+            self.headers_sent = True
+            self.ended = end
+            if flush:  # otherwise the HEADERS frame goes out together with the first DATA frame
+                session.flush()
+
+    def _send_data(self, data: bytes, end: bool):
+        """Send within the peer's flow-control windows, waiting for WINDOW_UPDATE when they are empty."""
+        session = self.session
+        view = memoryview(data)
+        with session.lock:
+            while True:
+                if self.reset:
+                    raise ConnectionResetError('Stream reset by peer')
+                size = min(session.conn.local_flow_control_window(self.stream_id),
+                           session.conn.max_outbound_frame_size, len(view))
+                if size == 0 and view:
+                    if not session.lock.wait(session.config.send_grace):
+                        raise TimeoutError('Flow-control window stayed closed')
+                    continue
+                last = end and size == len(view)
+                session.conn.send_data(self.stream_id, bytes(view[:size]), end_stream=last)
+                view = view[size:]
+                session.flush()
+                if not view:
+                    self.ended = end
+                    return
+
+
+class H2Session:
+    """One HTTP/2 connection: frames are read here and every stream runs as a worker job.
+
+    All use of the ``h2`` state machine and of the socket happens under
+    ``lock``, because an ``SSLSocket`` cannot read and write from two threads at
+    once. The lock's condition is notified whenever flow-control windows may
+    have grown.
+    """
+
+    def __init__(self, sock: socket.socket, addr, config: ServerConfig,
+                 handle: Callable[[H2Stream, HTTPRequest], None], submit: Callable):
+        if h2 is None:
+            raise RuntimeError("HTTP/2 needs the optional 'h2' package")
+        self.sock = sock
+        self.addr = addr
+        self.config = config
+        self._handle = handle
+        self._submit = submit
+        self.lock = threading.Condition()
+        self.conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding='iso-8859-1'))
+        self.streams: Dict[int, H2Stream] = {}
+        self.bodies: Dict[int, StreamBody] = {}
+        self.closed = False
+        self.streams_served = 0
+        with self.lock:
+            self.conn.initiate_connection()
+            self.conn.update_settings({h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: config.http2_max_streams})
+            self.flush()
+
+    def flush(self):
+        data = self.conn.data_to_send()
+        if data:
+            send_all(self.sock, data, self.config.min_send_rate, self.config.send_grace)
+
+    def acknowledge(self, stream_id: int, flow_controlled: int):
+        if not flow_controlled:
+            return
+        with self.lock:
+            if self.closed:
+                return
+            self.conn.acknowledge_received_data(flow_controlled, stream_id)
+            self.flush()
+
+    def serve(self, initial: bytes = b'') -> bool:
+        """Process frames until no stream is open and no data is waiting.
+
+        Returns True when the connection may be parked as idle, False once it is finished.
+        """
+        if initial and not self._receive(initial):
+            return False
+        while not self.closed:
+            pending = isinstance(self.sock, ssl.SSLSocket) and self.sock.pending()
+            if not pending:
+                with self.lock:
+                    idle = not self.streams
+                # Poll while streams are running so the connection is parked promptly after the last one.
+                ready, _, _ = select.select([self.sock], [], [], 0 if idle else 0.25)
+                if not ready:
+                    if idle:
+                        return True
+                    continue
+            with self.lock:
+                # Non-blocking: a partial TLS record must not keep writers waiting on the lock.
+                self.sock.settimeout(0)
+                try:
+                    data = self.sock.recv(65536)
+                except (ssl.SSLWantReadError, ssl.SSLWantWriteError, BlockingIOError):
+                    continue
+                finally:
+                    self.sock.settimeout(self.config.timeout)
+            if not data or not self._receive(data):
+                return False
+        return False
+
+    def _receive(self, data: bytes) -> bool:
+        with self.lock:
+            try:
+                events = self.conn.receive_data(data)
+            except h2.exceptions.ProtocolError as e:
+                log('DEBUG', f"HTTP/2 protocol error from {self.addr}: {e}")
+                self.flush()
+                self.closed = True
+                return False
+            for event in events:
+                self._on_event(event)
+            self.flush()
+            self.lock.notify_all()
+        return not self.closed
+
+    def _on_event(self, event):
+        if isinstance(event, h2.events.RequestReceived):
+            self._start_stream(event)
+        elif isinstance(event, h2.events.DataReceived):
+            body = self.bodies.get(event.stream_id)
+            if body is not None:
+                body.feed(event.data, event.flow_controlled_length)
+            else:
+                self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, h2.events.StreamEnded):
+            body = self.bodies.pop(event.stream_id, None)
+            if body is not None:
+                body.end()
+        elif isinstance(event, h2.events.StreamReset):
+            stream = self.streams.get(event.stream_id)
+            if stream is not None:
+                stream.reset = True
+            body = self.bodies.pop(event.stream_id, None)
+            if body is not None:
+                body.end('Stream reset by peer')
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.closed = True
+
+    def _start_stream(self, event):
+        headers: Dict[str, str] = {}
+        for name, value in event.headers:
+            if name in headers:
+                headers[name] += ('; ' if name == 'cookie' else ', ') + value
+            else:
+                headers[name] = value
+        method, path = headers.pop(':method', ''), headers.pop(':path', '')
+        authority = headers.pop(':authority', None)
+        headers.pop(':scheme', None)
+        if not method or not path:
+            self.conn.reset_stream(event.stream_id, h2.errors.ErrorCodes.PROTOCOL_ERROR)
+            return
+        if authority and 'host' not in headers:
+            headers['host'] = authority
+        request = HTTPRequest(method, path, 'HTTP/2', headers, client=self.addr)
+        try:
+            length = request.content_length
+        except HTTPParseError:
+            self.conn.reset_stream(event.stream_id, h2.errors.ErrorCodes.PROTOCOL_ERROR)
+            return
+        if event.stream_ended is None:
+            body = StreamBody(self, event.stream_id, length, self.config.max_body_size,
+                              self.config.body_spool_threshold, self.config.body_timeout)
+            self.bodies[event.stream_id] = body
+            request.body = body
+        stream = self.streams[event.stream_id] = H2Stream(self, event.stream_id, request)
+        self._submit(self._run_stream, stream)
+
+    def _run_stream(self, stream: H2Stream):
+        request = stream.request
+        try:
+            try:
+                length = request.content_length
+                if length is not None and length > self.config.max_body_size:
+                    raise BodyTooLarge('Request body too large')
+                self._handle(stream, request)
+            except BodyTooLarge as e:
+                self._fail(stream, 413, str(e))
+            except HTTPParseError as e:
+                self._fail(stream, 400, str(e))
+            except HTTPError as e:
+                self._fail(stream, e.status, str(e), e.headers)
+        except (OSError, h2.exceptions.H2Error) as e:
+            log('DEBUG', f"HTTP/2 stream {stream.stream_id} from {self.addr} aborted: {e}")
+        except Exception as e:
+            log('ERROR', f"HTTP/2 stream {stream.stream_id} from {self.addr} failed: {e!r}")
+            self._fail(stream, 500, 'Internal Server Error')
+        finally:
+            self._finish(stream)
+
+    def _fail(self, stream: H2Stream, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        if stream.headers_sent or stream.reset:
+            return  # too late for an error response; _finish resets the stream
+        resp = make_response(status, message.encode(), server_name=self.config.server_name)
+        resp.headers.update(headers or {})
+        try:
+            stream.respond(resp)
+        except (OSError, h2.exceptions.H2Error):
+            pass
+
+    def _finish(self, stream: H2Stream):
+        with self.lock:
+            self.streams.pop(stream.stream_id, None)
+            self.streams_served += 1
+            uploading = self.bodies.pop(stream.stream_id, None) is not None
+            body = stream.request.body
+            # DATA the handler never read still counts against the connection window.
+            owed = body.discard() if isinstance(body, StreamBody) else 0
+            if self.closed:
+                return
+            try:
+                if owed:
+                    self.conn.acknowledge_received_data(owed, stream.stream_id)
+                if stream.reset:
+                    pass  # the peer already closed the stream
+                elif not stream.ended:
+                    self.conn.reset_stream(stream.stream_id, h2.errors.ErrorCodes.INTERNAL_ERROR)
+                elif uploading:
+                    # Response is complete but the client is still uploading: tell it to stop.
+                    self.conn.reset_stream(stream.stream_id, h2.errors.ErrorCodes.NO_ERROR)
+                self.flush()
+            except (OSError, h2.exceptions.H2Error):
+                pass
+
+    def close(self):
+        """Send GOAWAY (best effort) before the socket is closed."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                self.conn.close_connection()
+                self.sock.settimeout(0.5)
+                self.sock.sendall(self.conn.data_to_send())
+            except (OSError, h2.exceptions.H2Error):
+                pass
@@ -0,0 +1,152 @@
+import queue
+import selectors
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class TimingWheel:
+    """Hashed timing wheel: O(1) schedule/cancel, expiry checked once per tick.
+
+    Deadlines are rounded up to whole ticks, so a timeout fires at most one
+    tick late. Delays longer than one revolution simply wait extra rounds in
+    their slot.
+    """
+
+    def __init__(self, tick: float = 0.25, slots: int = 512, clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self.slots = slots
+        self._clock = clock
+        self._buckets: List[Dict[Hashable, int]] = [{} for _ in range(slots)]
+        self._where: Dict[Hashable, int] = {}
+        self._current = int(clock() / tick)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def schedule(self, key: Hashable, delay: float):
+        self.cancel(key)
+        expires = self._current + max(1, int(-(-delay // self.tick)))
+        slot = expires % self.slots
+        self._buckets[slot][key] = expires
+        self._where[key] = slot
+
+    def cancel(self, key: Hashable):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            del self._buckets[slot][key]
+
+    def advance(self) -> List[Hashable]:
+        """Move the wheel to the current time and return keys whose deadline passed."""
+        now_tick = int(self._clock() / self.tick)
+        expired: List[Hashable] = []
+        # Visiting more than one revolution of slots would repeat buckets.
+        first = max(self._current + 1, now_tick - self.slots + 1)
+        for t in range(first, now_tick + 1):
+            bucket = self._buckets[t % self.slots]
+            if not bucket:
+                continue
+            due = [key for key, expires in bucket.items() if expires <= now_tick]
+            for key in due:
+                del bucket[key]
+                del self._where[key]
+            expired.extend(due)
+        self._current = max(self._current, now_tick)
+        return expired
+
+
+class IdleManager:
+    """Parks idle connections in a selector instead of a blocked thread each.
+
+    Parked connections are handed to ``dispatch`` as soon as they become
+    readable. Each one has a deadline on a :class:`TimingWheel`. When more than
+    ``max_idle`` are parked, the least recently parked connection is closed.
+    ``on_expire`` sees each connection whose deadline passed, just before it is closed.
+    """
+
+    def __init__(self, dispatch: Callable[[Any], None], max_idle: int = 1024, tick: float = 0.25,
+                 on_expire: Optional[Callable[[Any], None]] = None):
+        self._dispatch = dispatch
+        self._on_expire = on_expire
+        self.max_idle = max_idle
+        self._selector = selectors.DefaultSelector()
+        self._wheel = TimingWheel(tick)
+        self._lru: 'OrderedDict[int, Any]' = OrderedDict()  # fileno -> connection, oldest first
+        self._incoming: 'queue.SimpleQueue' = queue.SimpleQueue()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self.evicted = 0
+        self.expired = 0
+        self._thread = threading.Thread(target=self._run, name='idle-manager', daemon=True)
+        self._thread.start()
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._lru)
+
+    def park(self, conn: Any, timeout: float):
+        """Hand ``conn`` (with ``sock`` and ``close()``) to the selector thread. Thread-safe."""
+        self._incoming.put((conn, timeout))
+        try:
+            self._wake_w.send(b'\0')
+        except BlockingIOError:
+            pass  # a wakeup is already pending
+
+    def _register(self, conn: Any, timeout: float):
+        try:
+            fd = conn.sock.fileno()
+            self._selector.register(conn.sock, selectors.EVENT_READ, conn)
+        except (ValueError, OSError):
+            self._close(conn)
+            return
+        self._lru[fd] = conn
+        self._wheel.schedule(fd, timeout)
+        while len(self._lru) > self.max_idle:
+            _fd, oldest = self._lru.popitem(last=False)
+            self._release(oldest)
+            self._close(oldest)
+            self.evicted += 1
+
+    def _release(self, conn: Any):
+        fd = conn.sock.fileno()
+        self._lru.pop(fd, None)
+        self._wheel.cancel(fd)
+        try:
+            self._selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+
+    @staticmethod
+    def _close(conn: Any):
+        conn.close()
+
+    def _run(self):
+        while True:
+            for key, _events in self._selector.select(self._wheel.tick):
+                conn = key.data
+                if conn is None:
+                    try:
+                        self._wake_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._release(conn)
+                self._dispatch(conn)
+            while True:
+                try:
+                    conn, timeout = self._incoming.get_nowait()
+                except queue.Empty:
+                    break
+                self._register(conn, timeout)
+            for fd in self._wheel.advance():
+                conn = self._lru.get(fd)
+                if conn is not None:
+                    self._release(conn)
+                    if self._on_expire is not None:
+                        self._on_expire(conn)
+                    self._close(conn)
+                    self.expired += 1
@@ -0,0 +1,137 @@
+import os
+import socket
+import stat
+from typing import Any, List, Sequence
+
+from .proxy import parse_address
+
+UNIX_PREFIX = 'unix:'
+FD_PREFIX = 'fd:'
+SYSTEMD = 'systemd'
+SD_LISTEN_FDS_START = 3  # first fd passed by systemd socket activation (sd_listen_fds)
+LOOPBACK_HOSTS = {'127.0.0.1', '::1', 'localhost'}
+
+
+def format_address(host: str, port: int) -> str:
+    return f'[{host}]:{port}' if ':' in host else f'{host}:{port}'
+
+
+def is_local(spec: str) -> bool:
+    """Whether a listen address is only reachable from this host."""
+    if spec.startswith(UNIX_PREFIX):
+        return True
+    host, _port = parse_address(spec)
+    return host in LOOPBACK_HOSTS or host.startswith('127.')
+
+
+def bind_listener(spec: str, backlog: int = 64, mode: int = 0o660, v6only: bool = False) -> socket.socket:
+    """Listening socket for ``host:port``, ``[v6addr]:port`` or ``unix:/path/to.sock``.
+
+    A stale socket file left by a previous run is removed first; anything else
+    at that path is refused rather than deleted. IPv6 sockets are dual-stack
+    unless ``v6only``, so ``[::]:8080`` also accepts IPv4 clients.
+    """
+    if spec.startswith(UNIX_PREFIX):
+        path = spec[len(UNIX_PREFIX):]
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.unlink(path)
+            else:
+                raise OSError(f'{path} exists and is not a socket')
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(path)
+            os.chmod(path, mode)
+            sock.listen(backlog)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    host, port = parse_address(spec)
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if family == socket.AF_INET6:
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, int(v6only))
+        sock.bind((host, port))
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def inherited_listener(fd: int, backlog: int = 64) -> socket.socket:
+    """Adopt an already bound socket handed over by a supervisor (family and type are read from the fd)."""
+    sock = socket.socket(fileno=fd)
+    if sock.type != socket.SOCK_STREAM:
+        sock.detach()
+        raise OSError(f'fd {fd} is not a stream socket')
+    sock.set_inheritable(False)
+    if not sock.getsockopt(socket.SOL_SOCKET, socket.SO_ACCEPTCONN):
+        sock.listen(backlog)
+    return sock
+
+
+def systemd_listeners(backlog: int = 64) -> List[socket.socket]:
+    """Sockets passed by systemd socket activation (``LISTEN_PID``/``LISTEN_FDS``), if meant for this process.
+
+    The variables are removed afterwards so child processes do not claim the same fds.
+    """
+    if os.environ.get('LISTEN_PID') != str(os.getpid()):
+        return []
+    count = int(os.environ.get('LISTEN_FDS', '0'))
+    for name in ('LISTEN_PID', 'LISTEN_FDS', 'LISTEN_FDNAMES'):
+        os.environ.pop(name, None)
+    return [inherited_listener(fd, backlog) for fd in range(SD_LISTEN_FDS_START, SD_LISTEN_FDS_START + count)]
+
+
+def open_listeners(specs: Sequence[str], backlog: int = 64, v6only: bool = False) -> List[socket.socket]:
+    """Listening sockets for ``host:port``, ``unix:PATH``, ``fd:N`` and ``systemd`` specs, all or none."""
+    listeners: List[socket.socket] = []
+    try:
+        for spec in specs:
+            if spec == SYSTEMD:
+                activated = systemd_listeners(backlog)
+                if not activated:
+                    raise OSError('No sockets passed by systemd (LISTEN_PID/LISTEN_FDS not set for this process)')
+                listeners += activated
+            elif spec.startswith(FD_PREFIX):
+                listeners.append(inherited_listener(int(spec[len(FD_PREFIX):]), backlog))
+            else:
+                listeners.append(bind_listener(spec, backlog, v6only=v6only))
+    except (OSError, ValueError):
+        for sock in listeners:
+            sock.close()
+        raise
+    return listeners
+
+
+def remove_socket_files(specs: Sequence[str]):
+    """Unlink the Unix socket files this process bound (inherited ones belong to the supervisor)."""
+    for spec in specs:
+        if spec.startswith(UNIX_PREFIX):
+            path = spec[len(UNIX_PREFIX):]
+            try:
+                if stat.S_ISSOCK(os.stat(path).st_mode):
+                    os.unlink(path)
+            except OSError:
+                pass
+
+
+def peer_address(addr: Any) -> Any:
+    """``(host, port)`` for TCP peers, with IPv4-mapped IPv6 (``::ffff:a.b.c.d``) unwrapped; Unix peers as is."""
+    if isinstance(addr, tuple) and len(addr) == 4:
+        host = addr[0][7:] if addr[0].startswith('::ffff:') else addr[0]
+        return host, addr[1]
+    return addr
+
+
+def describe(sock: socket.socket) -> str:
+    name = sock.getsockname()
+    if sock.family == socket.AF_UNIX:
+        return UNIX_PREFIX + (name or '?')
+    return format_address(*name[:2])
@@ -0,0 +1,131 @@
+"""Microbenchmarks for hot-path primitives.
+
+Each primitive is timed with ``timeit`` (best of several repeats, ns/op) and
+its peak allocation per call is measured with ``tracemalloc``::
+
+    python -m src.webserver.microbench --save micro_baseline.json
+    python -m src.webserver.microbench --baseline micro_baseline.json --threshold 1.5
+
+With ``--baseline`` the exit status is 1 when any primitive got slower than
+``threshold`` times its baseline, or allocates more than ``alloc_threshold``
+times its baseline bytes.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .cache import LRUCache
+from .http import parse_request
+from .response import make_response
+from .routing import Router
+from .utils import guess_mime, http_date, safe_path
+
+REQUEST = (b"GET /static/js/app.bundle.js?v=3 HTTP/1.1\r\n"
+           b"Host: localhost:8080\r\n"
+           b"User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0\r\n"
+           b"Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n"
+           b"Accept-Language: en-US,en;q=0.5\r\n"
+           b"Accept-Encoding: gzip, deflate, br\r\n"
+           b"Connection: keep-alive\r\n"
+           b"Cache-Control: max-age=0\r\n\r\n")
+BODY = b'x' * 2048
+
+
+def _router() -> Router:
+    router = Router()
+    for i in range(200):
+        router.register(f'/api/v1/resource{i}/{{id:int}}', lambda path, params: (b'', 'text/plain'))
+    return router
+
+
+def primitives() -> Dict[str, Callable[[], object]]:
+    """Name -> zero-argument callable exercising one primitive with realistic input."""
+    router = _router()
+    cache = LRUCache(32, 64 * 1024)
+    for i in range(32):
+        cache.put(f'public/file{i}.css', BODY)
+    root = tempfile.gettempdir()
+    return {
+        'parse_request': lambda: parse_request(REQUEST, 16384),
+        'make_response': lambda: make_response(200, BODY, 'text/css'),
+        'to_bytes': (lambda resp: resp.to_bytes)(make_response(200, BODY, 'text/css')),
+        'http_date': http_date,
+        'guess_mime': lambda: guess_mime('public/static/js/app.bundle.js'),
+        'safe_path': lambda: safe_path(root, '/static/js/app.bundle.js?v=3'),
+        'router_dispatch': lambda: router.resolve('GET', '/api/v1/resource150/42?expand=1'),
+        'lru_get': lambda: cache.get('public/file7.css'),
+        'lru_put': lambda: cache.put('public/file7.css', BODY),
+    }
+
+
+def measure(func: Callable[[], object], number: int = 2000, repeat: int = 5) -> Dict[str, float]:
+    ns_per_op = min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+    func()  # warm caches before measuring allocation
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(5):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return {'ns_per_op': round(ns_per_op, 1), 'alloc_peak_bytes': peak}
+
+
+def run(number: int = 2000, repeat: int = 5, only: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, func in primitives().items():
+        if only and name not in only:
+            continue
+        results[name] = measure(func, number, repeat)
+    return results
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 1.5, alloc_threshold: float = 1.25,
+            alloc_slack: int = 256) -> List[str]:
+    regressions = []
+    for name, base in baseline.items():
+        now = current.get(name)
+        if now is None:
+            continue
+        if now['ns_per_op'] > base['ns_per_op'] * threshold:
+            regressions.append(f"{name}: {now['ns_per_op']}ns/op > {threshold}x baseline {base['ns_per_op']}ns/op")
+        if now['alloc_peak_bytes'] > base['alloc_peak_bytes'] * alloc_threshold + alloc_slack:
+            regressions.append(f"{name}: {now['alloc_peak_bytes']}B peak > baseline {base['alloc_peak_bytes']}B")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='PyNetLite hot-path microbenchmarks')
+    parser.add_argument('--number', type=int, default=2000, help='calls per timing repeat')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', help='comma-separated primitive names')
+    parser.add_argument('--save', help='write results as a new baseline file')
+    parser.add_argument('--baseline', help='compare against a stored baseline file')
+    parser.add_argument('--threshold', type=float, default=1.5, help='allowed slowdown factor')
+    parser.add_argument('--alloc-threshold', type=float, default=1.25, help='allowed allocation growth factor')
+    args = parser.parse_args(argv)
+
+    results = run(args.number, args.repeat, args.only.split(',') if args.only else None)
+    for name, r in results.items():
+        print(f"{name:<16} {r['ns_per_op']:>10.1f} ns/op {r['alloc_peak_bytes']:>8} B peak", file=sys.stderr)
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.threshold, args.alloc_threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,429 @@
+import itertools
+import select
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .body import RequestBody
+from .handlers import HTTPError
+from .http import HTTPParseError, HTTPRequest
+from .response import HTTPResponse
+from .stream import SocketReader
+from .utils import log
+
+# Hop-by-hop headers describe one connection and are never forwarded (RFC 9110, 7.6.1).
+HOP_BY_HOP = frozenset({'connection', 'keep-alive', 'proxy-connection', 'te', 'trailer',
+                        'transfer-encoding', 'upgrade', 'proxy-authenticate', 'proxy-authorization'})
+BALANCERS = ('round_robin', 'least_conn')
+UPSTREAM_HEADER_MAX = 65536
+UNBOUNDED = 1 << 62
+
+
+class UpstreamConnection:
+    __slots__ = ('sock', 'reader', 'requests')
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = SocketReader(sock, 65536)
+        self.requests = 0
+
+    def stale(self) -> bool:
+        """An idle pooled connection with readable data was closed (or broken) by the upstream."""
+        if self.reader.buffered:
+            return True
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class Upstream:
+    """One backend address with its idle keep-alive connections and counters."""
+
+    def __init__(self, host: str, port: int, max_idle: int = 16):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.healthy = True
+        self.retry_at = 0.0  # monotonic time of the next trial request while down
+        self.active = 0
+        self._idle: Deque[UpstreamConnection] = deque()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+        self.reused = 0
+        self.failures = 0
+
+    @property
+    def address(self) -> str:
+        return f'{self.host}:{self.port}'
+
+    def acquire(self, connect_timeout: float) -> Tuple[UpstreamConnection, bool]:
+        """Return ``(connection, reused)``, preferring the most recently used idle one."""
+        with self._lock:
+            self.active += 1
+            self.requests += 1
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.stale():
+                    self.reused += 1
+                    return conn, True
+                conn.close()
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=connect_timeout)
+        except OSError:
+            self.finish(None, reusable=False)
+            raise
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.opened += 1
+        return UpstreamConnection(sock), False
+
+    def finish(self, conn: Optional[UpstreamConnection], reusable: bool):
+        with self._lock:
+            self.active -= 1
+            if conn is not None and reusable and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        if conn is not None:
+            conn.close()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def set_down(self, retry_at: float) -> bool:
+        """Take out of the rotation until ``retry_at``; True when it was up until now."""
+        with self._lock:
+            was_up, self.healthy = self.healthy, False
+            self.retry_at = retry_at
+        if was_up:
+            self.close_idle()
+        return was_up
+
+    def set_up(self) -> bool:
+        """Back into the rotation; True when it was down until now."""
+        with self._lock:
+            was_down, self.healthy = not self.healthy, True
+        return was_down
+
+    def claim_retry(self, now: float, retry_after: float) -> bool:
+        """While down, allow one trial request per ``retry_after`` seconds."""
+        with self._lock:
+            if self.healthy or now < self.retry_at:
+                return False
+            self.retry_at = now + retry_after
+            return True
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'address': self.address, 'healthy': self.healthy, 'active': self.active,
+                'idle': len(self._idle), 'requests': self.requests, 'connections_opened': self.opened,
+                'reused': self.reused, 'failures': self.failures}
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f'Upstream must be host:port, got {address!r}')
+    return host.strip('[]'), int(port)
+
+
+def parse_response_head(raw: bytes) -> Tuple[str, int, str, Dict[str, Any]]:
+    """Split an upstream status line and headers; repeated headers become lists."""
+    lines = raw.decode('iso-8859-1').split('\r\n')
+    try:
+        version, status, reason = (lines[0].split(' ', 2) + [''])[:3]
+        code = int(status)
+    except ValueError:
+        raise HTTPParseError('Malformed upstream status line')
+    headers: Dict[str, Any] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(':')
+        if not sep:
+            raise HTTPParseError('Malformed upstream header line')
+        name, value = name.strip(), value.strip()
+        previous = headers.get(name)
+        if previous is None:
+            headers[name] = value
+        elif isinstance(previous, list):
+            previous.append(value)
+        else:
+            headers[name] = [previous, value]
+    return version, code, reason, headers
+
+
+def _header(headers: Dict[str, Any], name: str) -> Optional[str]:
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value if isinstance(value, str) else value[-1]
+    return None
+
+
+class UpstreamPool:
+    """Balances requests over upstreams and keeps their connections alive between requests.
+
+    ``round_robin`` cycles through healthy upstreams; ``least_conn`` picks the
+    one with the fewest in-flight requests. An upstream is taken out of the
+    rotation when connecting to it fails. It is also taken out when its health
+    check (``GET health_path`` every ``health_interval`` seconds, on a
+    background thread) returns 5xx or fails, and comes back once a check
+    succeeds. Independently of health checks, a down upstream gets one trial
+    request every ``retry_after`` seconds and is back as soon as it accepts a
+    connection, so it recovers even with ``health_interval=0``.
+    """
+
+    def __init__(self, addresses: Sequence[str], balance: str = 'round_robin', max_idle: int = 16,
+                 connect_timeout: float = 3.0, timeout: float = 30.0, health_path: str = '/',
+                 health_interval: float = 5.0, retry_after: float = 10.0):
+        if balance not in BALANCERS:
+            raise ValueError(f'Unknown balancing strategy: {balance}')
+        if not addresses:
+            raise ValueError('A proxy route needs at least one upstream')
+        self.upstreams = [Upstream(*parse_address(a), max_idle=max_idle) for a in addresses]
+        self.balance = balance
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.retry_after = retry_after
+        self._rr = itertools.count()
+        self._stop = threading.Event()
+        self._checker: Optional[threading.Thread] = None
+        if health_interval > 0:
+            self._checker = threading.Thread(target=self._check_loop, name='upstream-health', daemon=True)
+            self._checker.start()
+
+    def pick(self, exclude: Sequence[Upstream] = ()) -> Optional[Upstream]:
+        now = time.monotonic()
+        for upstream in self.upstreams:
+            if upstream not in exclude and upstream.claim_retry(now, self.retry_after):
+                return upstream  # passive recovery: a trial request to a down upstream
+        candidates = [u for u in self.upstreams if u.healthy and u not in exclude]
+        if not candidates:
+            return None
+        start = next(self._rr)
+        if self.balance == 'least_conn':
+            # Rotate first so ties are spread instead of always hitting the first upstream.
+            rotated = candidates[start % len(candidates):] + candidates[:start % len(candidates)]
+            return min(rotated, key=lambda u: u.active)
+        return candidates[start % len(candidates)]
+
+    def mark_down(self, upstream: Upstream, reason: str):
+        upstream.record_failure()
+        if upstream.set_down(time.monotonic() + self.retry_after):
+            log('WARN', f"Upstream {upstream.address} marked down: {reason}")
+
+    def mark_up(self, upstream: Upstream):
+        if upstream.set_up():
+            log('INFO', f"Upstream {upstream.address} is back up")
+
+    def check(self, upstream: Upstream) -> bool:
+        try:
+            with socket.create_connection((upstream.host, upstream.port), timeout=self.connect_timeout) as sock:
+                sock.settimeout(self.connect_timeout)
+                sock.sendall(f'GET {self.health_path} HTTP/1.1\r\nHost: {upstream.address}\r\n'
+                             f'Connection: close\r\n\r\n'.encode())
+                head = SocketReader(sock).read_headers(UPSTREAM_HEADER_MAX, time.monotonic() + self.connect_timeout)
+            return head is not None and parse_response_head(head)[1] < 500
+        except (OSError, HTTPParseError):
+            return False
+
+    def check_all(self):
+        for upstream in self.upstreams:
+            ok = self.check(upstream)
+            if ok:
+                self.mark_up(upstream)
+            else:
+                self.mark_down(upstream, 'health check failed')
+
+    def _check_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_all()
+
+    def close(self):
+        self._stop.set()
+        for upstream in self.upstreams:
+            upstream.close_idle()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'balance': self.balance, 'upstreams': [u.stats() for u in self.upstreams]}
+
+
+class ProxyHandler:
+    """Route handler forwarding requests to an :class:`UpstreamPool`.
+
+    Request and response bodies are streamed in both directions. A request
+    that fails on a reused connection before any response byte arrives is
+    retried once on a fresh one, since the upstream may have closed it while
+    it sat idle; this is only done while the request body is still unread.
+    """
+
+    def __init__(self, pool: UpstreamPool, prefix: str = '', strip_prefix: bool = False):
+        self.pool = pool
+        self.prefix = prefix.rstrip('/')
+        self.strip_prefix = strip_prefix
+
+    def __call__(self, _path: str, _params: Dict[str, Any], request: HTTPRequest) -> HTTPResponse:
+        target = request.path
+        if self.strip_prefix and self.prefix and target.startswith(self.prefix):
+            target = target[len(self.prefix):]
+            if not target.startswith('/'):
+                target = '/' + target
+        tried: List[Upstream] = []
+        while True:
+            upstream = self.pool.pick(tried)
+            if upstream is None:
+                raise HTTPError(503, 'No healthy upstream')
+            tried.append(upstream)
+            try:
+                conn, reused = upstream.acquire(self.pool.connect_timeout)
+            except OSError as e:
+                self.pool.mark_down(upstream, str(e))
+                continue  # nothing was sent yet: try the next upstream
+            if not upstream.healthy:
+                self.pool.mark_up(upstream)  # a trial request got through
+            try:
+                return self._forward(upstream, conn, request, target)
+            except _RetryableError as e:
+                upstream.finish(conn, reusable=False)
+                if reused and (request.body is None or not request.body.started):
+                    tried.pop()  # the same upstream is fine, only the pooled socket was dead
+                    continue
+                upstream.record_failure()
+                raise HTTPError(502, f'Bad Gateway: {e}')
+            except _ClientBodyError as e:
+                upstream.finish(conn, reusable=False)
+                raise e.error from None  # answered like any bad request body: 400/413 or a dropped connection
+            except socket.timeout:
+                upstream.finish(conn, reusable=False)
+                upstream.record_failure()
+                raise HTTPError(504, 'Upstream timed out')
+            except (OSError, HTTPParseError) as e:
+                upstream.finish(conn, reusable=False)
+                upstream.record_failure()
+                raise HTTPError(502, f'Bad Gateway: {e}')
+
+    def _forward(self, upstream: Upstream, conn: UpstreamConnection, request: HTTPRequest,
+                 target: str) -> HTTPResponse:
+        conn.sock.settimeout(self.pool.timeout)
+        lines = [f'{request.method} {target} HTTP/1.1']
+        for name, value in request.headers.items():
+            if name not in HOP_BY_HOP and name not in ('content-length', 'expect', 'x-forwarded-for'):
+                lines.append(f'{name}: {value}')
+        client = request.client[0] if isinstance(request.client, tuple) else 'unix'
+        forwarded = request.headers.get('x-forwarded-for')
+        lines.append(f"x-forwarded-for: {forwarded + ', ' if forwarded else ''}{client}")
+        body = request.body
+        length = request.content_length
+        if body is not None:
+            lines.append(f'content-length: {length}' if length is not None else 'transfer-encoding: chunked')
+        try:
+            conn.sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode('iso-8859-1'))
+        except OSError as e:
+            raise _RetryableError(str(e))
+        if body is not None:
+            chunks = iter(body)
+            while True:
+                try:
+                    chunk = next(chunks, None)
+                except (OSError, HTTPParseError) as e:  # the client's fault, not the upstream's
+                    raise _ClientBodyError(e)
+                if chunk is None:
+                    break
+                conn.sock.sendall(chunk if length is not None else b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            if length is None:
+                conn.sock.sendall(b'0\r\n\r\n')
+        try:
+            head = conn.reader.read_headers(UPSTREAM_HEADER_MAX, time.monotonic() + self.pool.timeout)
+        except ConnectionError as e:
+            raise _RetryableError(str(e))
+        if head is None:
+            raise _RetryableError('Upstream closed the connection')
+        version, status, reason, headers = parse_response_head(head)
+        while 100 <= status < 200:  # interim responses; 100 Continue was already handled by attach_body
+            head = conn.reader.read_headers(UPSTREAM_HEADER_MAX, time.monotonic() + self.pool.timeout)
+            if head is None:
+                raise HTTPParseError('Upstream closed the connection')
+            version, status, reason, headers = parse_response_head(head)
+        conn.requests += 1
+        keep_alive = version == 'HTTP/1.1' and (_header(headers, 'connection') or '').lower() != 'close'
+        chunked = (_header(headers, 'transfer-encoding') or '').lower() == 'chunked'
+        content_length = _header(headers, 'content-length')
+        forwarded_headers = {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP}
+        if request.method == 'HEAD' or status in (204, 304):
+            upstream.finish(conn, keep_alive)
+            return HTTPResponse(status, reason, forwarded_headers, b'')
+        until_close = not chunked and content_length is None  # body ends when the upstream closes
+        length = int(content_length) if content_length is not None and not chunked else None
+        if length == 0:
+            upstream.finish(conn, keep_alive)
+            return HTTPResponse(status, reason, forwarded_headers, b'')
+        upstream_body = RequestBody(conn.reader, length=length, chunked=chunked, max_size=UNBOUNDED)
+        return HTTPResponse(status, reason, forwarded_headers,
+                            UpstreamBody(upstream, conn, upstream_body, keep_alive and not until_close, until_close))
+
+
+class UpstreamBody:
+    """Streams an upstream response body; the connection returns to the pool only once fully read.
+
+    ``close()`` releases the connection when the body is abandoned, including
+    when it is never iterated (HEAD or a failed send).
+    """
+
+    def __init__(self, upstream: Upstream, conn: UpstreamConnection, body: RequestBody, keep_alive: bool,
+                 until_close: bool = False):
+        self._upstream = upstream
+        self._conn = conn
+        self._body = body
+        self._keep_alive = keep_alive
+        self._until_close = until_close
+        self._released = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            if self._until_close:
+                while True:
+                    chunk = self._conn.reader.read(65536)
+                    if not chunk:
+                        break
+                    yield chunk
+            else:
+                yield from self._body
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._upstream.finish(self._conn, self._keep_alive and self._body.complete)
+
+    __del__ = close
+
+
+class _RetryableError(Exception):
+    """Failure before the upstream sent any response byte."""
+
+
+class _ClientBodyError(Exception):
+    """Reading the client's request body failed while forwarding it."""
+
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
@@ -0,0 +1,117 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .handlers import HTTPError
+
+
+class RateLimited(HTTPError):
+    def __init__(self, retry_after: float):
+        super().__init__(429, 'Too Many Requests')
+        self.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+
+
+def client_key(addr: Any) -> str:
+    """Limiter key for a peer address; Unix socket peers share one key."""
+    if isinstance(addr, tuple) and addr:
+        return addr[0]
+    return 'local'
+
+
+class TokenBucketTable:
+    """Token buckets per key, refilled lazily on access.
+
+    Each bucket is just ``[tokens, last_seen]``, so a check costs O(1) and no
+    timer runs. Only the ``max_keys`` most recently seen keys are kept. An
+    evicted key starts again with a full bucket, which equals the state it
+    would have reached after idling anyway.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: 'OrderedDict[Hashable, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take ``cost`` tokens; returns ``(allowed, seconds until enough tokens)``."""
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return True, 0.0
+            self.rejected += 1
+            return False, (cost - bucket[0]) / self.rate if self.rate else math.inf
+
+
+class ConnectionLimiter:
+    """Caps concurrent connections per key; counts are dropped when they reach zero."""
+
+    def __init__(self, max_per_key: int):
+        self.max_per_key = max_per_key
+        self._counts: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, key: Hashable) -> bool:
+        with self._lock:
+            count = self._counts.get(key, 0)
+            if count >= self.max_per_key:
+                self.rejected += 1
+                return False
+            self._counts[key] = count + 1
+            return True
+
+    def release(self, key: Hashable):
+        with self._lock:
+            count = self._counts.get(key, 0) - 1
+            if count > 0:
+                self._counts[key] = count
+            else:
+                self._counts.pop(key, None)
+
+    def active(self, key: Hashable) -> int:
+        return self._counts.get(key, 0)
+
+
+class RateLimitedHandler:
+    """Per-route token bucket keyed on the client address."""
+
+    def __init__(self, func: Callable, rate: float, burst: float, max_keys: int = 10000):
+        self.func = func
+        self.buckets = TokenBucketTable(rate, burst, max_keys)
+
+    def __call__(self, path: str, params: Dict[str, Any], request=None):
+        allowed, retry_after = self.buckets.allow(client_key(request.client if request is not None else None))
+        if not allowed:
+            raise RateLimited(retry_after)
+        return self.func(path, params, request)
+
+
+class ClientLimits:
+    """Server-wide per-IP request rate and concurrent-connection caps (0 disables either)."""
+
+    def __init__(self, rate: float = 0.0, burst: float = 50, max_connections: int = 0, max_keys: int = 10000):
+        self.requests: Optional[TokenBucketTable] = TokenBucketTable(rate, burst, max_keys) if rate > 0 else None
+        self.connections: Optional[ConnectionLimiter] = ConnectionLimiter(max_connections) if max_connections > 0 else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.connections is not None
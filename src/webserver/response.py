@@ -1,34 +1,114 @@
 from dataclasses import dataclass, field
-from typing import Dict, Union
+from typing import AsyncIterable, Dict, Iterable, Iterator, List, Union
 from .utils import http_date
 
+# A response body is either complete bytes or an (async) iterable of byte chunks
+# that is streamed to the client as it is produced.
+Body = Union[bytes, Iterable[bytes], AsyncIterable[bytes], None]
+
+def is_streaming(body: Body) -> bool:
+    # str is iterable too, but one character per chunk is not a stream.
+    return body is not None and not isinstance(body, (bytes, bytearray, memoryview, str))
+
+# A list value sends the header once per item (e.g. several Set-Cookie lines).
+HeaderValue = Union[str, List[str]]
+
 @dataclass
 class HTTPResponse:
     status_code: int
     reason: str
-    headers: Dict[str, str] = field(default_factory=dict)
-    body: Union[bytes, None] = None
+    headers: Dict[str, HeaderValue] = field(default_factory=dict)
+    body: Body = None
 
-    def to_bytes(self) -> bytes:
+    @property
+    def streaming(self) -> bool:
+        return is_streaming(self.body)
+
+    @property
+    def chunked(self) -> bool:
+        return self.headers.get('Transfer-Encoding') == 'chunked'
+
+    def head_bytes(self) -> bytes:
         status_line = f"HTTP/1.1 {self.status_code} {self.reason}\r\n"
-        hdrs = ''.join(f"{k}: {v}\r\n" for k, v in self.headers.items())
+        hdrs = ''.join(f"{k}: {v}\r\n" for k, values in self.headers.items()
+                       for v in (values if isinstance(values, list) else (values,)))
         end = '\r\n'
-        return (status_line + hdrs + end).encode('iso-8859-1') + (self.body or b'')
+        return (status_line + hdrs + end).encode('iso-8859-1')
+
+    def to_bytes(self) -> bytes:
+        if self.streaming:
+            raise TypeError('Streaming responses must be sent with iter_encoded()')
+        return self.head_bytes() + (self.body or b'')
+
+    def iter_encoded(self) -> Iterator[bytes]:
+        """Yield the body of a streaming response framed for the wire.
+
+        Chunked responses get one chunk per non-empty piece plus the terminating
+        zero-size chunk; otherwise pieces are passed through unchanged and the
+        connection close marks the end of the body.
+        """
+        chunked = self.chunked
+        for piece in self.body:
+            if not piece:
+                continue
+            yield b'%x\r\n%s\r\n' % (len(piece), piece) if chunked else piece
+        if chunked:
+            yield b'0\r\n\r\n'
 
 REASONS = {
     200: 'OK',
+    301: 'Moved Permanently',
+    304: 'Not Modified',
     400: 'Bad Request',
+    403: 'Forbidden',
     404: 'Not Found',
-    500: 'Internal Server Error'
+    405: 'Method Not Allowed',
+    413: 'Content Too Large',
+    429: 'Too Many Requests',
+    500: 'Internal Server Error',
+    502: 'Bad Gateway',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout'
 }
 
-def make_response(status_code: int, body: bytes = b'', content_type: str = 'text/plain; charset=utf-8', keep_alive: bool = True, server_name: str = 'PyNetLite/0.1') -> HTTPResponse:
+def make_response(status_code: int, body: Body = b'', content_type: str = 'text/plain; charset=utf-8', keep_alive: bool = True, server_name: str = 'PyNetLite/0.1', chunked: bool = True) -> HTTPResponse:
+    """Build a response. Iterable bodies use chunked framing, or connection close when ``chunked`` is False (HTTP/1.0)."""
     reason = REASONS.get(status_code, 'OK')
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    streaming = is_streaming(body)
+    if streaming and not chunked:
+        keep_alive = False
     headers = {
         'Date': http_date(),
         'Server': server_name,
-        'Content-Length': str(len(body)),
         'Content-Type': content_type,
         'Connection': 'keep-alive' if keep_alive and status_code < 500 else 'close'
     }
-    return HTTPResponse(status_code=status_code, reason=reason, headers=headers, body=body if body else b'' )
+    if streaming:
+        if chunked:
+            headers['Transfer-Encoding'] = 'chunked'
+    else:
+        headers['Content-Length'] = str(len(body))
+    return HTTPResponse(status_code=status_code, reason=reason, headers=headers, body=body if streaming or body else b'')
+
+def finalize_response(resp: HTTPResponse, keep_alive: bool = True, server_name: str = 'PyNetLite/0.1', chunked: bool = True) -> HTTPResponse:
+    """Add connection-level headers to a response a handler built itself (e.g. a proxied one).
+
+    Existing end-to-end headers are kept; framing follows the same rules as ``make_response``.
+    """
+    present = {name.lower() for name in resp.headers}
+    if 'date' not in present:
+        resp.headers['Date'] = http_date()
+    if 'server' not in present:
+        resp.headers['Server'] = server_name
+    if resp.streaming:
+        if 'content-length' not in present:
+            if chunked:
+                resp.headers['Transfer-Encoding'] = 'chunked'
+            else:
+                keep_alive = False
+    elif 'content-length' not in present and resp.status_code not in (204, 304):
+        resp.headers['Content-Length'] = str(len(resp.body or b''))
+    resp.headers['Connection'] = 'keep-alive' if keep_alive and resp.status_code < 500 else 'close'
+    return resp
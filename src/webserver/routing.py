@@ -1,25 +1,255 @@
+import hashlib
 import json
 import time
-from typing import Callable, Dict, Tuple
+import urllib.parse
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from .cache import ResponseCache
+from .handlers import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, CachedHandler, wrap_handler
+from .http import SUPPORTED_METHODS, HTTPRequest
+from .proxy import ProxyHandler, UpstreamPool
+from .ratelimit import RateLimitedHandler
 from .utils import parse_query, url_decode
 
-Handler = Callable[[str, Dict[str, str]], Tuple[bytes, str]]  # returns (body, content_type)
+Handler = Callable[[str, Dict[str, Any]], Tuple[bytes, str]]  # returns (body, content_type)
+# Routes registered with pass_request=True also receive the HTTPRequest (and its body).
+RequestHandler = Callable[[str, Dict[str, Any], HTTPRequest], Tuple[bytes, str]]
+
+DEFAULT_METHODS = frozenset({'GET', 'HEAD'})
+CACHEABLE_METHODS = frozenset({'GET', 'HEAD'})
+
+def _to_int(seg: str) -> int:
+    # int() would also take '1_0', ' 1' and '+1'; only plain ASCII digits name the same resource.
+    if not (seg.isascii() and seg.isdigit()):
+        raise ValueError(f'Not an integer segment: {seg!r}')
+    return int(seg)
+
+
+# Converter name -> (parse function, priority). Lower priority is tried first so
+# '/users/{id:int}' wins over '/users/{name}' for numeric segments.
+_CONVERTERS: Dict[str, Tuple[Callable[[str], Any], int]] = {
+    'int': (_to_int, 0),
+    'float': (float, 1),
+    'str': (str, 2),
+}
+
+
+class MethodNotAllowed(Exception):
+    def __init__(self, allowed: Iterable[str]):
+        self.allowed = sorted(allowed)
+        super().__init__('Method not allowed')
+
+
+class _Node:
+    __slots__ = ('static', 'params', 'catchall', 'handlers', 'mount')
 
-class Router:
     def __init__(self):
-        self._routes: Dict[str, Handler] = {}
-        self.register('/api/time', self._time)
-        self.register('/api/echo', self._echo)
+        self.static: Dict[str, '_Node'] = {}
+        self.params: List[Tuple[str, str, Callable[[str], Any], '_Node']] = []
+        self.catchall: Optional[Tuple[str, '_Node']] = None  # '{name:path}' segment
+        self.handlers: Dict[str, Handler] = {}
+        self.mount: Optional['Router'] = None
+
+
+def _split(path: str) -> List[str]:
+    return [urllib.parse.unquote(seg) for seg in path.split('/') if seg]
+
+
+def _parse_param(segment: str) -> Optional[Tuple[str, str]]:
+    if not (segment.startswith('{') and segment.endswith('}')):
+        return None
+    name, _, conv = segment[1:-1].partition(':')
+    conv = conv or 'str'
+    if conv != 'path' and conv not in _CONVERTERS:
+        raise ValueError(f'Unknown path converter: {conv}')
+    return name, conv
+
+
+class Router:
+    """Dispatches dynamic paths through a segment trie.
 
-    def register(self, path: str, handler: Handler):
-        self._routes[path] = handler
+    Patterns may mix static segments, typed parameters (``{id:int}``,
+    ``{name}``) and a trailing ``{rest:path}`` catch-all; whole routers can be
+    mounted under a prefix. Lookup cost depends on path depth, not on the
+    number of registered routes.
+    """
 
-    def dispatch(self, path: str) -> Tuple[bytes, str]:
+    def __init__(self, builtin: bool = True, response_cache: Optional[ResponseCache] = None):
+        self._root = _Node()
+        self.response_cache = response_cache or ResponseCache()
+        self.upstreams: Dict[str, UpstreamPool] = {}  # proxy prefix -> pool
+        if builtin:
+            self.register('/api/time', self._time)
+            self.register('/api/echo', self._echo, cache_ttl=60)
+            self.register('/api/upload', self._upload, methods=['POST', 'PUT'], pass_request=True)
+
+    def register(self, path: str, handler: Handler, methods: Optional[Iterable[str]] = None,
+                 blocking: bool = False, executor: str = 'thread', max_concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT, cache_ttl: Optional[float] = None,
+                 pass_request: bool = False, rate_limit: Optional[Tuple[float, float]] = None):
+        """Register ``handler`` for ``path``.
+
+        ``async def`` handlers run on the shared handler event loop; ``blocking=True``
+        handlers run on a thread or process pool (``executor``) with at most
+        ``max_concurrency`` calls in flight. Both are bounded by ``timeout`` seconds.
+        ``cache_ttl`` opts a GET route into the router's response cache.
+        ``pass_request=True`` handlers get the :class:`HTTPRequest` as a third
+        argument, e.g. to stream ``request.body``. ``rate_limit=(rate, burst)`` adds a
+        per-client token bucket answering 429 when empty.
+        """
+        allowed = self._methods(methods)
+        if cache_ttl is not None and not allowed <= CACHEABLE_METHODS:
+            raise ValueError('Only GET/HEAD routes can be cached')
+        handler = wrap_handler(handler, blocking, executor, max_concurrency, timeout, pass_request)
+        if cache_ttl is not None:
+            handler = CachedHandler(handler, self.response_cache, cache_ttl)
+        if rate_limit is not None:
+            handler = RateLimitedHandler(handler, *rate_limit)
+        node = self._root
+        segments = [seg for seg in path.split('/') if seg]
+        for i, seg in enumerate(segments):
+            param = _parse_param(seg)
+            if param is None:
+                node = node.static.setdefault(seg, _Node())
+                continue
+            name, conv = param
+            if conv == 'path':
+                if i != len(segments) - 1:
+                    raise ValueError('{name:path} must be the last segment')
+                if node.catchall is None:
+                    node.catchall = (name, _Node())
+                elif node.catchall[0] != name:
+                    raise ValueError(f'Conflicting catch-all parameter at {path}')
+                node = node.catchall[1]
+                continue
+            for p_name, p_conv, _fn, child in node.params:
+                if p_conv == conv:
+                    if p_name != name:
+                        raise ValueError(f'Conflicting parameter names at {path}')
+                    node = child
+                    break
+            else:
+                fn, _prio = _CONVERTERS[conv]
+                child = _Node()
+                node.params.append((name, conv, fn, child))
+                node.params.sort(key=lambda p: _CONVERTERS[p[1]][1])
+                node = child
+        for method in allowed:
+            node.handlers[method] = handler
+
+    def route(self, path: str, methods: Optional[Iterable[str]] = None, **options):
+        def decorator(handler: Handler) -> Handler:
+            self.register(path, handler, methods, **options)
+            return handler
+        return decorator
+
+    def proxy(self, prefix: str, upstreams: Iterable[str], strip_prefix: bool = False, **pool_options) -> UpstreamPool:
+        """Forward every method under ``prefix`` to ``upstreams`` (``host:port`` strings).
+
+        ``pool_options`` go to :class:`UpstreamPool` (``balance``, ``timeout``,
+        ``health_path``, ...). With ``strip_prefix`` the upstream sees paths
+        relative to ``prefix``.
+        """
+        return self.add_proxy(prefix, UpstreamPool(list(upstreams), **pool_options), strip_prefix)
+
+    def add_proxy(self, prefix: str, pool: UpstreamPool, strip_prefix: bool = False) -> UpstreamPool:
+        """Forward ``prefix`` to an existing pool, e.g. one already serving another router."""
+        handler = ProxyHandler(pool, prefix, strip_prefix)
+        self.register(prefix.rstrip('/') + '/{rest:path}', handler, methods=SUPPORTED_METHODS, pass_request=True)
+        self.upstreams[prefix] = pool
+        return pool
+
+    def mount(self, prefix: str, router: 'Router'):
+        node = self._root
+        for seg in (seg for seg in prefix.split('/') if seg):
+            if _parse_param(seg) is not None:
+                raise ValueError('Mount prefixes must be static')
+            node = node.static.setdefault(seg, _Node())
+        node.mount = router
+
+    @staticmethod
+    def _methods(methods: Optional[Iterable[str]]) -> FrozenSet[str]:
+        if methods is None:
+            return DEFAULT_METHODS
+        result = {m.upper() for m in methods}
+        if 'GET' in result:
+            result.add('HEAD')
+        return frozenset(result)
+
+    def _match(self, node: _Node, segments: List[str], i: int, params: Dict[str, Any]) -> Optional[_Node]:
+        if i == len(segments):
+            if node.handlers:
+                return node
+            if node.catchall is not None and node.catchall[1].handlers:
+                params[node.catchall[0]] = ''
+                return node.catchall[1]
+            return None
+        seg = segments[i]
+        child = node.static.get(seg)
+        if child is not None:
+            found = self._match(child, segments, i + 1, params)
+            if found is not None:
+                return found
+        for name, _conv, fn, child in node.params:
+            try:
+                value = fn(seg)
+            except ValueError:
+                continue
+            params[name] = value
+            found = self._match(child, segments, i + 1, params)
+            if found is not None:
+                return found
+            del params[name]
+        if node.catchall is not None and node.catchall[1].handlers:
+            params[node.catchall[0]] = '/'.join(segments[i:])
+            return node.catchall[1]
+        return None
+
+    def _lookup(self, segments: List[str], params: Dict[str, Any]) -> Optional[_Node]:
+        found = self._match(self._root, segments, 0, params)
+        if found is not None:
+            return found
+        # Fall back to the deepest mounted sub-router along the path.
+        node = self._root
+        mounted: Optional[Tuple[Router, int]] = None
+        for i, seg in enumerate(segments):
+            if node.mount is not None:
+                mounted = (node.mount, i)
+            node = node.static.get(seg)
+            if node is None:
+                break
+        else:
+            if node.mount is not None:
+                mounted = (node.mount, len(segments))
+        if mounted is None:
+            return None
+        sub, offset = mounted
+        return sub._lookup(segments[offset:], params)
+
+    def resolve(self, method: str, path: str) -> Optional[Tuple[RequestHandler, Dict[str, Any]]]:
+        """Return ``(handler, params)`` for a request, ``None`` when no route matches.
+
+        The returned handler is called as ``handler(path, params, request)``.
+
+        Raises :class:`MethodNotAllowed` when the path matches but the method does not.
+        """
         base, _, query = path.partition('?')
-        if base in self._routes:
-            params = parse_query(query)
-            return self._routes[base](base, params)
-        raise KeyError('No dynamic route')
+        path_params: Dict[str, Any] = {}
+        node = self._lookup(_split(base), path_params)
+        if node is None:
+            return None
+        handler = node.handlers.get(method.upper())
+        if handler is None:
+            raise MethodNotAllowed(node.handlers)
+        params = parse_query(query)
+        params.update(path_params)
+        return handler, params
+
+    def dispatch(self, path: str, method: str = 'GET', request: Optional[HTTPRequest] = None) -> Tuple[bytes, str]:
+        match = self.resolve(method, path)
+        if match is None:
+            raise KeyError('No dynamic route')
+        handler, params = match
+        return handler(path.partition('?')[0], params, request)
 
     # Handlers
     def _time(self, _path: str, _params: Dict[str, str]):
@@ -31,4 +261,13 @@ class Router:
         body = json.dumps({'echo': url_decode(msg)}).encode('utf-8')
         return body, 'application/json'
 
+    def _upload(self, _path: str, _params: Dict[str, str], request: HTTPRequest):
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in request.body if request.body is not None else ():  # no body, or Content-Length: 0
+            digest.update(chunk)
+            size += len(chunk)
+        body = json.dumps({'bytes': size, 'sha256': digest.hexdigest()}).encode('utf-8')
+        return body, 'application/json'
+
 router = Router()
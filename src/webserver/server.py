@@ -1,113 +1,781 @@
 import argparse
+import math
 import socket
+import signal
+import ssl
+import sys
 import threading
+import time
 import os
+import urllib.parse
+from dataclasses import dataclass
+from email.utils import formatdate
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, Dict, Optional, Tuple
 
+from .body import BodyTooLarge, BodyTooSlow, RequestBody
 from .config import ServerConfig
-from .http import parse_request, HTTPParseError
-from .response import make_response
-from .utils import log, guess_mime, safe_path
+from .http import HTTPRequest, parse_request, HTTPParseError
+from .response import Body, HTTPResponse, finalize_response, make_response
+from .utils import log, guess_mime, parse_query, safe_path, set_log_enabled, set_log_level
 from .cache import LRUCache
-from .routing import router
+from .routing import Router, router, MethodNotAllowed
+from .handlers import HandlerBusy, HandlerTimeout, HTTPError, iterate_async
+from . import autoindex, http2
+from .admin import RuntimeControl, register_control_routes
+from .assets import IMMUTABLE, REVALIDATE, AssetHasher
+from .http2 import H2Session, H2Stream
+from .idle import IdleManager
+from .listeners import bind_listener, describe, format_address, is_local, open_listeners, peer_address, remove_socket_files
+from .ratelimit import ClientLimits, RateLimited, client_key
+from .stats import connections, metrics
+from .stream import DeadlineExceeded, SocketReader, send_all, send_file
+from .tls import TLSContext
+from .tracing import ADMIN_SOCKET_PEER, RequestTrace, SlowRequestLog, register_admin_routes
+from .vhosts import VirtualHost, VirtualHostTable, build_site
+from .workers import WorkerPool
 
 
-def handle_connection(conn: socket.socket, addr: Tuple[str, int], config: ServerConfig, cache: LRUCache):
-    conn.settimeout(config.timeout)
-    requests_handled = 0
+def send_response(conn: socket.socket, config: ServerConfig, status: int, body: Body, content_type: str = 'text/plain',
+                  keep_alive: bool = True, headers: Optional[Dict[str, str]] = None, head_only: bool = False,
+                  chunked: bool = True) -> bool:
+    """Send a complete or streaming response. Returns whether the connection can be reused."""
+    if hasattr(body, '__aiter__'):
+        body = iterate_async(body)
+    resp = make_response(status, body, content_type, keep_alive=keep_alive, server_name=config.server_name, chunked=chunked)
+    if headers:
+        resp.headers.update(headers)
+    return write_response(conn, config, resp, head_only)
+
+
+def write_response(conn: socket.socket, config: ServerConfig, resp: HTTPResponse, head_only: bool = False) -> bool:
+    """Send a prepared response. Returns whether the connection can be reused."""
+    if isinstance(conn, H2Stream):
+        conn.respond(resp, head_only)
+        return True
+    connections.set(id(conn), 'sending')
     try:
-        while requests_handled < config.max_conn_requests:
-            # Read headers
-            data_chunks = []
-            header_complete = False
-            while True:
+        if not resp.streaming:
+            send_all(conn, resp.head_bytes() if head_only else resp.to_bytes(), config.min_send_rate, config.send_grace)
+            return resp.headers['Connection'] == 'keep-alive'
+        send_all(conn, resp.head_bytes(), config.min_send_rate, config.send_grace)
+        if head_only:
+            close = getattr(resp.body, 'close', None)
+            if close is not None:
+                close()
+            return resp.headers['Connection'] == 'keep-alive'
+        # Each piece goes out as soon as the handler yields it.
+        for piece in resp.iter_encoded():
+            send_all(conn, piece, config.min_send_rate, config.send_grace)
+        return resp.headers['Connection'] == 'keep-alive'
+    except DeadlineExceeded:
+        connections.record_drop('slow_send')
+        raise
+
+
+def send_file_response(conn: socket.socket, config: ServerConfig, f, size: int, content_type: str,
+                       keep_alive: bool = True, head_only: bool = False, headers: Optional[Dict[str, str]] = None) -> bool:
+    resp = make_response(200, b'', content_type, keep_alive=keep_alive, server_name=config.server_name)
+    resp.headers['Content-Length'] = str(size)
+    resp.headers.update(headers or {})
+    if isinstance(conn, H2Stream):
+        conn.respond(resp, head_only, file=f, size=size)
+        return True
+    connections.set(id(conn), 'sending')
+    try:
+        send_all(conn, resp.head_bytes(), config.min_send_rate, config.send_grace)
+        if not head_only:
+            send_file(conn, f, size, config.min_send_rate, config.send_grace)
+    except DeadlineExceeded:
+        connections.record_drop('slow_send')
+        raise
+    return resp.headers['Connection'] == 'keep-alive'
+
+
+def etag_matches(request: HTTPRequest, etag: str) -> bool:
+    return etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]
+
+
+def send_not_modified(conn: socket.socket, config: ServerConfig, headers: Dict[str, str], keep_alive: bool = True) -> bool:
+    resp = make_response(304, b'', keep_alive=keep_alive, server_name=config.server_name)
+    del resp.headers['Content-Length'], resp.headers['Content-Type']
+    resp.headers.update(headers)
+    return write_response(conn, config, resp, head_only=True)
+
+
+def send_listing(conn: socket.socket, config: ServerConfig, request: HTTPRequest, directory: Path,
+                 keep_alive: bool = True) -> Tuple[int, bool]:
+    """Autoindex page of ``directory`` (HTML, or JSON on request). Returns (status, keep_alive)."""
+    try:
+        listing = autoindex.listings.get(str(directory))
+    except OSError:
+        return 403, send_response(conn, config, 403, b'Forbidden', keep_alive=keep_alive)
+    url_path, _, query = request.path.partition('?')
+    params = parse_query(query)
+    fmt = 'json' if autoindex.wants_json(params, request.headers.get('accept')) else 'html'
+    etag = listing.etag(fmt)
+    headers = {'ETag': etag, 'Vary': 'Accept', 'Cache-Control': 'no-cache',
+               'Last-Modified': formatdate(listing.mtime_ns / 1e9, usegmt=True)}
+    if etag_matches(request, etag):
+        return 304, send_not_modified(conn, config, headers, keep_alive)
+    try:
+        page = int(params.get('page', 1))
+    except ValueError:
+        page = 1
+    body = autoindex.render(listing, urllib.parse.unquote(url_path), fmt, page, config.autoindex_page_size)
+    ctype = 'application/json' if fmt == 'json' else 'text/html; charset=utf-8'
+    return 200, send_response(conn, config, 200, body, ctype, keep_alive=keep_alive, headers=headers,
+                              head_only=request.method == 'HEAD', chunked=request.version != 'HTTP/1.0')
+
+
+def attach_body(request: HTTPRequest, conn: socket.socket, reader: SocketReader, config: ServerConfig):
+    length = request.content_length
+    if not request.chunked and not length:
+        return
+    if length is not None and length > config.max_body_size:
+        raise BodyTooLarge('Request body too large')
+
+    def send_continue():
+        if request.expects_continue:
+            send_all(conn, b'HTTP/1.1 100 Continue\r\n\r\n', config.min_send_rate, config.send_grace)
+    request.body = RequestBody(reader, length=length, chunked=request.chunked, max_size=config.max_body_size,
+                               spool_threshold=config.body_spool_threshold, on_first_read=send_continue,
+                               min_rate=config.min_recv_rate, grace=config.recv_grace)
+
+
+def finish_body(request: HTTPRequest) -> bool:
+    """Skip whatever the handler left unread so the next request starts cleanly; False to close instead.
+
+    A client waiting for ``100 Continue`` that was never sent gets the connection
+    closed: the final response is already out, so it must not see a 100 now.
+    """
+    if not request.body.started and request.expects_continue:
+        return False
+    try:
+        request.body.drain()
+    except BodyTooSlow:
+        connections.record_drop('slow_body')
+        return False
+    except HTTPParseError:
+        return False
+    return request.body.complete
+
+
+def handle_request(conn: socket.socket, addr: Tuple[str, int], request: HTTPRequest, config: ServerConfig, cache: LRUCache,
+                   keep_alive: bool = True, trace: Optional[RequestTrace] = None, site: Optional[VirtualHost] = None,
+                   assets: Optional[AssetHasher] = None) -> bool:
+    """Serve one parsed request. Returns False when the connection must be closed.
+
+    ``site`` replaces the document root, router and cache with a virtual host's own.
+    With ``assets``, hashed file names are served as immutable and the rest must revalidate.
+    """
+    path = request.path
+    keep_alive = keep_alive and request.keep_alive
+    root, routes = config.root, router
+    if site is not None:
+        root, routes, cache = site.root, site.router, site.cache
+    # Dynamic route check
+    try:
+        match = routes.resolve(request.method, path)
+    except MethodNotAllowed as e:
+        send_response(conn, config, 405, b'Method Not Allowed', keep_alive=keep_alive, headers={'Allow': ', '.join(e.allowed)})
+        log('WARN', f"{addr} {request.method} {path} 405")
+        return keep_alive
+    if match is not None:
+        handler, params = match
+        try:
+            result = handler(path.partition('?')[0], params, request)
+        except HandlerBusy:
+            send_response(conn, config, 503, b'Service Unavailable', keep_alive=keep_alive, headers={'Retry-After': '1'})
+            log('WARN', f"{addr} {request.method} {path} 503 (busy)")
+        except HandlerTimeout:
+            send_response(conn, config, 504, b'Gateway Timeout', keep_alive=keep_alive)
+            log('WARN', f"{addr} {request.method} {path} 504 (handler timeout)")
+        except HTTPError as e:
+            send_response(conn, config, e.status, str(e).encode(), keep_alive=keep_alive, headers=e.headers)
+            log('WARN', f"{addr} {request.method} {path} {e.status}")
+        except (OSError, HTTPParseError):
+            raise  # connection errors, and malformed bodies answered with 400/413 by the caller
+        except Exception as e:
+            log('ERROR', f"{addr} {request.method} {path} handler failed: {e!r}")
+            send_response(conn, config, 500, b'Internal Server Error', keep_alive=False)
+            return False
+        else:
+            if trace is not None:
+                trace.mark('handler_done')
+            head_only, chunked = request.method == 'HEAD', request.version == 'HTTP/1.1'
+            # Handlers return (body, content_type), or a complete HTTPResponse (status and headers of their own).
+            status = result.status_code if isinstance(result, HTTPResponse) else 200
+            try:
+                if isinstance(result, HTTPResponse):
+                    resp = finalize_response(result, keep_alive, config.server_name, chunked)
+                    keep_alive = write_response(conn, config, resp, head_only)
+                else:
+                    body, ctype = result
+                    keep_alive = send_response(conn, config, 200, body, ctype, keep_alive=keep_alive,
+                                               head_only=head_only, chunked=chunked)
+            except OSError:
+                raise
+            except Exception as e:
+                # Headers are already out, so a failing stream can only be cut short.
+                log('ERROR', f"{addr} {request.method} {path} stream aborted: {e}")
+                return False
+            log('INFO', f"{addr} {request.method} {path} {status} (dynamic)")
+        return keep_alive
+    if request.method not in ('GET', 'HEAD'):
+        send_response(conn, config, 405, b'Method Not Allowed', keep_alive=keep_alive, headers={'Allow': 'GET, HEAD'})
+        log('WARN', f"{addr} {request.method} {path} 405")
+        return keep_alive
+    # Static file
+    url_path, _, query = path.partition('?')
+    hashed = None
+    if assets is not None:
+        if url_path == config.asset_manifest_path:
+            body, etag = assets.manifest_json()
+            headers = {'ETag': etag, 'Cache-Control': REVALIDATE}
+            if etag_matches(request, etag):
+                log('INFO', f"{addr} {request.method} {path} 304 (manifest)")
+                return send_not_modified(conn, config, headers, keep_alive)
+            log('INFO', f"{addr} {request.method} {path} 200 (manifest)")
+            return send_response(conn, config, 200, body, 'application/json', keep_alive=keep_alive, headers=headers,
+                                 head_only=request.method == 'HEAD')
+        hashed = assets.resolve(urllib.parse.unquote(url_path).lstrip('/'))
+    p = Path(assets.root, hashed.logical) if hashed is not None else Path(safe_path(root, path))
+    if url_path == '/' and not p.exists():  # safe_path maps the root to its index.html
+        p = p.parent
+    if p.is_dir():
+        if not url_path.endswith('/'):
+            location = urllib.parse.quote(urllib.parse.unquote(url_path)) + '/' + ('?' + query if query else '')
+            send_response(conn, config, 301, b'Moved Permanently', keep_alive=keep_alive, headers={'Location': location})
+            log('INFO', f"{addr} {request.method} {path} 301")
+            return keep_alive
+        if (p / 'index.html').is_file():
+            p = p / 'index.html'
+        elif config.autoindex:
+            if trace is not None:
+                trace.mark('handler_done')
+            status, keep_alive = send_listing(conn, config, request, p, keep_alive)
+            log('INFO', f"{addr} {request.method} {path} {status} (autoindex)")
+            return keep_alive
+    if not p.exists() or not p.is_file():
+        send_response(conn, config, 404, b'Not Found', keep_alive=keep_alive)
+        log('WARN', f"{addr} {request.method} {path} 404")
+        return keep_alive
+    headers = None
+    asset = None
+    if assets is not None:
+        asset = hashed or assets.lookup(os.path.relpath(os.path.abspath(p), assets.root).replace(os.sep, '/'))
+        headers = {'Cache-Control': IMMUTABLE if hashed is not None else REVALIDATE}
+        if asset is not None:
+            headers['ETag'] = f'"{asset.digest}"'
+            if etag_matches(request, headers['ETag']):
+                log('INFO', f"{addr} {request.method} {path} 304")
+                return send_not_modified(conn, config, headers, keep_alive)
+    # Hashed files are cached per digest, so new content is never served from the old one's entry.
+    key = assets.cache_key(asset) if asset is not None else str(p)
+    cached = cache.get(key) if config.cache_enabled else None
+    mime = guess_mime(str(p))
+    if cached is None:
+        try:
+            size = p.stat().st_size
+            # Too big to cache: stream from disk instead of holding it in memory.
+            large = p.open('rb') if size > config.cache_max_file_size else None
+            content = p.read_bytes() if large is None else b''
+        except OSError:
+            send_response(conn, config, 500, b'Internal Server Error', keep_alive=False)
+            log('ERROR', f"{addr} {request.method} {path} 500 read error")
+            return False
+        if large is not None:
+            with large:
+                if trace is not None:
+                    trace.mark('handler_done')
+                keep_alive = send_file_response(conn, config, large, size, mime, keep_alive, request.method == 'HEAD',
+                                                headers)
+            log('INFO', f"{addr} {request.method} {path} 200 (sendfile)")
+            return keep_alive
+        if asset is not None and assets.lookup(asset.logical) is not asset:
+            # Rewritten since it was hashed: these bytes do not match the digest.
+            if hashed is not None:
+                send_response(conn, config, 404, b'Not Found', keep_alive=keep_alive)
+                log('WARN', f"{addr} {request.method} {path} 404 (changed since hashed)")
+                return keep_alive
+            headers.pop('ETag', None)
+        elif config.cache_enabled:
+            cache.put(key, content)
+    else:
+        content = cached
+    if trace is not None:
+        trace.mark('handler_done')
+    send_response(conn, config, 200, content, mime, keep_alive=keep_alive, headers=headers,
+                  head_only=request.method == 'HEAD')
+    source = 'cache' if cached is not None else 'disk'
+    log('INFO', f"{addr} {request.method} {path} 200 ({source})")
+    return keep_alive
+
+
+@dataclass
+class ServerContext:
+    config: ServerConfig
+    cache: LRUCache
+    slow_log: Optional[SlowRequestLog] = None
+    idle: Optional[IdleManager] = None
+    workers: Optional[WorkerPool] = None
+    streams: Optional[WorkerPool] = None  # HTTP/2 stream handlers; their session readers hold connection workers
+    limits: Optional[ClientLimits] = None
+    tls: Optional[TLSContext] = None
+    sites: Optional[VirtualHostTable] = None
+    assets: Optional[AssetHasher] = None
+
+
+def serve_request(ctx: ServerContext, conn: socket.socket, addr, request: HTTPRequest, keep_alive: bool = True,
+                  trace: Optional[RequestTrace] = None) -> bool:
+    """Pick the virtual host from the Host header, then serve the request."""
+    started = time.perf_counter()
+    try:
+        site = None
+        if ctx.sites is not None:
+            site = ctx.sites.lookup(request.headers.get('host'))
+            if site is None:
+                send_response(conn, ctx.config, 404, b'Unknown host', keep_alive=keep_alive and request.keep_alive)
+                log('WARN', f"{addr} {request.method} {request.path} 404 (unknown host {request.headers.get('host')!r})")
+                return keep_alive and request.keep_alive
+        assets = site.assets if site is not None else ctx.assets
+        return handle_request(conn, addr, request, ctx.config, ctx.cache, keep_alive, trace, site, assets)
+    finally:
+        metrics.record_request((time.perf_counter() - started) * 1000)
+
+
+def has_pending(sock: socket.socket) -> bool:
+    """Decrypted TLS bytes waiting inside the SSL object, which a selector cannot see."""
+    return isinstance(sock, ssl.SSLSocket) and sock.pending() > 0
+
+
+class Connection:
+    __slots__ = ('sock', 'addr', 'key', 'reader', 'requests_handled', 'ready_at', 'on_close', 'tls_pending', 'h2',
+                 'header_deadline')
+
+    def __init__(self, sock: socket.socket, addr: Tuple[str, int], recv_buffer: int):
+        self.sock = sock
+        self.addr = addr
+        self.key = client_key(addr)
+        self.reader = SocketReader(sock, recv_buffer)
+        self.requests_handled = 0
+        self.ready_at: Optional[float] = None  # perf_counter when the connection became readable (tracing only)
+        self.on_close: Optional[Callable[[], None]] = None
+        self.tls_pending = isinstance(sock, ssl.SSLSocket)  # handshake not done yet
+        self.h2: Optional[H2Session] = None
+        self.header_deadline: Optional[float] = None  # monotonic; set while a handshake or header block is partial
+
+    def close(self):
+        connections.clear(id(self.sock))  # also when closed in the selector, mid-headers
+        if self.h2 is not None:
+            self.h2.close()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        if self.on_close is not None:
+            on_close, self.on_close = self.on_close, None
+            on_close()
+
+
+def reject_too_many(sock: socket.socket, config: ServerConfig, retry_after: float = 1.0):
+    """Answer 429 and close without reading the request; never blocks the caller."""
+    resp = make_response(429, b'Too Many Requests', 'text/plain', keep_alive=False, server_name=config.server_name)
+    resp.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    try:
+        sock.setblocking(False)
+        # Discard what the client already sent: closing with unread data resets the
+        # connection, and the client would never see the 429.
+        for _ in range(4):
+            if not sock.recv(65536):
+                break
+    except OSError:
+        pass
+    try:
+        sock.send(resp.to_bytes())
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+def start_http2(ctx: ServerContext, conn: Connection) -> H2Session:
+    request_limit = ctx.limits.requests if ctx.limits is not None else None
+
+    def handle_stream(stream: H2Stream, request: HTTPRequest):
+        if request_limit is not None:
+            allowed, retry_after = request_limit.allow(conn.key)
+            if not allowed:
+                raise RateLimited(retry_after)
+        serve_request(ctx, stream, conn.addr, request)
+    # Not ctx.workers: a session's reader occupies a worker while its streams run, so
+    # streams queued behind readers on the same pool could wait forever.
+    conn.h2 = H2Session(conn.sock, conn.addr, ctx.config, handle_stream, ctx.streams.submit)
+    return conn.h2
+
+
+def serve_http2(ctx: ServerContext, conn: Connection, initial: bytes = b'') -> bool:
+    """Run the HTTP/2 session until no stream is open, then park it. Returns whether it was parked."""
+    connections.set(id(conn.sock), 'handling')
+    if not conn.h2.serve(initial):
+        return False
+    connections.clear(id(conn.sock))
+    ctx.idle.park(conn, ctx.config.idle_timeout)
+    return True
+
+
+def begin_header_wait(conn: Connection, timeout: float):
+    """Start the deadline for a TLS handshake or header block unless one is already running."""
+    if conn.header_deadline is None:
+        conn.header_deadline = time.monotonic() + timeout
+        connections.set(id(conn.sock), 'reading_headers')
+
+
+def park_partial(ctx: ServerContext, conn: Connection):
+    """Wait in the selector, not on a worker, for the rest of a handshake or header block."""
+    remaining = conn.header_deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded('Header read deadline exceeded')
+    ctx.idle.park(conn, remaining)
+
+
+def expire_connection(conn: Connection):
+    """Called by the idle manager when a parked connection's deadline passes."""
+    if conn.header_deadline is not None:
+        connections.record_drop('tls_handshake' if conn.tls_pending else 'header_deadline')
+
+
+def handle_connection(ctx: ServerContext, conn: Connection):
+    """Serve requests while the client has data for us, then park the connection as idle.
+
+    A partial TLS handshake or header block is parked too, so clients that trickle
+    them in hold no worker between reads.
+    """
+    config = ctx.config
+    sock, addr, reader = conn.sock, conn.addr, conn.reader
+    request_limit = ctx.limits.requests if ctx.limits is not None else None
+    parked = False
+    try:
+        if conn.tls_pending:
+            begin_header_wait(conn, config.header_timeout)
+            try:
                 try:
-                    chunk = conn.recv(config.recv_buffer)
-                except socket.timeout:
-                    log('DEBUG', f"Timeout reading from {addr}")
+                    ctx.tls.handshake(sock, 0 if ctx.idle is not None else config.header_timeout)
+                except ssl.SSLWantReadError:
+                    park_partial(ctx, conn)
+                    parked = True
                     return
-                if not chunk:
-                    return
-                data_chunks.append(chunk)
-                joined = b''.join(data_chunks)
-                if b'\r\n\r\n' in joined:
-                    header_complete = True
-                    break
-                if len(joined) > config.header_max:
-                    raise HTTPParseError('Header too large')
-            if not header_complete:
+                except ssl.SSLWantWriteError:
+                    # Our handshake flight did not fit in the send buffer: finish it here.
+                    ctx.tls.handshake(sock, max(0.0, conn.header_deadline - time.monotonic()))
+            except (ssl.SSLError, OSError) as e:
+                connections.record_drop('tls_handshake')
+                log('DEBUG', f"TLS handshake with {addr} failed: {e}")
                 return
+            conn.tls_pending = False
+            conn.header_deadline = None
+            sock.settimeout(config.timeout)
+            if config.http2 and sock.selected_alpn_protocol() == 'h2':
+                start_http2(ctx, conn)
+        if conn.h2 is not None:
+            parked = serve_http2(ctx, conn)
+            return
+        while True:
+            trace = None
+            begin_header_wait(conn, config.header_timeout)
             try:
-                request = parse_request(b''.join(data_chunks), config.header_max)
+                if ctx.slow_log is not None and conn.ready_at is None:
+                    conn.ready_at = time.perf_counter()
+                if ctx.idle is None:
+                    head = reader.read_headers(config.header_max, conn.header_deadline)
+                else:
+                    try:
+                        head = reader.poll_headers(config.header_max)
+                    except BlockingIOError:
+                        park_partial(ctx, conn)
+                        parked = True
+                        return
+                conn.header_deadline = None
+                if head is None:
+                    return
+                if ctx.slow_log is not None:
+                    trace = RequestTrace(conn.ready_at, addr)
+                    conn.ready_at = None
+                if config.http2 and conn.requests_handled == 0 and head.startswith(b'PRI * HTTP/2.0'):
+                    # h2c with prior knowledge: the preface looks like a header block.
+                    start_http2(ctx, conn)
+                    parked = serve_http2(ctx, conn, head + reader.take())
+                    return
+                if request_limit is not None:
+                    allowed, retry_after = request_limit.allow(conn.key)
+                    if not allowed:
+                        # Rejected before any parsing or handler work is spent on the request.
+                        reject_too_many(sock, config, retry_after)
+                        log('WARN', f"{addr} 429 (rate limited)")
+                        return
+                request = parse_request(head, config.header_max)
+                request.client = addr
+                attach_body(request, sock, reader, config)
+                if trace is not None:
+                    trace.first_byte = reader.first_byte_at
+                    trace.method, trace.path = request.method, request.path
+                    trace.mark('headers_parsed')
+            except socket.timeout:
+                connections.record_drop('header_deadline')
+                log('DEBUG', f"Header deadline exceeded for {addr}")
+                return
+            except BodyTooLarge as e:
+                send_response(sock, config, 413, str(e).encode(), keep_alive=False)
+                return
             except HTTPParseError as e:
-                resp = make_response(400, str(e).encode(), 'text/plain', keep_alive=False, server_name=config.server_name)
-                conn.sendall(resp.to_bytes())
+                send_response(sock, config, 400, str(e).encode(), keep_alive=False)
                 return
-            path = request.path
-            # Dynamic route check
+            sock.settimeout(config.body_timeout if request.body is not None else config.timeout)
+            connections.set(id(sock), 'handling')
             try:
-                body, ctype = router.dispatch(path)
-                resp = make_response(200, body, ctype, keep_alive=request.keep_alive, server_name=config.server_name)
-                conn.sendall(resp.to_bytes())
-                log('INFO', f"{addr} {request.method} {path} 200 (dynamic)")
-            except KeyError:
-                # Static file
-                full_path = safe_path(config.root, path)
-                p = Path(full_path)
-                if not p.exists() or not p.is_file():
-                    resp = make_response(404, b'Not Found', 'text/plain', keep_alive=request.keep_alive, server_name=config.server_name)
-                    conn.sendall(resp.to_bytes())
-                    log('WARN', f"{addr} {request.method} {path} 404")
-                else:
-                    cached = cache.get(str(p)) if config.cache_enabled else None
-                    if cached is None:
-                        try:
-                            content = p.read_bytes()
-                        except OSError:
-                            resp = make_response(500, b'Internal Server Error', 'text/plain', keep_alive=False, server_name=config.server_name)
-                            conn.sendall(resp.to_bytes())
-                            log('ERROR', f"{addr} {request.method} {path} 500 read error")
-                            return
-                        if config.cache_enabled:
-                            cache.put(str(p), content)
-                    else:
-                        content = cached
-                    if request.method == 'HEAD':
-                        body_bytes = b''
-                    else:
-                        body_bytes = content
-                    mime = guess_mime(str(p))
-                    resp = make_response(200, body_bytes, mime, keep_alive=request.keep_alive, server_name=config.server_name)
-                    conn.sendall(resp.to_bytes())
-                    source = 'cache' if cached is not None else 'disk'
-                    log('INFO', f"{addr} {request.method} {path} 200 ({source})")
-            requests_handled += 1
-            if not request.keep_alive:
-                break
+                # Announce the close on the last request this connection may carry.
+                last = config.max_conn_requests and conn.requests_handled + 1 >= config.max_conn_requests
+                keep_alive = serve_request(ctx, sock, addr, request, keep_alive=not last, trace=trace)
+            except BodyTooSlow:
+                connections.record_drop('slow_body')
+                log('DEBUG', f"Request body from {addr} below minimum rate")
+                return
+            except BodyTooLarge as e:
+                send_response(sock, config, 413, str(e).encode(), keep_alive=False)
+                return
+            except HTTPParseError as e:
+                send_response(sock, config, 400, str(e).encode(), keep_alive=False)
+                return
+            if request.body is not None and keep_alive:
+                keep_alive = finish_body(request)
+            if trace is not None:
+                trace.mark('last_byte')
+                entry = ctx.slow_log.record(trace)
+                if entry is not None:
+                    log('WARN', f"Slow request {entry['method']} {entry['path']} {entry['total_ms']}ms {entry['phases_ms']}")
+            conn.requests_handled += 1
+            if not keep_alive:
+                return
+            if reader.buffered or has_pending(sock) or ctx.idle is None:
+                continue  # a pipelined request is already here
+            connections.clear(id(sock))
+            ctx.idle.park(conn, config.idle_timeout)
+            parked = True
+            return
+    except socket.timeout:
+        log('DEBUG', f"Timeout on {addr}")
+    except OSError as e:
+        log('DEBUG', f"Connection error from {addr}: {e}")
     finally:
-        try:
+        if not parked:
+            connections.clear(id(sock))
             conn.close()
-        except OSError:
-            pass
 
 
-def serve(config: ServerConfig):
-    os.makedirs(config.root, exist_ok=True)
-    cache = LRUCache(config.cache_max_entries, config.cache_max_file_size)
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((config.host, config.port))
-        s.listen(config.backlog)
-        log('INFO', f"Listening on {config.host}:{config.port} root={config.root}")
+def serve_admin_connection(ctx: ServerContext, admin: Router, sock: socket.socket, addr):
+    """One blocking thread per admin client; the admin router is the only dispatch, no static files."""
+    config = ctx.config
+    reader = SocketReader(sock, config.recv_buffer)
+    with sock:
+        try:
+            while True:
+                head = reader.read_headers(config.header_max, time.monotonic() + config.idle_timeout)
+                if head is None:
+                    return
+                request = parse_request(head, config.header_max)
+                request.client = addr or ADMIN_SOCKET_PEER
+                attach_body(request, sock, reader, config)
+                sock.settimeout(config.timeout)
+                headers = None
+                try:
+                    match = admin.resolve(request.method, request.path)
+                    if match is None:
+                        raise HTTPError(404, 'Not Found')
+                    handler, params = match
+                    status, (body, ctype) = 200, handler(request.path.partition('?')[0], params, request)
+                except MethodNotAllowed as e:
+                    status, body, ctype, headers = 405, b'Method Not Allowed', 'text/plain', {'Allow': ', '.join(e.allowed)}
+                except HTTPError as e:
+                    status, body, ctype, headers = e.status, str(e).encode(), 'text/plain', e.headers
+                except Exception as e:
+                    log('ERROR', f"Admin {request.method} {request.path} failed: {e!r}")
+                    status, body, ctype = 500, b'Internal Server Error', 'text/plain'
+                keep_alive = send_response(sock, config, status, body, ctype, keep_alive=request.keep_alive,
+                                           headers=headers, head_only=request.method == 'HEAD')
+                log('INFO' if status < 400 else 'WARN', f"admin {addr or 'unix'} {request.method} {request.path} {status}")
+                if request.body is not None and keep_alive:
+                    keep_alive = finish_body(request)
+                if not keep_alive:
+                    return
+        except (OSError, HTTPParseError, BodyTooLarge) as e:
+            log('DEBUG', f"Admin connection {addr} closed: {e}")
+        finally:
+            connections.clear(id(sock))
+
+
+def start_admin_listener(ctx: ServerContext, spec: str, admin: Router) -> socket.socket:
+    """Listen for admin clients on ``spec`` (loopback ``host:port`` or ``unix:/path``) in a background thread."""
+    if not is_local(spec):
+        raise SystemExit(f'--admin-listen must be a loopback address or unix:/path, got {spec!r}')
+    listener = bind_listener(spec, mode=0o600)
+
+    def accept_loop():
         while True:
             try:
-                conn, addr = s.accept()
+                sock, addr = listener.accept()
             except OSError as e:
-                log('ERROR', f"Accept failed: {e}")
+                if listener.fileno() == -1:
+                    return  # closed
+                log('ERROR', f"Admin accept failed: {e}")
+                continue
+            threading.Thread(target=serve_admin_connection, args=(ctx, admin, sock, addr), name='admin-conn',
+                             daemon=True).start()
+    threading.Thread(target=accept_loop, name='admin-listener', daemon=True).start()
+    log('INFO', f"Admin API on {describe(listener)}")
+    return listener
+
+
+def build_sites(config: ServerConfig, cache: LRUCache) -> Optional[VirtualHostTable]:
+    """Virtual hosts from ``config.virtual_hosts``; the main root is the default site unless ``vhost_strict``.
+
+    Hosts from the config all serve the module-level ``router``; give a host
+    routes of its own by passing ``serve()`` a table built in code.
+    """
+    if not config.virtual_hosts:
+        return None
+    default = None
+    if not config.vhost_strict:
+        # The default site gets the same byte budget as the others, so it cannot crowd them out either.
+        cache.resize(max_bytes=config.vhost_cache_bytes)
+        default = VirtualHost('default', config.root, router, cache)
+    sites = VirtualHostTable(default)
+    for names, root in config.virtual_hosts.items():
+        site = sites.add(build_site(names.split(','), root, router, config.cache_max_entries,
+                                    config.cache_max_file_size, config.vhost_cache_bytes))
+        log('INFO', f"Virtual host {', '.join([site.name, *site.aliases])} root={root}")
+    return sites
+
+
+def share_routes(sites: VirtualHostTable, main: Router, admin: Optional[Router]):
+    """Give hosts with routers of their own the proxy routes of ``main`` and the admin endpoints."""
+    for site in sites.sites():
+        if site.router is main:
+            continue
+        for prefix, pool in main.upstreams.items():
+            if prefix not in site.router.upstreams:
+                site.router.add_proxy(prefix, pool)
+        if admin is not None:
+            site.router.mount('/_admin', admin)
+
+
+def serve(config: ServerConfig, sites: Optional[VirtualHostTable] = None):
+    """Run the server; ``sites`` overrides ``config.virtual_hosts``, e.g. to give hosts their own routers."""
+    set_log_enabled(config.log_enabled)
+    set_log_level(config.log_level)
+    os.makedirs(config.root, exist_ok=True)
+    cache = LRUCache(config.cache_max_entries, config.cache_max_file_size)
+    slow_log = SlowRequestLog(config.slow_request_ms) if config.slow_request_ms > 0 else None
+    for prefix, upstreams in config.proxy_routes.items():
+        router.proxy(prefix, upstreams, balance=config.proxy_balance, timeout=config.proxy_timeout,
+                     health_path=config.proxy_health_path, health_interval=config.proxy_health_interval)
+        log('INFO', f"Proxying {prefix} -> {', '.join(upstreams)} ({config.proxy_balance})")
+    sites = sites or build_sites(config, cache)
+    admin = None
+    if config.admin_enabled:
+        admin = Router(builtin=False)
+        register_admin_routes(admin, slow_log, router.upstreams, sites)
+        router.mount('/_admin', admin)
+    if sites is not None:
+        share_routes(sites, router, admin)
+    limits = ClientLimits(config.rate_limit_rps, config.rate_limit_burst, config.max_connections_per_ip,
+                          config.rate_limit_max_clients)
+    ctx = ServerContext(config, cache, slow_log, workers=WorkerPool(config.workers, 'http-worker'),
+                        limits=limits if limits.enabled else None, sites=sites)
+    if config.http2:
+        ctx.streams = WorkerPool(config.http2_workers, 'h2-stream')
+
+    def on_readable(conn: Connection):
+        if slow_log is not None and conn.ready_at is None:  # kept across the reads of a partial header block
+            conn.ready_at = time.perf_counter()
+        ctx.workers.submit(handle_connection, ctx, conn)
+    ctx.idle = IdleManager(on_readable, config.max_idle_connections, on_expire=expire_connection)
+    if config.asset_hashing:
+        hashers: Dict[str, AssetHasher] = {}
+        for root in [config.root] + ([site.root for site in sites.sites()] if sites else []):
+            key = os.path.abspath(root)
+            if key not in hashers:
+                hashers[key] = AssetHasher(root, config.asset_hash_workers, config.asset_rescan_interval)
+                hashers[key].start()
+        ctx.assets = hashers[os.path.abspath(config.root)]
+        for site in (sites.sites() if sites else []):
+            site.assets = hashers[os.path.abspath(site.root)]
+        log('INFO', f"Hashing assets under {len(hashers)} root(s); manifest at {config.asset_manifest_path}")
+    if config.admin_listen:
+        control = Router(builtin=False)
+        register_admin_routes(control, slow_log, router.upstreams, sites)
+        register_control_routes(control, RuntimeControl(ctx))
+        start_admin_listener(ctx, config.admin_listen, control)
+    metrics.reset()  # the GUI may run serve() again in the same process
+    metrics.bind(ctx.idle, [cache] + ([site.cache for site in sites.sites() if site.cache is not cache] if sites else []))
+    if config.http2 and not http2.available():
+        raise SystemExit("HTTP/2 needs the optional 'h2' package: pip install h2")
+    if config.tls_cert:
+        alpn = ('h2', 'http/1.1') if config.http2 else ('http/1.1',)
+        ctx.tls = TLSContext(config.tls_cert, config.tls_key, alpn, config.tls_reload_interval)
+    scheme = 'https' if ctx.tls else 'http'
+    specs = config.listen or [format_address(config.host, config.port)]
+    try:
+        listeners = open_listeners(specs, config.backlog, config.ipv6_only)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Cannot listen on {', '.join(specs)}: {e}")
+    if threading.current_thread() is threading.main_thread():
+        # Turn SIGTERM into SystemExit so the finally below removes our Unix socket files.
+        signal.signal(signal.SIGTERM, lambda _signum, _frame: sys.exit(0))
+    try:
+        for listener in listeners:
+            log('INFO', f"Listening on {scheme}://{describe(listener)} root={config.root}"
+                        + (f" vhosts={len(sites.sites())}" if sites is not None else ''))
+        for listener in listeners[1:]:
+            threading.Thread(target=accept_loop, args=(ctx, listener), name=f'accept-{describe(listener)}',
+                             daemon=True).start()
+        accept_loop(ctx, listeners[0])
+    finally:
+        for listener in listeners:
+            listener.close()
+        remove_socket_files(specs)
+
+
+def accept_loop(ctx: ServerContext, listener: socket.socket):
+    """Accept on one listening socket (TCP, dual-stack IPv6 or Unix) and park new connections."""
+    config = ctx.config
+    limits = ctx.limits
+    tcp = listener.family in (socket.AF_INET, socket.AF_INET6)
+    while True:
+        try:
+            sock, addr = listener.accept()
+        except OSError as e:
+            if listener.fileno() == -1:
+                return  # closed
+            log('ERROR', f"Accept failed: {e}")
+            continue
+        if tcp:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            addr = peer_address(addr)
+        key = client_key(addr)
+        if limits is not None and limits.connections is not None:
+            if not limits.connections.acquire(key):
+                if ctx.tls is None:
+                    reject_too_many(sock, config)
+                sock.close()
                 continue
-            t = threading.Thread(target=handle_connection, args=(conn, addr, config, cache), daemon=True)
-            t.start()
+        if ctx.tls is not None:
+            ctx.tls.maybe_reload()
+            sock = ctx.tls.wrap(sock)
+        conn = Connection(sock, addr, config.recv_buffer)
+        if limits is not None and limits.connections is not None:
+            conn.on_close = lambda key=key: limits.connections.release(key)
+        # New connections wait in the selector too, so a silent client costs no thread.
+        ctx.idle.park(conn, config.header_timeout)
 
 
 def parse_args() -> ServerConfig:
@@ -115,9 +783,56 @@ def parse_args() -> ServerConfig:
     parser.add_argument('--host', default='127.0.0.1')
     parser.add_argument('--port', type=int, default=8080)
     parser.add_argument('--root', default='public')
+    parser.add_argument('--listen', action='append', default=[], metavar='ADDRESS',
+                        help='HOST:PORT, [V6ADDR]:PORT, unix:PATH, fd:N or systemd (repeatable; replaces --host/--port)')
+    parser.add_argument('--ipv6-only', action='store_true', help='do not accept IPv4 clients on IPv6 listeners')
     parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--quiet', action='store_true', help='disable access logging')
+    parser.add_argument('--slow-ms', type=float, default=0.0, help='log requests slower than this with per-phase timings')
+    parser.add_argument('--autoindex', action='store_true', help='list directories that have no index.html')
+    parser.add_argument('--autoindex-page-size', type=int, default=1000, help='entries per directory listing page')
+    parser.add_argument('--hash-assets', action='store_true',
+                        help='serve content-hashed file names as immutable; manifest at /asset-manifest.json')
+    parser.add_argument('--asset-workers', type=int, default=2, help='threads hashing changed files')
+    parser.add_argument('--admin', action='store_true', help='enable local-only /_admin profiler endpoints')
+    parser.add_argument('--admin-listen', metavar='HOST:PORT|unix:PATH',
+                        help='local-only admin API: runtime settings, cache purge/preload, profiler')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARN', 'ERROR'], default='DEBUG')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests per second allowed per client IP')
+    parser.add_argument('--max-conn-per-ip', type=int, default=0, help='concurrent connections allowed per client IP')
+    parser.add_argument('--cert', help='PEM certificate chain; enables HTTPS')
+    parser.add_argument('--key', help='PEM private key (if not inside --cert)')
+    parser.add_argument('--proxy', action='append', default=[], metavar='PREFIX=HOST:PORT[,HOST:PORT...]',
+                        help='forward requests under PREFIX to upstream servers (repeatable)')
+    parser.add_argument('--proxy-balance', choices=['round_robin', 'least_conn'], default='round_robin')
+    parser.add_argument('--vhost', action='append', default=[], metavar='NAME[,ALIAS...]=ROOT',
+                        help='serve ROOT for these Host names; *.example.com matches subdomains (repeatable)')
+    parser.add_argument('--vhost-cache-mb', type=float, default=4.0, help='static cache budget per virtual host')
+    parser.add_argument('--vhost-strict', action='store_true', help='answer 404 for unknown hosts instead of using --root')
+    parser.add_argument('--http2', action='store_true', help="enable HTTP/2 (h2c prior knowledge, h2 via ALPN); needs 'h2'")
     args = parser.parse_args()
-    return ServerConfig(host=args.host, port=args.port, root=args.root, cache_enabled=not args.no_cache)
+    proxy_routes = {}
+    for spec in args.proxy:
+        prefix, sep, upstreams = spec.partition('=')
+        if not sep or not prefix.startswith('/'):
+            parser.error(f'--proxy expects /prefix=host:port[,host:port...], got {spec!r}')
+        proxy_routes[prefix] = upstreams.split(',')
+    virtual_hosts = {}
+    for spec in args.vhost:
+        names, sep, root = spec.partition('=')
+        if not sep or not names or not root:
+            parser.error(f'--vhost expects name[,alias...]=root, got {spec!r}')
+        virtual_hosts[names] = root
+    return ServerConfig(host=args.host, port=args.port, root=args.root, cache_enabled=not args.no_cache,
+                        log_enabled=not args.quiet, slow_request_ms=args.slow_ms, admin_enabled=args.admin,
+                        rate_limit_rps=args.rate_limit, max_connections_per_ip=args.max_conn_per_ip,
+                        tls_cert=args.cert, tls_key=args.key, http2=args.http2,
+                        proxy_routes=proxy_routes, proxy_balance=args.proxy_balance,
+                        virtual_hosts=virtual_hosts, vhost_cache_bytes=int(args.vhost_cache_mb * 1024 * 1024),
+                        vhost_strict=args.vhost_strict, autoindex=args.autoindex,
+                        autoindex_page_size=args.autoindex_page_size, asset_hashing=args.hash_assets,
+                        asset_hash_workers=args.asset_workers, admin_listen=args.admin_listen,
+                        log_level=args.log_level, listen=args.listen, ipv6_only=args.ipv6_only)
 
 if __name__ == '__main__':
     config = parse_args()
@@ -0,0 +1,152 @@
+import math
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Sequence, Tuple
+
+STATES = ('reading_headers', 'handling', 'sending')
+
+
+class ConnectionTracker:
+    """Which phase each busy connection is in, and for how long.
+
+    Connections that have been in one phase longer than ``slow_after`` seconds
+    are reported as slow in that phase. Idle connections parked in the
+    selector are not tracked here; see ``IdleManager.idle_count``.
+    """
+
+    def __init__(self, slow_after: float = 1.0):
+        self.slow_after = slow_after
+        self._states: Dict[Hashable, Tuple[str, float]] = {}
+        self._dropped: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def set(self, key: Hashable, state: str):
+        with self._lock:
+            self._states[key] = (state, time.monotonic())
+
+    def clear(self, key: Hashable):
+        with self._lock:
+            self._states.pop(key, None)
+
+    def record_drop(self, reason: str):
+        with self._lock:
+            self._dropped[reason] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            states = list(self._states.values())
+            dropped = dict(self._dropped)
+        active = Counter(state for state, _since in states)
+        slow = Counter(state for state, since in states if now - since > self.slow_after)
+        return {
+            'active': {state: active.get(state, 0) for state in STATES},
+            'slow': {state: slow.get(state, 0) for state in STATES},
+            'dropped': dropped,
+        }
+
+
+connections = ConnectionTracker()
+
+
+class ServerMetrics:
+    """Aggregated request stats plus a bounded event (log) feed, read by polling.
+
+    Recording a request is a counter bump and, for a sample of requests, one
+    latency appended to a ring. Every request is sampled while the ring holds
+    a whole ``window`` of them; under heavier load only every n-th is, with n
+    recomputed each second from the previous second's rate (never below
+    ``sample_every``). Readers call ``snapshot()`` and
+    ``drain_events()`` at their own pace. Nothing is pushed to them, so a slow
+    reader (the Tk panel) never holds up a worker. When more than
+    ``max_events`` events pile up between polls, the oldest are dropped and
+    counted.
+    """
+
+    def __init__(self, window: float = 5.0, max_samples: int = 4096, sample_every: int = 1, max_events: int = 1000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.sample_every = max(1, sample_every)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=max_samples)  # (at, ms)
+        self._events: Deque[Tuple[float, str, str]] = deque(maxlen=max_events)
+        self.events_dropped = 0
+        self.tracker = connections
+        self.reset()
+
+    def reset(self):
+        """Forget request stats and bindings (a restarted server starts from zero); queued events stay."""
+        with self._lock:
+            self._buckets: Deque[List[float]] = deque()  # [second, count]
+            self._latencies.clear()
+            self._stride = self.sample_every
+            self.requests = 0
+        self.idle: Optional[Any] = None  # IdleManager, for the parked-connection count
+        self.caches: Sequence[Any] = ()  # LRUCaches whose hits/misses make up the hit ratio
+
+    def bind(self, idle=None, caches: Sequence[Any] = ()):
+        self.idle = idle
+        self.caches = list(caches)
+
+    def record_request(self, latency_ms: float):
+        now = self._clock()
+        second = int(now)
+        with self._lock:
+            self.requests += 1
+            if self._buckets and self._buckets[-1][0] == second:
+                self._buckets[-1][1] += 1
+            else:
+                if self._buckets:
+                    per_second = self._buckets[-1][1] if self._buckets[-1][0] == second - 1 else 0
+                    self._stride = max(self.sample_every, math.ceil(per_second * self.window / self._latencies.maxlen))
+                self._buckets.append([second, 1])
+                while self._buckets[0][0] <= second - self.window - 1:
+                    self._buckets.popleft()
+            if self.requests % self._stride == 0:
+                self._latencies.append((now, latency_ms))
+
+    def publish(self, level: str, message: str):
+        """Log sink: queue an event for the next ``drain_events`` call."""
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.events_dropped += 1
+            self._events.append((time.time(), level, message))
+
+    def drain_events(self, limit: int = 0) -> List[Tuple[float, str, str]]:
+        """Take up to ``limit`` queued events (all when 0), oldest first."""
+        with self._lock:
+            count = len(self._events) if not limit else min(limit, len(self._events))
+            return [self._events.popleft() for _ in range(count)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = self._clock()
+        start = now - self.window
+        with self._lock:
+            count = sum(n for second, n in self._buckets if second > start)
+            latencies = sorted(ms for at, ms in self._latencies if at >= start)
+            total = self.requests
+        hits = sum(cache.hits for cache in self.caches)
+        misses = sum(cache.misses for cache in self.caches)
+        busy = sum(self.tracker.snapshot()['active'].values())
+        idle = self.idle.idle_count if self.idle is not None else 0
+        return {
+            'requests': total,
+            'requests_per_sec': round(count / self.window, 2),
+            'latency_ms': {name: round(percentile(latencies, q), 3) for name, q in
+                           (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))},
+            'connections': {'busy': busy, 'idle': idle, 'total': busy + idle},
+            'cache_hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'events_dropped': self.events_dropped,
+        }
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (0.0 when empty)."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+metrics = ServerMetrics()
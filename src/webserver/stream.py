@@ -0,0 +1,187 @@
+import socket
+import ssl
+import time
+from typing import Optional
+from .http import HTTPParseError
+
+
+class DeadlineExceeded(socket.timeout):
+    pass
+
+
+def send_all(sock: socket.socket, data: bytes, min_rate: float = 0.0, grace: float = 5.0):
+    """``sendall`` bounded by a total deadline of ``grace + len(data) / min_rate`` seconds.
+
+    A client that reads slower than ``min_rate`` bytes/second is cut off
+    instead of holding the sending thread indefinitely.
+    """
+    if min_rate <= 0:
+        sock.sendall(data)
+        return
+    previous = sock.gettimeout()
+    deadline = time.monotonic() + grace + len(data) / min_rate
+    view = memoryview(data)
+    # ssl.SSLSocket.sendall applies the timeout to each send(), so track the deadline here.
+    try:
+        while view:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded('Client reading below minimum transfer rate')
+            sock.settimeout(remaining)
+            view = view[sock.send(view):]
+    except socket.timeout:
+        raise DeadlineExceeded('Client reading below minimum transfer rate')
+    finally:
+        sock.settimeout(previous)
+
+
+SENDFILE_CHUNK = 1024 * 1024
+
+
+def send_file(sock: socket.socket, f, count: int, min_rate: float = 0.0, grace: float = 5.0):
+    """Send ``count`` bytes of an open file under the same deadline rule as :func:`send_all`.
+
+    Plain TCP sockets use zero-copy ``os.sendfile``. For ``ssl.SSLSocket``,
+    ``sendfile()`` falls back to read + send, because TLS records are encrypted
+    in user space.
+    """
+    previous = sock.gettimeout()
+    deadline = time.monotonic() + grace + count / min_rate if min_rate > 0 else None
+    offset = 0
+    try:
+        while offset < count:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded('Client reading below minimum transfer rate')
+                sock.settimeout(remaining)
+            sent = sock.sendfile(f, offset, min(SENDFILE_CHUNK, count - offset))
+            if not sent:
+                raise ConnectionError('File shrank while sending')
+            offset += sent
+    except socket.timeout:
+        raise DeadlineExceeded('Client reading below minimum transfer rate')
+    finally:
+        sock.settimeout(previous)
+
+
+class SocketReader:
+    """Buffered reader over a connection socket.
+
+    Bytes received past the end of one request (pipelining, request bodies)
+    stay in the buffer for the next read instead of being dropped.
+    """
+
+    def __init__(self, sock: socket.socket, bufsize: int = 8192):
+        self.sock = sock
+        self.bufsize = bufsize
+        self._buf = bytearray()
+        self._scanned = 0  # bytes of _buf already searched for the end of a header block
+        self._in_block = False  # poll_headers: part of a header block is buffered
+        self.first_byte_at: Optional[float] = None  # perf_counter when the last header block began
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buf)
+
+    def _fill(self) -> bool:
+        chunk = self.sock.recv(self.bufsize)
+        if not chunk:
+            return False
+        self._buf += chunk
+        return True
+
+    def _split_headers(self, header_max: int) -> Optional[bytes]:
+        end = self._buf.find(b'\r\n\r\n', self._scanned)
+        if end == -1:
+            if len(self._buf) > header_max:
+                raise HTTPParseError('Header too large')
+            self._scanned = max(0, len(self._buf) - 3)
+            return None
+        end += 4
+        if end > header_max:
+            raise HTTPParseError('Header too large')
+        head = bytes(self._buf[:end])
+        del self._buf[:end]
+        self._scanned = 0
+        return head
+
+    def read_headers(self, header_max: int, deadline: Optional[float] = None) -> Optional[bytes]:
+        """Return the header block including the blank line, or ``None`` on a clean EOF.
+
+        ``deadline`` (``time.monotonic``) bounds the whole header read, so a client
+        trickling one byte per socket timeout cannot hold the connection forever.
+        """
+        self.first_byte_at = time.perf_counter() if self._buf else None
+        while True:
+            head = self._split_headers(header_max)
+            if head is not None:
+                return head
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded('Header read deadline exceeded')
+                self.sock.settimeout(remaining)
+            if not self._fill():
+                if self._buf:
+                    raise HTTPParseError('Incomplete request')
+                return None
+            if self.first_byte_at is None:
+                self.first_byte_at = time.perf_counter()
+
+    def poll_headers(self, header_max: int) -> Optional[bytes]:
+        """:meth:`read_headers` without blocking: ``BlockingIOError`` while the block is incomplete.
+
+        What has arrived stays buffered, so the connection can wait in a selector
+        and call again once it is readable, instead of holding a thread.
+        """
+        if not self._in_block:
+            self._in_block = True
+            self.first_byte_at = time.perf_counter() if self._buf else None
+        previous = self.sock.gettimeout()
+        self.sock.settimeout(0)
+        try:
+            while True:
+                head = self._split_headers(header_max)
+                if head is not None:
+                    self._in_block = False
+                    return head
+                try:
+                    filled = self._fill()
+                except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                    raise BlockingIOError('Header block incomplete')
+                if not filled:
+                    self._in_block = False
+                    if self._buf:
+                        raise HTTPParseError('Incomplete request')
+                    return None
+                if self.first_byte_at is None:
+                    self.first_byte_at = time.perf_counter()
+        finally:
+            self.sock.settimeout(previous)
+
+    def take(self) -> bytes:
+        """Remove and return everything buffered, e.g. when handing the connection to another protocol."""
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+    def read(self, n: int) -> bytes:
+        """Read up to ``n`` bytes; ``b''`` means the peer closed the connection."""
+        if not self._buf and not self._fill():
+            return b''
+        data = bytes(self._buf[:n])
+        del self._buf[:n]
+        return data
+
+    def readline(self, limit: int) -> bytes:
+        while True:
+            end = self._buf.find(b'\r\n')
+            if end != -1:
+                line = bytes(self._buf[:end])
+                del self._buf[:end + 2]
+                return line
+            if len(self._buf) > limit:
+                raise HTTPParseError('Line too long')
+            if not self._fill():
+                raise HTTPParseError('Unexpected end of stream')
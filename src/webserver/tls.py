@@ -0,0 +1,70 @@
+import os
+import socket
+import ssl
+import threading
+import time
+from typing import Optional, Sequence, Tuple
+
+from .utils import log
+
+
+class TLSContext:
+    """Server-side ``SSLContext`` built once at startup and shared by every connection.
+
+    Session IDs and TLS 1.3 session tickets let returning clients skip the full
+    handshake. A certificate change on disk is picked up by calling
+    ``load_cert_chain`` again on the same context. Its session cache and
+    ticket keys are kept, so clients can still resume across a reload.
+    """
+
+    def __init__(self, certfile: str, keyfile: Optional[str] = None, alpn: Sequence[str] = ('http/1.1',),
+                 reload_interval: float = 30.0):
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.reload_interval = reload_interval
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.minimum_version = ssl.TLSVersion.TLSv1_2
+        self.context.set_alpn_protocols(list(alpn))
+        if hasattr(self.context, 'num_tickets'):
+            self.context.num_tickets = 2
+        self._lock = threading.Lock()
+        self._mtimes: Tuple[float, float] = (0.0, 0.0)
+        self._checked = 0.0
+        self.handshakes = 0
+        self.resumed = 0
+        self.reload()
+
+    def _current_mtimes(self) -> Tuple[float, float]:
+        cert = os.stat(self.certfile).st_mtime
+        key = os.stat(self.keyfile).st_mtime if self.keyfile else cert
+        return cert, key
+
+    def reload(self):
+        with self._lock:
+            self.context.load_cert_chain(self.certfile, self.keyfile)
+            self._mtimes = self._current_mtimes()
+            self._checked = time.monotonic()
+
+    def maybe_reload(self):
+        """Reload the certificate if its files changed; checks at most once per ``reload_interval``."""
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        self._checked = now
+        try:
+            if self._current_mtimes() != self._mtimes:
+                self.reload()
+                log('INFO', f"Reloaded TLS certificate {self.certfile}")
+        except (OSError, ssl.SSLError) as e:
+            log('ERROR', f"TLS certificate reload failed, keeping the previous one: {e}")
+
+    def wrap(self, sock: socket.socket) -> ssl.SSLSocket:
+        # The handshake runs later on a worker thread, not in the accept loop.
+        return self.context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+
+    def handshake(self, sock: ssl.SSLSocket, timeout: float):
+        sock.settimeout(timeout)
+        sock.do_handshake()
+        self.handshakes += 1
+        if sock.session_reused:
+            self.resumed += 1
@@ -0,0 +1,196 @@
+import json
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from .handlers import HTTPError
+from .http import HTTPRequest
+from .stats import connections, metrics
+
+PHASES = ('accepted', 'first_byte', 'headers_parsed', 'handler_done', 'last_byte')
+ADMIN_SOCKET_PEER = 'admin-socket'  # client of a Unix peer on the dedicated --admin-listen socket
+# Unix peers on public listeners ('' client) are not local: a front proxy may sit on that socket.
+LOOPBACK = {'127.0.0.1', '::1', ADMIN_SOCKET_PEER}
+
+
+class RequestTrace:
+    """Per-request phase timestamps (``time.perf_counter`` seconds)."""
+    __slots__ = PHASES + ('method', 'path', 'client')
+
+    def __init__(self, accepted: float, client=None):
+        self.accepted = accepted
+        self.first_byte: Optional[float] = None
+        self.headers_parsed: Optional[float] = None
+        self.handler_done: Optional[float] = None
+        self.last_byte: Optional[float] = None
+        self.method = ''
+        self.path = ''
+        self.client = client
+
+    def mark(self, phase: str):
+        setattr(self, phase, time.perf_counter())
+
+    @property
+    def total_ms(self) -> float:
+        end = self.last_byte or time.perf_counter()
+        return (end - self.accepted) * 1000
+
+    def phases_ms(self) -> Dict[str, float]:
+        """Milliseconds spent reaching each phase from the previous recorded one."""
+        result = {}
+        prev = self.accepted
+        for phase in PHASES[1:]:
+            at = getattr(self, phase)
+            if at is None:
+                continue
+            result[phase] = round((at - prev) * 1000, 3)
+            prev = at
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'method': self.method, 'path': self.path, 'client': str(self.client),
+                'total_ms': round(self.total_ms, 3), 'phases_ms': self.phases_ms()}
+
+
+class SlowRequestLog:
+    def __init__(self, threshold_ms: float, maxlen: int = 100):
+        self.threshold_ms = threshold_ms
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=maxlen)
+
+    def record(self, trace: RequestTrace) -> Optional[Dict[str, Any]]:
+        if trace.total_ms < self.threshold_ms:
+            return None
+        entry = trace.to_dict()
+        entry['at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        self._entries.append(entry)
+        return entry
+
+    def entries(self) -> List[Dict[str, Any]]:
+        return list(self._entries)
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval while running.
+
+    Unlike cProfile, which only sees the thread that enabled it, this covers all
+    connection and worker threads. Reports use the collapsed-stack format
+    (``frame;frame;frame count``) understood by flamegraph tools.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._samples: Counter = Counter()
+        self.interval = 0.005
+        self.started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float = 0.005) -> bool:
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.interval = interval
+            self._samples = Counter()
+            self._stop.clear()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> str:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return ''
+        self._stop.set()
+        thread.join()
+        return self.report()
+
+    def report(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self._samples.most_common())
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{frame.f_lineno})')
+                    frame = frame.f_back
+                self._samples[';'.join(reversed(stack))] += 1
+
+
+profiler = SamplingProfiler()
+
+
+def _require_local(request: Optional[HTTPRequest]):
+    # No known peer is not proof of a local one: fail closed.
+    client = request.client if request is not None else None
+    if client is None or (client[0] if isinstance(client, tuple) else client) not in LOOPBACK:
+        raise HTTPError(403, 'Admin endpoints are local-only')
+
+
+def register_admin_routes(router, slow_log: Optional[SlowRequestLog], upstreams: Optional[Dict[str, Any]] = None,
+                          sites=None):
+    """Profiler, slow-request, stats, connection-state, upstream and virtual-host endpoints; mount under an admin prefix."""
+    def status(_path, _params, request):
+        _require_local(request)
+        body = {'profiling': profiler.running, 'interval': profiler.interval,
+                'slow_threshold_ms': slow_log.threshold_ms if slow_log else None}
+        return json.dumps(body).encode('utf-8'), 'application/json'
+
+    def start(_path, params, request):
+        _require_local(request)
+        try:
+            interval = float(params.get('interval', 0.005))
+        except ValueError:
+            interval = 0.0
+        if not 0 < interval <= 10:  # also rejects nan
+            raise HTTPError(400, 'interval must be a number of seconds in (0, 10]')
+        started = profiler.start(interval)
+        return json.dumps({'started': started}).encode('utf-8'), 'application/json'
+
+    def stop(_path, _params, request):
+        _require_local(request)
+        return profiler.stop().encode('utf-8'), 'text/plain; charset=utf-8'
+
+    def slow(_path, _params, request):
+        _require_local(request)
+        entries = slow_log.entries() if slow_log else []
+        return json.dumps(entries).encode('utf-8'), 'application/json'
+
+    def conns(_path, _params, request):
+        _require_local(request)
+        return json.dumps(connections.snapshot()).encode('utf-8'), 'application/json'
+
+    def stats(_path, _params, request):
+        _require_local(request)
+        return json.dumps(metrics.snapshot()).encode('utf-8'), 'application/json'
+
+    def pools(_path, _params, request):
+        _require_local(request)
+        body = {prefix: pool.stats() for prefix, pool in (upstreams or {}).items()}
+        return json.dumps(body).encode('utf-8'), 'application/json'
+
+    def vhosts(_path, _params, request):
+        _require_local(request)
+        body = [site.stats() for site in sites.sites()] if sites is not None else []
+        return json.dumps(body).encode('utf-8'), 'application/json'
+
+    router.register('/connections', conns, pass_request=True)
+    router.register('/sites', vhosts, pass_request=True)
+    router.register('/stats', stats, pass_request=True)
+    router.register('/upstreams', pools, pass_request=True)
+    router.register('/profile', status, pass_request=True)
+    router.register('/profile/start', start, methods=['POST'], pass_request=True)
+    router.register('/profile/stop', stop, methods=['POST'], pass_request=True)
+    router.register('/slow', slow, pass_request=True)
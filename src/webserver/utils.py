@@ -28,13 +28,42 @@ def parse_query(query: str) -> dict:
         return {}
     return {k: url_decode(v[0]) if v else '' for k, v in urllib.parse.parse_qs(query, keep_blank_values=True).items()}
 
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARN', 'ERROR')
+_LOG_RANK = {name: rank for rank, name in enumerate(LOG_LEVELS)}
+
+_log_enabled = True
+_log_sink = None
+_log_min = 0  # index into LOG_LEVELS
+
+def set_log_enabled(enabled: bool):
+    global _log_enabled
+    _log_enabled = enabled
+
+def set_log_level(level: str):
+    """Drop messages below ``level`` (one of ``LOG_LEVELS``)."""
+    global _log_min
+    _log_min = _LOG_RANK[level.upper()]
+
+def get_log_level() -> str:
+    return LOG_LEVELS[_log_min]
+
+def set_log_sink(sink):
+    """Send log lines to ``sink(level, msg)`` instead of stdout; ``None`` restores printing."""
+    global _log_sink
+    _log_sink = sink
+
 def log(level: str, msg: str):
+    if not _log_enabled or _LOG_RANK.get(level, len(LOG_LEVELS)) < _log_min:
+        return
+    if _log_sink is not None:
+        _log_sink(level, msg)
+        return
     color = _LOG_COLOR.get(level, '')
     print(f"{color}[{level}] {time.strftime('%H:%M:%S')} {msg}{Style.RESET_ALL}")
 
 def safe_path(root: str, request_path: str) -> str:
     # Prevent directory traversal.
-    request_path = request_path.split('?')[0]
+    request_path = urllib.parse.unquote(request_path.split('?')[0])
     request_path = request_path.lstrip('/')
     norm = request_path.replace('..', '')
     return f"{root}/{norm}" if norm else f"{root}/index.html"
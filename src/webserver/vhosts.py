@@ -0,0 +1,86 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from .assets import AssetHasher
+from .cache import LRUCache
+from .routing import Router
+
+
+@dataclass
+class VirtualHost:
+    """One site: its document root, dynamic routes and a static cache of its own.
+
+    Each site's cache has its own byte budget, so a busy site only evicts its
+    own entries.
+    """
+    name: str
+    root: str
+    router: Router
+    cache: LRUCache
+    aliases: List[str] = field(default_factory=list)
+    assets: Optional[AssetHasher] = None  # content hashes for immutable URLs, when enabled
+
+    def stats(self) -> Dict[str, object]:
+        return {'name': self.name, 'root': self.root, 'aliases': self.aliases, 'cache_entries': len(self.cache),
+                'cache_bytes': self.cache.size_bytes, 'cache_budget': self.cache.max_bytes,
+                'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses}
+
+
+def normalize_host(value: Optional[str]) -> str:
+    """Lower-case host name without port or trailing dot (``[::1]:8080`` -> ``[::1]``)."""
+    if not value:
+        return ''
+    value = value.strip().lower()
+    if value.startswith('['):
+        end = value.find(']')
+        return value[:end + 1] if end != -1 else value
+    return value.partition(':')[0].rstrip('.')
+
+
+class VirtualHostTable:
+    """Maps the request ``Host`` to a :class:`VirtualHost`.
+
+    Exact names are one dict lookup. ``*.example.com`` patterns match any
+    subdomain, and the most specific pattern wins. Unknown hosts get
+    ``default``, or ``None`` when there is no default.
+    """
+
+    def __init__(self, default: Optional[VirtualHost] = None):
+        self.default = default
+        self._exact: Dict[str, VirtualHost] = {}
+        self._wildcards: Dict[str, VirtualHost] = {}  # '.example.com' -> site
+
+    def add(self, site: VirtualHost) -> VirtualHost:
+        for name in [site.name, *site.aliases]:
+            name = normalize_host(name)
+            if name.startswith('*.'):
+                self._wildcards[name[1:]] = site
+            else:
+                self._exact[name] = site
+        return site
+
+    def lookup(self, host: Optional[str]) -> Optional[VirtualHost]:
+        name = normalize_host(host)
+        site = self._exact.get(name)
+        if site is not None:
+            return site
+        dot = name.find('.')
+        while dot != -1:
+            site = self._wildcards.get(name[dot:])
+            if site is not None:
+                return site
+            dot = name.find('.', dot + 1)
+        return self.default
+
+    def sites(self) -> List[VirtualHost]:
+        seen: Dict[int, VirtualHost] = {}
+        for site in [self.default, *self._exact.values(), *self._wildcards.values()]:
+            if site is not None:
+                seen.setdefault(id(site), site)
+        return list(seen.values())
+
+
+def build_site(names: Sequence[str], root: str, router: Router, cache_entries: int, cache_max_file_size: int,
+               cache_bytes: int) -> VirtualHost:
+    return VirtualHost(names[0], root, router, LRUCache(cache_entries, cache_max_file_size, cache_bytes),
+                       list(names[1:]))
@@ -0,0 +1,46 @@
+import queue
+import threading
+from typing import Callable
+
+from .utils import log
+
+
+class WorkerPool:
+    """Fixed set of worker threads pulling jobs from one queue; resizable at runtime."""
+
+    def __init__(self, size: int, name: str = 'worker'):
+        self._jobs: 'queue.SimpleQueue' = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._name = name
+        self._size = 0
+        self.resize(size)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def submit(self, fn: Callable, *args):
+        self._jobs.put((fn, args))
+
+    def resize(self, size: int):
+        if size < 1:
+            raise ValueError('Worker pool needs at least one thread')
+        with self._lock:
+            delta = size - self._size
+            for _ in range(delta):
+                threading.Thread(target=self._run, name=f'{self._name}-{self._size}', daemon=True).start()
+                self._size += 1
+            for _ in range(-delta):
+                self._jobs.put(None)  # each sentinel retires one worker
+                self._size -= 1
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            fn, args = job
+            try:
+                fn(*args)
+            except Exception as e:
+                log('ERROR', f"Worker job failed: {e!r}")
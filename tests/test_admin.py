@@ -0,0 +1,77 @@
+import json
+import os
+import socket
+import tempfile
+import unittest
+from src.webserver.admin import RuntimeControl, register_control_routes
+from src.webserver.cache import LRUCache
+from src.webserver.config import ServerConfig
+from src.webserver.handlers import HTTPError
+from src.webserver.http import HTTPRequest
+from src.webserver.routing import Router
+from src.webserver.server import ServerContext, handle_request, start_admin_listener
+from src.webserver.tracing import register_admin_routes
+from src.webserver.utils import get_log_level, set_log_level
+from src.webserver.workers import WorkerPool
+
+class TestRuntimeControl(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, 'css'))
+        for name in ('index.html', 'css/a.css', 'css/b.css'):
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(b'x' * 10)
+        self.config = ServerConfig(root=self.root, log_enabled=False)
+        self.ctx = ServerContext(self.config, LRUCache(8, 1024), workers=WorkerPool(2, 'test-worker'))
+        self.control = RuntimeControl(self.ctx)
+
+    def tearDown(self):
+        set_log_level('DEBUG')
+
+    def test_update_settings(self):
+        values = self.control.update({'workers': 3, 'idle_timeout': 1.5, 'cache_max_entries': 4, 'log_level': 'warn'})
+        self.assertEqual((values['workers'], self.ctx.workers.size), (3, 3))
+        self.assertEqual((self.config.idle_timeout, self.ctx.cache.capacity, get_log_level()), (1.5, 4, 'WARN'))
+        for bad in ({'workers': 0}, {'timeout': 'fast'}, {'log_level': 'LOUD'}, {'nope': 1}, {'workers': 2, 'timeout': -1}):
+            with self.assertRaises(HTTPError):
+                self.control.update(bad)
+        self.assertEqual(self.ctx.workers.size, 3)  # nothing applied from a rejected batch
+
+    def test_preload_matches_static_keys_and_purge(self):
+        self.assertEqual(self.control.preload({'paths': ['/css', '/index.html']}), {'loaded': 3, 'skipped': 0})
+        server, client = socket.socketpair()
+        with server, client:
+            request = HTTPRequest('GET', '/css/a.css', 'HTTP/1.1', {})
+            handle_request(server, ('127.0.0.1', 1), request, self.config, self.ctx.cache)
+        self.assertEqual(self.ctx.cache.hits, 1)
+        self.assertEqual(self.control.purge({'paths': ['/css']}), {'purged': 2})
+        self.assertEqual(self.control.purge({}), {'purged': 1})
+        with self.assertRaises(HTTPError):
+            self.control.purge({'site': 'elsewhere'})
+
+    def test_unix_listener(self):
+        path = os.path.join(tempfile.mkdtemp(), 'admin.sock')
+        router = Router(builtin=False)
+        register_admin_routes(router, None)
+        register_control_routes(router, self.control)
+        listener = start_admin_listener(self.ctx, 'unix:' + path, router)
+        self.addCleanup(listener.close)
+        body = b'{"header_timeout": 2}'
+        with socket.socket(socket.AF_UNIX) as s:
+            s.connect(path)
+            s.sendall(b'POST /settings HTTP/1.1\r\nHost: x\r\nConnection: close\r\nContent-Length: %d\r\n\r\n%s'
+                      % (len(body), body))
+            data = b''
+            while chunk := s.recv(65536):
+                data += chunk
+        self.assertTrue(data.startswith(b'HTTP/1.1 200'))
+        self.assertEqual(json.loads(data.partition(b'\r\n\r\n')[2])['header_timeout'], 2.0)
+        with socket.socket(socket.AF_UNIX) as s:  # the dedicated admin socket is trusted
+            s.connect(path)
+            s.sendall(b'GET /slow HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+            self.assertTrue(s.recv(65536).startswith(b'HTTP/1.1 200'))
+        with self.assertRaises(SystemExit):
+            start_admin_listener(self.ctx, '0.0.0.0:0', router)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import os
+import socket
+import tempfile
+import unittest
+from src.webserver.assets import IMMUTABLE, AssetHasher, hashed_name
+from src.webserver.cache import LRUCache
+from src.webserver.config import ServerConfig
+from src.webserver.http import HTTPRequest
+from src.webserver.server import handle_request
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, 'js'))
+        self.write('js/app.min.js', b'one')
+        self.write('.env', b'secret')
+        self.hasher = AssetHasher(self.root, workers=1)
+        self.hasher.scan()
+        self.assertTrue(self.hasher.wait_idle(5))
+
+    def write(self, name, data):
+        with open(os.path.join(self.root, name), 'wb') as f:
+            f.write(data)
+
+    def test_hashed_name(self):
+        self.assertEqual(hashed_name('js/app.min.js', 'abc'), 'js/app.min.abc.js')
+        self.assertEqual(hashed_name('LICENSE', 'abc'), 'LICENSE.abc')
+
+    def test_incremental_scan(self):
+        hashed = self.hasher.manifest()['js/app.min.js']
+        self.assertEqual(list(self.hasher.manifest()), ['js/app.min.js'])
+        self.assertEqual(self.hasher.resolve(hashed).logical, 'js/app.min.js')
+        self.assertEqual(self.hasher.url_for('/js/app.min.js'), '/' + hashed)
+        self.assertEqual(self.hasher.scan(), 0)
+        self.write('js/app.min.js', b'two!')
+        self.assertIsNone(self.hasher.resolve(hashed))  # never serve new content under the old hash
+        self.assertEqual(self.hasher.scan(), 1)
+        self.hasher.wait_idle(5)
+        self.assertNotEqual(self.hasher.manifest()['js/app.min.js'], hashed)
+        os.remove(os.path.join(self.root, 'js/app.min.js'))
+        self.hasher.scan()
+        self.assertEqual(self.hasher.manifest(), {})
+
+    def fetch(self, path, cache=None, **headers):
+        config = ServerConfig(root=self.root, log_enabled=False)
+        server, client = socket.socketpair()
+        with server, client:
+            request = HTTPRequest('GET', path, 'HTTP/1.0', headers)
+            handle_request(server, ('127.0.0.1', 1), request, config, cache if cache is not None else LRUCache(8, 1024),
+                           assets=self.hasher)
+            server.shutdown(socket.SHUT_WR)
+            data = b''
+            while chunk := client.recv(65536):
+                data += chunk
+        head, _, body = data.partition(b'\r\n\r\n')
+        lines = head.decode().split('\r\n')
+        return int(lines[0].split()[1]), dict(line.split(': ', 1) for line in lines[1:]), body
+
+    def test_served_headers(self):
+        status, headers, body = self.fetch('/asset-manifest.json')
+        hashed = json.loads(body)['js/app.min.js']
+        status, headers, body = self.fetch('/' + hashed)
+        self.assertEqual((status, headers['Cache-Control'], body), (200, IMMUTABLE, b'one'))
+        status, headers, _ = self.fetch('/js/app.min.js')
+        self.assertEqual((status, headers['Cache-Control']), (200, 'no-cache'))
+        self.assertEqual(self.fetch('/js/app.min.js', **{'if-none-match': headers['ETag']})[0], 304)
+
+    def test_shared_cache_never_serves_old_content_under_new_hash(self):
+        cache = LRUCache(8, 1024)
+        old = self.hasher.manifest()['js/app.min.js']
+        self.assertEqual(self.fetch('/js/app.min.js', cache)[2], b'one')
+        self.assertEqual(self.fetch('/' + old, cache)[2], b'one')
+        self.assertEqual(len(cache), 1)  # plain and hashed URL share one entry
+        self.write('js/app.min.js', b'TWO!!')
+        self.hasher.scan()
+        self.hasher.wait_idle(5)
+        new = self.hasher.manifest()['js/app.min.js']
+        status, headers, body = self.fetch('/' + new, cache)
+        self.assertEqual((status, headers['Cache-Control'], body), (200, IMMUTABLE, b'TWO!!'))
+        self.assertEqual(self.fetch('/' + old, cache)[0], 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import os
+import socket
+import tempfile
+import unittest
+from src.webserver.autoindex import DirectoryIndex, page_bounds, render, scan, wants_json
+from src.webserver.cache import LRUCache
+from src.webserver.config import ServerConfig
+from src.webserver.http import HTTPRequest
+from src.webserver.server import handle_request
+
+class TestAutoindex(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, 'Sub'))
+        for name in ('b.txt', 'A <x>.txt', '.hidden'):
+            with open(os.path.join(self.root, name), 'w') as f:
+                f.write('data')
+
+    def test_scan_order_and_hidden(self):
+        self.assertEqual([(name, is_dir) for name, is_dir, _size, _mtime in scan(self.root)],
+                         [('Sub', True), ('A <x>.txt', False), ('b.txt', False)])
+
+    def test_rescans_only_when_directory_changes(self):
+        index = DirectoryIndex()
+        first = index.get(self.root)
+        self.assertIs(index.get(self.root), first)
+        os.utime(self.root, ns=(0, first.mtime_ns + 1000))
+        self.assertIsNot(index.get(self.root), first)
+        self.assertEqual(index.scans, 2)
+
+    def test_pages(self):
+        self.assertEqual(page_bounds(0, 1, 10), (1, 1, 0))
+        self.assertEqual(page_bounds(25, 9, 10), (3, 3, 20))
+        listing = DirectoryIndex().get(self.root)
+        data = json.loads(b''.join(render(listing, '/', 'json', 2, 2)))
+        self.assertEqual((data['page'], data['pages'], data['total']), (2, 2, 3))
+        self.assertEqual(data['entries'], [{'name': 'b.txt', 'type': 'file', 'size': 4, 'mtime': data['entries'][0]['mtime']}])
+        page = b''.join(render(listing, '/', 'html', 1, 2)).decode()
+        self.assertIn('<a href="A%20%3Cx%3E.txt">A &lt;x&gt;.txt</a>', page)
+        self.assertIn('<a href="?page=2">next</a>', page)
+
+    def test_format_negotiation(self):
+        self.assertTrue(wants_json({'format': 'json'}, 'text/html'))
+        self.assertTrue(wants_json({}, 'application/json'))
+        self.assertFalse(wants_json({}, 'text/html,application/json;q=0.9'))
+
+    def fetch(self, path, **headers):
+        config = ServerConfig(root=self.root, log_enabled=False, autoindex=True)
+        server, client = socket.socketpair()
+        with server, client:
+            request = HTTPRequest('GET', path, 'HTTP/1.0', headers)
+            handle_request(server, ('127.0.0.1', 1), request, config, LRUCache(8, 1024))
+            server.shutdown(socket.SHUT_WR)
+            data = b''
+            while chunk := client.recv(65536):
+                data += chunk
+        head, _, body = data.partition(b'\r\n\r\n')
+        lines = head.decode().split('\r\n')
+        return int(lines[0].split()[1]), dict(line.split(': ', 1) for line in lines[1:]), body
+
+    def test_served_listing(self):
+        status, headers, _ = self.fetch('/Sub?x=1')
+        self.assertEqual((status, headers['Location']), (301, '/Sub/?x=1'))
+        status, headers, body = self.fetch('/?format=json')
+        self.assertEqual((status, json.loads(body)['total']), (200, 3))
+        self.assertEqual(self.fetch('/?format=json', **{'if-none-match': headers['ETag']})[0], 304)
+        self.assertEqual(self.fetch('/A%20%3Cx%3E.txt')[2], b'data')
+
+if __name__ == '__main__':
+    unittest.main()
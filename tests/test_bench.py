@@ -0,0 +1,28 @@
+import tempfile
+import unittest
+from pathlib import Path
+from src.webserver.bench import compare, launch_server, percentile
+
+class TestBenchReport(unittest.TestCase):
+    def test_percentile(self):
+        values = [i / 100 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 0.5)
+        self.assertEqual(percentile(values, 99), 0.99)
+        self.assertEqual(percentile([], 99), 0.0)
+
+    def test_compare_flags_throughput_and_tail_regressions(self):
+        baseline = {'scenarios': {'api': {'rps': 1000, 'p99_ms': 2.0}, 'static': {'rps': 1000, 'p99_ms': 2.0}}}
+        current = {'scenarios': {'api': {'rps': 800, 'p99_ms': 2.1}, 'static': {'rps': 990, 'p99_ms': 3.0}}}
+        regressions = compare(current, baseline, tolerance=0.1)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('api: rps'))
+        self.assertTrue(regressions[1].startswith('static: p99'))
+
+    def test_startup_failure_reports_server_stderr(self):
+        with self.assertRaises(RuntimeError) as cm:
+            launch_server(Path(tempfile.mkdtemp()), '127.0.0.1', ['--no-such-flag'])
+        self.assertIn('exited with status', str(cm.exception))
+        self.assertIn('--no-such-flag', str(cm.exception))
+
+if __name__ == '__main__':
+    unittest.main()
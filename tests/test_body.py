@@ -0,0 +1,56 @@
+import socket
+import time
+import unittest
+from src.webserver.body import BodyTooLarge, BodyTooSlow, RequestBody
+from src.webserver.http import HTTPParseError
+from src.webserver.stream import SocketReader
+
+def _reader(payload: bytes, bufsize: int = 4) -> SocketReader:
+    a, b = socket.socketpair()
+    b.sendall(payload)
+    b.close()
+    return SocketReader(a, bufsize)
+
+class TestRequestBody(unittest.TestCase):
+    def test_content_length_leaves_pipelined_bytes(self):
+        reader = _reader(b'hello worldGET')
+        body = RequestBody(reader, length=11)
+        self.assertEqual(list(body), [b'hell', b'o wo', b'rld'])
+        self.assertTrue(body.complete)
+        self.assertEqual(reader.read(1), b'G')
+
+    def test_chunked_decoding_with_trailers(self):
+        reader = _reader(b'5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\nX-Trailer: 1\r\n\r\n')
+        body = RequestBody(reader, chunked=True)
+        self.assertEqual(body.read(), b'hello world')
+        self.assertTrue(body.complete)
+
+    def test_spool_and_size_limit(self):
+        body = RequestBody(_reader(b'a' * 32, bufsize=8), length=32, spool_threshold=16)
+        f = body.spool()
+        self.assertTrue(f._rolled)  # moved to disk above the threshold
+        self.assertEqual(f.read(), b'a' * 32)
+        with self.assertRaises(BodyTooLarge):
+            RequestBody(_reader(b'20\r\n' + b'a' * 32), chunked=True, max_size=16).read()
+
+    def test_malformed_chunk(self):
+        for size in (b'zz', b'', b'0x5', b'+5', b'-0', b'1_0'):
+            with self.assertRaises(HTTPParseError):
+                RequestBody(_reader(size + b'\r\nhello\r\n0\r\n\r\n'), chunked=True).read()
+
+    def test_body_below_minimum_rate(self):
+        a, b = socket.socketpair()
+        with a, b:
+            a.settimeout(5)  # the per-read timeout alone would wait this long
+            b.sendall(b'ab')
+            body = RequestBody(SocketReader(a, 4), length=10, min_rate=1000, grace=0.1)
+            started = time.monotonic()
+            with self.assertRaises(BodyTooSlow):
+                body.read()
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertEqual(a.gettimeout(), 5)
+        body = RequestBody(_reader(b'hello'), length=5, min_rate=1000, grace=0.1)
+        self.assertEqual(body.read(), b'hello')
+
+if __name__ == '__main__':
+    unittest.main()
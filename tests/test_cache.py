@@ -0,0 +1,57 @@
+import unittest
+from src.webserver.cache import LRUCache, ResponseCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2, 100)
+        cache.put('a', b'1')
+        cache.put('b', b'2')
+        cache.get('a')
+        cache.put('c', b'3')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'1')
+
+    def test_byte_budget_and_counters(self):
+        cache = LRUCache(10, 100, max_bytes=5)
+        cache.put('a', b'aaa')
+        cache.put('b', b'bbb')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), b'bbb')
+        self.assertEqual((len(cache), cache.size_bytes, cache.hits, cache.misses), (1, 3, 1, 1))
+
+    def test_resize_keeps_what_fits(self):
+        cache = LRUCache(4, 100)
+        for key in 'abcd':
+            cache.put(key, key.encode() * 3)
+        cache.get('a')
+        cache.resize(capacity=2)
+        self.assertEqual(cache.keys(), ['d', 'a'])
+        cache.resize(max_size=2)
+        self.assertEqual(len(cache), 0)
+        self.assertFalse(cache.put('e', b'eee'))
+
+class TestResponseCache(unittest.TestCase):
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = ResponseCache(clock=clock)
+        cache.put('k', (b'v', 'text/plain'), ttl=5)
+        self.assertEqual(cache.get('k'), (b'v', 'text/plain'))
+        clock.now = 5
+        self.assertIsNone(cache.get('k'))
+
+    def test_byte_budget(self):
+        cache = ResponseCache(max_entries=10, max_bytes=4)
+        cache.put('a', (b'aa', 'text/plain'), ttl=5)
+        cache.put('b', (b'bbb', 'text/plain'), ttl=5)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from src.webserver.body import RequestBody
+from src.webserver.cache import LRUCache, ResponseCache
+from src.webserver.config import ServerConfig
+from src.webserver.handlers import BlockingHandler, HandlerBusy, HandlerTimeout
+from src.webserver.http import HTTPRequest
+from src.webserver.routing import Router
+from src.webserver.server import finish_body, handle_request
+from src.webserver.stream import SocketReader
+from src.webserver.vhosts import VirtualHost
+
+class TestDynamicHandlers(unittest.TestCase):
+    def test_async_handler(self):
+        router = Router(builtin=False)
+
+        async def hello(path, params):
+            await asyncio.sleep(0)
+            return params['name'].encode(), 'text/plain'
+        router.register('/hello/{name}', hello)
+        self.assertEqual(router.dispatch('/hello/bob'), (b'bob', 'text/plain'))
+
+    def test_blocking_handler_concurrency_limit(self):
+        release = threading.Event()
+
+        def slow(path, params):
+            release.wait(2)
+            return b'done', 'text/plain'
+        handler = BlockingHandler(slow, max_concurrency=1, timeout=0.05)
+        with self.assertRaises(HandlerTimeout):
+            handler('/slow', {})
+        # The first call is still running, so the single slot is taken.
+        with self.assertRaises(HandlerBusy):
+            handler('/slow', {})
+        release.set()
+
+    def test_cached_route_normalizes_params(self):
+        router = Router(builtin=False)
+        calls = []
+        gate = threading.Event()
+
+        def report(path, params):
+            calls.append(params)
+            gate.wait(2)
+            return b'report', 'text/plain'
+        router.register('/report', report, cache_ttl=60)
+        threads = [threading.Thread(target=router.dispatch, args=('/report?b=2&a=1',)) for _ in range(5)]
+        for t in threads:
+            t.start()
+        gate.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(router.dispatch('/report?a=1&b=2'), (b'report', 'text/plain'))
+        self.assertEqual(len(calls), 1)
+        with self.assertRaises(ValueError):
+            router.register('/submit', report, methods=['POST'], cache_ttl=5)
+
+    def test_concurrent_misses_are_coalesced(self):
+        cache = ResponseCache(max_bytes=0)  # nothing is stored, so only single-flight can share the result
+        calls = []
+        gate = threading.Event()
+
+        def compute():
+            calls.append(1)
+            gate.wait(2)
+            return b'report', 'text/plain'
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', 60, compute)))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        deadline = time.monotonic() + 2
+        while cache.misses < 5 and time.monotonic() < deadline:  # every caller joined the flight
+            time.sleep(0.001)
+        gate.set()
+        for t in threads:
+            t.join()
+        self.assertEqual((len(calls), results), (1, [(b'report', 'text/plain')] * 5))
+        cache.get_or_compute('k', 60, compute)
+        self.assertEqual(len(calls), 2)  # a later miss computes again
+
+class TestHandleRequest(unittest.TestCase):
+    def setUp(self):
+        self.config = ServerConfig(root=tempfile.mkdtemp(), log_enabled=False)
+        self.router = Router()
+        self.site = VirtualHost('test', self.config.root, self.router, LRUCache(4, 1024))
+
+    def _serve(self, request):
+        server, client = socket.socketpair()
+        with server, client:
+            keep_alive = handle_request(server, ('127.0.0.1', 1), request, self.config, self.site.cache, site=self.site)
+            server.shutdown(socket.SHUT_WR)
+            return keep_alive, b''.join(iter(lambda: client.recv(4096), b''))
+
+    def test_handler_exception_is_500(self):
+        def boom(path, params):
+            raise RuntimeError('bug')
+        self.router.register('/boom', boom)
+        keep_alive, reply = self._serve(HTTPRequest('GET', '/boom', 'HTTP/1.1', {'host': 'a'}))
+        self.assertFalse(keep_alive)
+        self.assertTrue(reply.startswith(b'HTTP/1.1 500 '))
+
+    def test_upload_without_body(self):
+        _keep_alive, reply = self._serve(HTTPRequest('POST', '/api/upload', 'HTTP/1.1', {'content-length': '0'}))
+        self.assertTrue(reply.startswith(b'HTTP/1.1 200 '))
+        self.assertEqual(json.loads(reply.partition(b'\r\n\r\n')[2])['bytes'], 0)
+
+    def test_unread_body_after_response_closes_without_100_continue(self):
+        server, client = socket.socketpair()
+        with server, client:
+            sent = []
+            request = HTTPRequest('POST', '/x', 'HTTP/1.1', {'expect': '100-continue', 'content-length': '5'})
+            request.body = RequestBody(SocketReader(server, 64), length=5, on_first_read=lambda: sent.append(1))
+            self.assertFalse(finish_body(request))
+            self.assertEqual(sent, [])
+            del request.headers['expect']
+            client.sendall(b'hello')
+            self.assertTrue(finish_body(request))
+
+if __name__ == '__main__':
+    unittest.main()
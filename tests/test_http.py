@@ -1,5 +1,5 @@
 import unittest
-from src.webserver.http import parse_request, HTTPParseError
+from src.webserver.http import HTTPRequest, parse_request, HTTPParseError
 
 class TestHTTPParsing(unittest.TestCase):
     def test_basic_get(self):
@@ -16,7 +16,7 @@ class TestHTTPParsing(unittest.TestCase):
             parse_request(raw, 4096)
 
     def test_unsupported_method(self):
-        raw = b"POST / HTTP/1.1\r\nHost: a\r\n\r\n"
+        raw = b"DELETE / HTTP/1.1\r\nHost: a\r\n\r\n"
         with self.assertRaises(HTTPParseError):
             parse_request(raw, 4096)
 
@@ -25,5 +25,25 @@ class TestHTTPParsing(unittest.TestCase):
         with self.assertRaises(HTTPParseError):
             parse_request(raw, 4096)
 
+    def test_post_with_content_length(self):
+        raw = b"POST /upload HTTP/1.1\r\nHost: a\r\nContent-Length: 5\r\n\r\n"
+        req = parse_request(raw, 4096)
+        self.assertEqual(req.method, 'POST')
+        self.assertEqual(req.content_length, 5)
+        self.assertFalse(req.chunked)
+
+    def test_invalid_content_length(self):
+        for value in ('²', '-1', '+5', '5 5', ''):
+            raw = f"POST / HTTP/1.1\r\nHost: a\r\nContent-Length: {value}\r\n\r\n".encode('utf-8')
+            with self.assertRaises(HTTPParseError):
+                parse_request(raw, 4096)
+        with self.assertRaises(HTTPParseError):
+            HTTPRequest('POST', '/', 'HTTP/2', {'content-length': '²'}).content_length
+
+    def test_conflicting_body_framing(self):
+        raw = b"PUT / HTTP/1.1\r\nHost: a\r\nContent-Length: 5\r\nTransfer-Encoding: chunked\r\n\r\n"
+        with self.assertRaises(HTTPParseError):
+            parse_request(raw, 4096)
+
 if __name__ == '__main__':
     unittest.main()
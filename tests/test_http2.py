@@ -0,0 +1,149 @@
+import hashlib
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from src.webserver import http2
+from src.webserver.cache import LRUCache
+from src.webserver.config import ServerConfig
+from src.webserver.idle import IdleManager
+from src.webserver.server import Connection, ServerContext, handle_connection, handle_request
+from src.webserver.workers import WorkerPool
+
+if http2.available():
+    import h2.connection
+    import h2.events
+
+@unittest.skipUnless(http2.available(), "optional 'h2' package not installed")
+class TestHTTP2Session(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        Path(self.tmp.name, 'a.txt').write_bytes(b'hello')
+        self.config = ServerConfig(root=self.tmp.name, max_body_size=1024 * 1024, log_enabled=False)
+        cache = LRUCache(8, 1024)
+        server_sock, self.sock = socket.socketpair()
+        self.sock.settimeout(5)
+        self.session = http2.H2Session(
+            server_sock, ('127.0.0.1', 1), self.config,
+            lambda stream, request: handle_request(stream, ('127.0.0.1', 1), request, self.config, cache),
+            lambda fn, *args: threading.Thread(target=fn, args=args).start())
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.start()
+        self.client = h2.connection.H2Connection()
+        self.client.initiate_connection()
+        self.responses = {}
+
+    def _serve(self):
+        while self.session.serve():
+            pass  # the real server parks here; keep reading until the client closes
+
+    def tearDown(self):
+        self.sock.close()
+        self.thread.join(5)
+        self.session.sock.close()
+        self.tmp.cleanup()
+
+    def _request(self, path, method='GET', body=None):
+        stream_id = self.client.get_next_available_stream_id()
+        self.client.send_headers(stream_id, [(':method', method), (':path', path), (':scheme', 'http'),
+                                             (':authority', 'localhost')], end_stream=body is None)
+        self.responses[stream_id] = {'status': None, 'headers': {}, 'body': b'', 'done': False}
+        if body is not None:
+            self._upload(stream_id, body)
+        return stream_id
+
+    def _upload(self, stream_id, body):
+        while body:
+            window = min(self.client.local_flow_control_window(stream_id), self.client.max_outbound_frame_size)
+            if not window:
+                self._pump()
+                continue
+            self.client.send_data(stream_id, body[:window])
+            body = body[window:]
+        self.client.end_stream(stream_id)
+
+    def _pump(self):
+        self.sock.sendall(self.client.data_to_send())
+        for event in self.client.receive_data(self.sock.recv(65536)):
+            response = self.responses.get(getattr(event, 'stream_id', None))
+            if isinstance(event, h2.events.ResponseReceived):
+                response['headers'] = dict(event.headers)
+                response['status'] = int(response['headers'][b':status'])
+            elif isinstance(event, h2.events.DataReceived):
+                response['body'] += event.data
+                self.client.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, (h2.events.StreamEnded, h2.events.StreamReset)) and response is not None:
+                response['done'] = True
+        self.sock.sendall(self.client.data_to_send())
+
+    def _wait(self):
+        while not all(r['done'] for r in self.responses.values()):
+            self._pump()
+        return self.responses
+
+    def test_multiplexed_requests_on_one_connection(self):
+        static = self._request('/a.txt')
+        api = self._request('/api/echo?msg=hi')
+        missing = self._request('/missing')
+        responses = self._wait()
+        self.assertEqual((responses[static]['status'], responses[static]['body']), (200, b'hello'))
+        self.assertEqual(responses[api]['body'], b'{"echo": "hi"}')
+        self.assertEqual(responses[missing]['status'], 404)
+        self.assertNotIn(b'connection', responses[static]['headers'])
+
+    def test_upload_larger_than_flow_control_window(self):
+        data = b'u' * 200000
+        stream_id = self._request('/api/upload', 'POST', data)
+        response = self._wait()[stream_id]
+        self.assertEqual(response['status'], 200)
+        self.assertIn(hashlib.sha256(data).hexdigest().encode(), response['body'])
+
+    def test_unread_uploads_return_connection_window(self):
+        for _ in range(3):  # 90 KB never read by the handler, more than the 64 KB connection window
+            stream_id = self._request('/api/time', 'POST', b'x' * 30000)
+            self.assertEqual(self._wait()[stream_id]['status'], 405)
+        data = b'u' * 100000
+        stream_id = self._request('/api/upload', 'POST', data)
+        response = self._wait()[stream_id]
+        self.assertEqual(response['status'], 200)
+        self.assertIn(hashlib.sha256(data).hexdigest().encode(), response['body'])
+
+    def test_declared_body_too_large(self):
+        stream_id = self.client.get_next_available_stream_id()
+        self.client.send_headers(stream_id, [(':method', 'POST'), (':path', '/api/upload'), (':scheme', 'http'),
+                                             (':authority', 'localhost'), ('content-length', str(2 * 1024 * 1024))])
+        self.responses[stream_id] = {'status': None, 'headers': {}, 'body': b'', 'done': False}
+        self.assertEqual(self._wait()[stream_id]['status'], 413)  # answered before any DATA is sent
+
+@unittest.skipUnless(http2.available(), "optional 'h2' package not installed")
+class TestHTTP2Workers(unittest.TestCase):
+    def test_streams_do_not_queue_behind_session_readers(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        Path(tmp.name, 'a.txt').write_bytes(b'hello')
+        config = ServerConfig(root=tmp.name, http2=True, log_enabled=False)
+        # One connection worker: the session reader takes it while its stream runs.
+        ctx = ServerContext(config, LRUCache(8, 1024), workers=WorkerPool(1, 'test-worker'),
+                            streams=WorkerPool(2, 'test-stream'))
+        ctx.idle = IdleManager(lambda conn: ctx.workers.submit(handle_connection, ctx, conn))
+        server_sock, sock = socket.socketpair()
+        self.addCleanup(sock.close)
+        sock.settimeout(5)
+        ctx.workers.submit(handle_connection, ctx, Connection(server_sock, ('127.0.0.1', 1), 8192))
+        client = h2.connection.H2Connection()
+        client.initiate_connection()
+        client.send_headers(1, [(':method', 'GET'), (':path', '/a.txt'), (':scheme', 'http'),
+                                (':authority', 'localhost')], end_stream=True)
+        sock.sendall(client.data_to_send())
+        body, done = b'', False
+        while not done:
+            for event in client.receive_data(sock.recv(65536)):
+                if isinstance(event, h2.events.DataReceived):
+                    body += event.data
+                done = done or isinstance(event, h2.events.StreamEnded)
+            sock.sendall(client.data_to_send())
+        self.assertEqual(body, b'hello')
+
+if __name__ == '__main__':
+    unittest.main()
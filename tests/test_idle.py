@@ -0,0 +1,142 @@
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from src.webserver.cache import LRUCache
+from src.webserver.config import ServerConfig
+from src.webserver.idle import IdleManager, TimingWheel
+from src.webserver.server import Connection, ServerContext, expire_connection, handle_connection
+from src.webserver.stats import connections
+from src.webserver.workers import WorkerPool
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class Parked:
+    def __init__(self, sock):
+        self.sock = sock
+
+    def close(self):
+        self.sock.close()
+
+class TestTimingWheel(unittest.TestCase):
+    def test_expiry_and_cancel(self):
+        clock = FakeClock()
+        wheel = TimingWheel(tick=1.0, slots=8, clock=clock)
+        wheel.schedule('a', 2)
+        wheel.schedule('b', 20)  # more than one revolution
+        wheel.schedule('c', 2)
+        wheel.cancel('c')
+        clock.now += 1
+        self.assertEqual(wheel.advance(), [])
+        clock.now += 1
+        self.assertEqual(wheel.advance(), ['a'])
+        clock.now += 17
+        self.assertEqual(wheel.advance(), [])
+        clock.now += 1
+        self.assertEqual(wheel.advance(), ['b'])
+        self.assertEqual(len(wheel), 0)
+
+class TestIdleManager(unittest.TestCase):
+    def setUp(self):
+        self.pairs = []
+
+    def tearDown(self):
+        for a, b in self.pairs:
+            a.close()
+            b.close()
+
+    def _pair(self):
+        pair = socket.socketpair()
+        self.pairs.append(pair)
+        return pair
+
+    def test_dispatches_readable_and_evicts_oldest(self):
+        ready = []
+        woke = threading.Event()
+        manager = IdleManager(lambda conn: (ready.append(conn), woke.set()), max_idle=2, tick=0.01)
+        conns = []
+        for _ in range(3):
+            server_side, client_side = self._pair()
+            conns.append((Parked(server_side), client_side))
+            manager.park(conns[-1][0], timeout=5)
+        conns[2][1].sendall(b'GET')
+        self.assertTrue(woke.wait(2))
+        self.assertIs(ready[0], conns[2][0])
+        self.assertEqual(manager.evicted, 1)
+        self.assertEqual(conns[0][0].sock.fileno(), -1)  # oldest was closed
+
+    def test_idle_timeout_closes(self):
+        manager = IdleManager(lambda conn: None, tick=0.01)
+        server_side, _client = self._pair()
+        manager.park(Parked(server_side), timeout=0.02)
+        deadline = time.monotonic() + 2
+        while manager.expired == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(manager.expired, 1)
+
+class TestPartialHeaders(unittest.TestCase):
+    def serve(self, **options):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        Path(tmp.name, 'a.txt').write_bytes(b'hello')
+        config = ServerConfig(root=tmp.name, log_enabled=False, **options)
+        ctx = ServerContext(config, LRUCache(8, 1024), workers=WorkerPool(2, 'test-worker'))
+        ctx.idle = IdleManager(lambda conn: ctx.workers.submit(handle_connection, ctx, conn), tick=0.01,
+                               on_expire=expire_connection)
+
+        def connect():
+            server_side, client = socket.socketpair()
+            self.addCleanup(client.close)
+            client.settimeout(2)
+            ctx.idle.park(Connection(server_side, ('127.0.0.1', 1), 8192), config.header_timeout)
+            return client
+        return connect
+
+    def test_trickling_clients_hold_no_worker(self):
+        connect = self.serve(header_timeout=5)
+        slow = [connect() for _ in range(2)]  # as many as there are workers
+        for client in slow:
+            client.sendall(b'G')
+        time.sleep(0.05)
+        client = connect()
+        client.sendall(b'GET /a.txt HTTP/1.1\r\nHost: x\r\n\r\n')
+        self.assertTrue(client.recv(65536).startswith(b'HTTP/1.1 200'))
+        slow[0].sendall(b'ET /a.txt HTTP/1.1\r\nHost: x\r\n\r\n')  # the parked prefix was kept
+        self.assertTrue(slow[0].recv(65536).startswith(b'HTTP/1.1 200'))
+
+    def test_header_deadline_spans_reads(self):
+        connect = self.serve(header_timeout=0.2)
+        dropped = connections.snapshot()['dropped'].get('header_deadline', 0)
+        client = connect()
+        start = time.monotonic()
+        try:
+            client.sendall(b'GET /a.txt HTTP/1.1\r\n')
+            while time.monotonic() - start < 2:  # each header line arrives well within header_timeout
+                time.sleep(0.05)
+                client.sendall(b'X-Slow: 1\r\n')
+        except OSError:
+            pass  # closed by the server
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(client.recv(65536), b'')  # no response
+        self.assertEqual(connections.snapshot()['dropped']['header_deadline'], dropped + 1)
+
+class TestWorkerPool(unittest.TestCase):
+    def test_resize(self):
+        pool = WorkerPool(2)
+        done = threading.Event()
+        pool.submit(done.set)
+        self.assertTrue(done.wait(2))
+        pool.resize(4)
+        self.assertEqual(pool.size, 4)
+        pool.resize(1)
+        self.assertEqual(pool.size, 1)
+
+if __name__ == '__main__':
+    unittest.main()
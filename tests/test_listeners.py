@@ -0,0 +1,83 @@
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+from src.webserver.listeners import (bind_listener, describe, format_address, inherited_listener, is_local,
+                                     open_listeners, peer_address, remove_socket_files, systemd_listeners)
+
+class TestListeners(unittest.TestCase):
+    def test_unix_listener_and_cleanup(self):
+        path = os.path.join(tempfile.mkdtemp(), 'srv.sock')
+        spec = 'unix:' + path
+        sock = bind_listener(spec)
+        sock.close()
+        sock = bind_listener(spec)  # stale socket file from the previous bind is replaced
+        self.addCleanup(sock.close)
+        self.assertEqual(describe(sock), spec)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)
+            conn, addr = sock.accept()
+            conn.close()
+        self.assertEqual(peer_address(addr), '')
+        remove_socket_files([spec])
+        self.assertFalse(os.path.exists(path))
+
+    def test_unix_listener_refuses_regular_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'data')
+        open(path, 'w').close()
+        with self.assertRaises(OSError):
+            bind_listener('unix:' + path)
+        self.assertTrue(os.path.exists(path))
+
+    @unittest.skipUnless(socket.has_ipv6, 'IPv6 not available')
+    def test_dual_stack_accepts_ipv4(self):
+        try:
+            sock = bind_listener('[::]:0')
+        except OSError:
+            self.skipTest('IPv6 not available')
+        self.addCleanup(sock.close)
+        port = sock.getsockname()[1]
+        with socket.create_connection(('127.0.0.1', port), timeout=2):
+            conn, addr = sock.accept()
+            conn.close()
+        self.assertEqual(peer_address(addr)[0], '127.0.0.1')
+        only = bind_listener('[::]:0', v6only=True)
+        self.addCleanup(only.close)
+        with self.assertRaises(OSError):
+            socket.create_connection(('127.0.0.1', only.getsockname()[1]), timeout=2).close()
+
+    def test_inherited_fd(self):
+        original = bind_listener('127.0.0.1:0')
+        self.addCleanup(original.close)
+        sock = inherited_listener(os.dup(original.fileno()))
+        self.addCleanup(sock.close)
+        self.assertEqual(sock.getsockname(), original.getsockname())
+        self.assertEqual(open_listeners([f'fd:{os.dup(sock.fileno())}'])[0].getsockname(), original.getsockname())
+
+    def test_systemd_only_for_this_process(self):
+        with mock.patch.dict(os.environ, {'LISTEN_PID': str(os.getpid() + 1), 'LISTEN_FDS': '1'}):
+            self.assertEqual(systemd_listeners(), [])
+            with self.assertRaises(OSError):
+                open_listeners(['systemd'])
+
+    def test_open_listeners_all_or_none(self):
+        taken = bind_listener('127.0.0.1:0')
+        self.addCleanup(taken.close)
+        path = os.path.join(tempfile.mkdtemp(), 'srv.sock')
+        with self.assertRaises(OSError):
+            open_listeners(['unix:' + path, format_address(*taken.getsockname())])
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            with self.assertRaises(OSError):
+                client.connect(path)  # the first listener was closed again
+
+    def test_addresses(self):
+        self.assertEqual(format_address('::1', 80), '[::1]:80')
+        self.assertTrue(is_local('unix:/tmp/x.sock'))
+        self.assertTrue(is_local('[::1]:9000'))
+        self.assertFalse(is_local('0.0.0.0:9000'))
+        self.assertEqual(peer_address(('::ffff:10.0.0.1', 5, 0, 0)), ('10.0.0.1', 5))
+        self.assertEqual(peer_address(('::1', 5, 0, 0)), ('::1', 5))
+
+if __name__ == '__main__':
+    unittest.main()
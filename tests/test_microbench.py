@@ -0,0 +1,28 @@
+import json
+import os
+import unittest
+from src.webserver import microbench
+
+class TestMicrobench(unittest.TestCase):
+    def test_every_primitive_is_measured(self):
+        results = microbench.run(number=20, repeat=1)
+        self.assertEqual(set(results), set(microbench.primitives()))
+        for r in results.values():
+            self.assertGreater(r['ns_per_op'], 0)
+            self.assertGreaterEqual(r['alloc_peak_bytes'], 0)
+
+    def test_compare_flags_slowdown_and_allocation_growth(self):
+        baseline = {'parse_request': {'ns_per_op': 1000.0, 'alloc_peak_bytes': 1000}}
+        self.assertEqual(microbench.compare({'parse_request': {'ns_per_op': 1400.0, 'alloc_peak_bytes': 1100}}, baseline), [])
+        regressions = microbench.compare({'parse_request': {'ns_per_op': 2000.0, 'alloc_peak_bytes': 4000}}, baseline)
+        self.assertEqual(len(regressions), 2)
+
+    @unittest.skipUnless(os.environ.get('PYNETLITE_MICROBENCH_BASELINE'), 'set PYNETLITE_MICROBENCH_BASELINE to gate on a baseline')
+    def test_no_regression_against_baseline(self):
+        with open(os.environ['PYNETLITE_MICROBENCH_BASELINE']) as f:
+            baseline = json.load(f)
+        threshold = float(os.environ.get('PYNETLITE_MICROBENCH_THRESHOLD', '1.5'))
+        self.assertEqual(microbench.compare(microbench.run(), baseline, threshold), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.webserver.body import BodyTooLarge, BodyTooSlow
+from src.webserver.handlers import HTTPError
+from src.webserver.http import HTTPParseError, HTTPRequest
+from src.webserver.proxy import ProxyHandler, UpstreamPool
+from src.webserver.response import finalize_response
+
+class Backend(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/stream':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.send_header('Set-Cookie', 'a=1')
+            self.send_header('Set-Cookie', 'b=2')
+            self.end_headers()
+            for piece in (b'one', b'two'):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(piece), piece))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        body = f'{self.server.name} {self.path} {self.headers.get("x-forwarded-for")}'.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers['content-length']))
+        self.send_response(201)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data[::-1])
+
+def start_backend(name):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Backend)
+    server.name = name
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server
+
+def address(server):
+    return f'127.0.0.1:{server.server_address[1]}'
+
+def fetch(handler, path, method='GET', body=None):
+    request = HTTPRequest(method, path, 'HTTP/1.1', {'host': 'example'}, client=('10.0.0.1', 5))
+    if body is not None:
+        request.headers['content-length'] = str(sum(map(len, body)))
+        request.body = body
+    resp = handler(path, {}, request)
+    data = resp.body if isinstance(resp.body, bytes) else b''.join(resp.body)
+    return resp, data
+
+class FakeBody(list):
+    started = False
+
+class TestProxy(unittest.TestCase):
+    def setUp(self):
+        self.backends = [start_backend('A'), start_backend('B')]
+
+    def tearDown(self):
+        for server in self.backends:
+            server.shutdown()
+            server.server_close()
+
+    def pool(self, **options):
+        pool = UpstreamPool([address(s) for s in self.backends], health_interval=0, **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_round_robin_reuses_connections(self):
+        pool = self.pool()
+        handler = ProxyHandler(pool, '/app', strip_prefix=True)
+        names = [fetch(handler, f'/app/x?n={i}')[1].split()[0] for i in range(6)]
+        self.assertEqual(names, [b'A', b'B'] * 3)
+        _resp, data = fetch(handler, '/app/items?q=1')
+        self.assertTrue(data.endswith(b' /items?q=1 10.0.0.1'))
+        for upstream in pool.upstreams:
+            self.assertEqual(upstream.opened, 1)
+            self.assertGreaterEqual(upstream.reused, 2)
+            self.assertEqual(upstream.active, 0)
+
+    def test_streamed_chunked_response_keeps_repeated_headers(self):
+        resp, data = fetch(ProxyHandler(self.pool()), '/stream')
+        self.assertEqual(data, b'onetwo')
+        self.assertEqual(resp.headers['Set-Cookie'], ['a=1', 'b=2'])
+        head = finalize_response(resp, chunked=True).head_bytes()
+        self.assertEqual(head.count(b'Set-Cookie:'), 2)
+        self.assertIn(b'Transfer-Encoding: chunked', head)
+
+    def test_request_body_forwarded(self):
+        resp, data = fetch(ProxyHandler(self.pool()), '/upload', 'POST', FakeBody([b'abc', b'def']))
+        self.assertEqual((resp.status_code, data), (201, b'fedcba'))
+
+    def test_client_body_errors_are_not_upstream_failures(self):
+        class BrokenBody:
+            started = True
+            def __init__(self, error):
+                self.error = error
+            def __iter__(self):
+                yield b'abc'
+                raise self.error
+        pool = self.pool()
+        handler = ProxyHandler(pool)
+        for error in (HTTPParseError('Malformed chunk size'), BodyTooLarge('Request body too large'),
+                      BodyTooSlow('Client sending below minimum transfer rate'), ConnectionResetError('client gone')):
+            with self.subTest(error=type(error).__name__):
+                request = HTTPRequest('POST', '/upload', 'HTTP/1.1', {'transfer-encoding': 'chunked'},
+                                      client=('10.0.0.1', 5))
+                request.body = BrokenBody(error)
+                with self.assertRaises(type(error)):
+                    handler('/upload', {}, request)
+        self.assertEqual([u.failures for u in pool.upstreams], [0, 0])
+        self.assertTrue(all(u.healthy for u in pool.upstreams))
+        self.assertEqual(sum(u.active for u in pool.upstreams), 0)
+
+    def test_dead_upstream_fails_over(self):
+        dead = self.backends.pop()
+        dead.shutdown()
+        dead.server_close()
+        pool = UpstreamPool([address(self.backends[0]), address(dead)], health_interval=0)
+        self.addCleanup(pool.close)
+        handler = ProxyHandler(pool)
+        names = {fetch(handler, '/x')[1].split()[0] for _ in range(4)}
+        self.assertEqual(names, {b'A'})
+        self.assertFalse(pool.upstreams[1].healthy)
+        pool.mark_down(pool.upstreams[0], 'test')
+        with self.assertRaises(HTTPError) as cm:
+            fetch(handler, '/x')
+        self.assertEqual(cm.exception.status, 503)
+
+    def test_down_upstream_recovers_without_health_checks(self):
+        pool = self.pool(retry_after=0.05)
+        handler = ProxyHandler(pool)
+        pool.mark_down(pool.upstreams[0], 'transient')
+        self.assertEqual({fetch(handler, '/x')[1].split()[0] for _ in range(3)}, {b'B'})
+        time.sleep(0.06)
+        self.assertEqual(fetch(handler, '/x')[1].split()[0], b'A')  # the trial request
+        self.assertTrue(pool.upstreams[0].healthy)
+        self.assertEqual(pool.upstreams[0].failures, 1)
+
+    def test_least_conn_prefers_idle_upstream(self):
+        pool = self.pool(balance='least_conn')
+        pool.upstreams[0].active = 3
+        self.assertIs(pool.pick(), pool.upstreams[1])
+
+    def test_abandoned_body_releases_connection(self):
+        pool = self.pool()
+        resp = ProxyHandler(pool)('/stream', {}, HTTPRequest('GET', '/stream', 'HTTP/1.1', {}))
+        resp.body.close()
+        self.assertEqual(sum(u.active for u in pool.upstreams), 0)
+
+if __name__ == '__main__':
+    unittest.main()
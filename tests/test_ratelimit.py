@@ -0,0 +1,49 @@
+import unittest
+from src.webserver.handlers import HTTPError
+from src.webserver.http import HTTPRequest
+from src.webserver.ratelimit import ConnectionLimiter, TokenBucketTable
+from src.webserver.routing import Router
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTokenBuckets(unittest.TestCase):
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        table = TokenBucketTable(rate=2, burst=3, clock=clock)
+        self.assertEqual([table.allow('a')[0] for _ in range(4)], [True, True, True, False])
+        self.assertEqual(table.allow('a'), (False, 0.5))
+        self.assertTrue(table.allow('b')[0])  # other clients are unaffected
+        clock.now = 0.5
+        self.assertTrue(table.allow('a')[0])
+
+    def test_bounded_keys(self):
+        table = TokenBucketTable(rate=1, burst=1, max_keys=2)
+        for key in 'abc':
+            table.allow(key)
+        self.assertEqual(len(table), 2)
+
+    def test_connection_limiter(self):
+        limiter = ConnectionLimiter(1)
+        self.assertTrue(limiter.acquire('a'))
+        self.assertFalse(limiter.acquire('a'))
+        limiter.release('a')
+        self.assertTrue(limiter.acquire('a'))
+        self.assertEqual(limiter.rejected, 1)
+
+    def test_route_rate_limit(self):
+        router = Router(builtin=False)
+        router.register('/search', lambda path, params: (b'ok', 'text/plain'), rate_limit=(1, 1))
+        request = HTTPRequest('GET', '/search', 'HTTP/1.1', {}, client=('10.0.0.1', 5000))
+        router.dispatch('/search', request=request)
+        with self.assertRaises(HTTPError) as ctx:
+            router.dispatch('/search', request=request)
+        self.assertEqual(ctx.exception.status, 429)
+        self.assertEqual(ctx.exception.headers['Retry-After'], '1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from src.webserver.response import make_response
+
+class TestResponse(unittest.TestCase):
+    def test_bytes_body_sets_content_length(self):
+        resp = make_response(200, b'hello')
+        self.assertEqual(resp.headers['Content-Length'], '5')
+        self.assertTrue(resp.to_bytes().endswith(b'\r\n\r\nhello'))
+
+    def test_str_body_is_not_streamed(self):
+        resp = make_response(200, 'héllo')
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.headers['Content-Length'], '6')
+        self.assertTrue(resp.to_bytes().endswith('\r\n\r\nhéllo'.encode()))
+
+    def test_generator_body_is_chunked(self):
+        resp = make_response(200, (p for p in [b'ab', b'', b'cde']))
+        self.assertEqual(resp.headers['Transfer-Encoding'], 'chunked')
+        self.assertNotIn('Content-Length', resp.headers)
+        self.assertEqual(b''.join(resp.iter_encoded()), b'2\r\nab\r\n3\r\ncde\r\n0\r\n\r\n')
+
+    def test_stream_without_chunking_closes(self):
+        resp = make_response(200, iter([b'ab']), chunked=False)
+        self.assertEqual(resp.headers['Connection'], 'close')
+        self.assertEqual(b''.join(resp.iter_encoded()), b'ab')
+
+if __name__ == '__main__':
+    unittest.main()
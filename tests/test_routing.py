@@ -0,0 +1,47 @@
+import json
+import unittest
+from src.webserver.routing import Router, MethodNotAllowed
+
+def _handler(tag):
+    return lambda path, params: (tag, params)
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = Router(builtin=False)
+
+    def test_builtin_echo(self):
+        body, ctype = Router().dispatch('/api/echo?msg=hi')
+        self.assertEqual(json.loads(body), {'echo': 'hi'})
+        self.assertEqual(ctype, 'application/json')
+
+    def test_static_and_typed_params(self):
+        self.router.register('/api/users/me', _handler('me'))
+        self.router.register('/api/users/{id:int}', _handler('by-id'))
+        self.router.register('/api/users/{name}', _handler('by-name'))
+        self.assertEqual(self.router.dispatch('/api/users/me'), ('me', {}))
+        self.assertEqual(self.router.dispatch('/api/users/42'), ('by-id', {'id': 42}))
+        self.assertEqual(self.router.dispatch('/api/users/bob?x=1'), ('by-name', {'name': 'bob', 'x': '1'}))
+        for seg in ('1_0', '+1', '%201', '٣'):
+            self.assertEqual(self.router.dispatch(f'/api/users/{seg}')[0], 'by-name')
+
+    def test_catchall_and_mount(self):
+        sub = Router(builtin=False)
+        sub.register('/status', _handler('status'))
+        self.router.mount('/admin', sub)
+        self.router.register('/files/{rest:path}', _handler('files'))
+        self.assertEqual(self.router.dispatch('/admin/status'), ('status', {}))
+        self.assertEqual(self.router.dispatch('/files/a/b.txt'), ('files', {'rest': 'a/b.txt'}))
+        with self.assertRaises(KeyError):
+            self.router.dispatch('/admin/missing')
+
+    def test_method_matching(self):
+        self.router.register('/api/items', _handler('list'))
+        self.router.register('/api/items', _handler('create'), methods=['POST'])
+        self.assertEqual(self.router.dispatch('/api/items', 'HEAD'), ('list', {}))
+        self.assertEqual(self.router.dispatch('/api/items', 'POST'), ('create', {}))
+        with self.assertRaises(MethodNotAllowed) as ctx:
+            self.router.dispatch('/api/items', 'DELETE')
+        self.assertEqual(ctx.exception.allowed, ['GET', 'HEAD', 'POST'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from src.webserver.cache import LRUCache
+from src.webserver.stats import ConnectionTracker, ServerMetrics, percentile
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class TestServerMetrics(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = ServerMetrics(window=2, max_events=3, clock=self.clock)
+        self.metrics.tracker = ConnectionTracker()
+
+    def test_rate_and_percentiles(self):
+        for ms in range(1, 101):
+            self.metrics.record_request(float(ms))
+        self.clock.now = 101.5
+        snap = self.metrics.snapshot()
+        self.assertEqual(snap['requests'], 100)
+        self.assertEqual(snap['requests_per_sec'], 50.0)
+        self.assertEqual(snap['latency_ms'], {'p50': 51.0, 'p95': 96.0, 'p99': 100.0})
+        self.clock.now = 110.0
+        snap = self.metrics.snapshot()
+        self.assertEqual((snap['requests_per_sec'], snap['latency_ms']['p99']), (0.0, 0.0))
+
+    def test_sampling_scales_with_load(self):
+        metrics = ServerMetrics(window=2, max_samples=100, clock=self.clock)
+        for _ in range(500):  # 500/s would need 1000 samples per window
+            metrics.record_request(1.0)
+        self.clock.now = 101.0
+        for _ in range(500):
+            metrics.record_request(1.0)
+        self.assertEqual(len(metrics._latencies), 100)
+        self.assertEqual(metrics._stride, 10)
+        metrics.reset()
+        self.assertEqual((metrics.requests, len(metrics._latencies), metrics._stride), (0, 0, 1))
+        self.assertEqual(metrics.snapshot()['requests_per_sec'], 0.0)
+
+    def test_cache_ratio_and_connections(self):
+        cache = LRUCache(4, 100)
+        cache.put('a', b'x')
+        cache.get('a')
+        cache.get('b')
+        self.metrics.bind(caches=[cache])
+        self.metrics.tracker.set('c1', 'handling')
+        snap = self.metrics.snapshot()
+        self.assertEqual(snap['cache_hit_ratio'], 0.5)
+        self.assertEqual(snap['connections'], {'busy': 1, 'idle': 0, 'total': 1})
+
+    def test_event_feed_is_bounded(self):
+        for i in range(5):
+            self.metrics.publish('INFO', f'line {i}')
+        self.assertEqual([msg for _at, _level, msg in self.metrics.drain_events(2)], ['line 2', 'line 3'])
+        self.assertEqual(len(self.metrics.drain_events()), 1)
+        self.assertEqual(self.metrics.snapshot()['events_dropped'], 2)
+
+    def test_percentile(self):
+        self.assertEqual(percentile([], 0.5), 0.0)
+        self.assertEqual(percentile([1.0, 2.0, 3.0], 0.99), 3.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import socket
+import time
+import unittest
+from src.webserver.stats import ConnectionTracker
+from src.webserver.stream import DeadlineExceeded, SocketReader, send_all
+
+class TestDeadlines(unittest.TestCase):
+    def setUp(self):
+        self.server, self.client = socket.socketpair()
+
+    def tearDown(self):
+        self.server.close()
+        self.client.close()
+
+    def test_header_deadline_is_total_not_per_recv(self):
+        reader = SocketReader(self.server)
+        self.client.sendall(b'GET / HTTP/1.1\r\n')  # headers never finish
+        with self.assertRaises(socket.timeout):
+            reader.read_headers(4096, deadline=time.monotonic() + 0.05)
+
+    def test_slow_reader_is_cut_off(self):
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            send_all(self.server, b'x' * (4 * 1024 * 1024), min_rate=64 * 1024 * 1024, grace=0.05)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_deadline_covers_every_send(self):
+        class Trickle:  # like SSLSocket: each send() gets the full timeout
+            timeout = None
+            def gettimeout(self): return self.timeout
+            def settimeout(self, t): self.timeout = t
+            def send(self, data):
+                time.sleep(0.01)
+                return 1
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            send_all(Trickle(), b'x' * 1000, min_rate=1e6, grace=0.05)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_fast_send_unchanged(self):
+        send_all(self.server, b'hello', min_rate=1024, grace=1.0)
+        self.assertEqual(self.client.recv(5), b'hello')
+
+class TestConnectionTracker(unittest.TestCase):
+    def test_slow_states(self):
+        tracker = ConnectionTracker(slow_after=0.0)
+        tracker.set('a', 'sending')
+        tracker.set('b', 'reading_headers')
+        tracker.clear('b')
+        tracker.record_drop('slow_send')
+        snap = tracker.snapshot()
+        self.assertEqual(snap['active']['sending'], 1)
+        self.assertEqual(snap['active']['reading_headers'], 0)
+        self.assertEqual(snap['slow']['sending'], 1)
+        self.assertEqual(snap['dropped'], {'slow_send': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from src.webserver.bench import client_context, make_certificate
+from src.webserver.stream import send_file
+from src.webserver.tls import TLSContext
+
+@unittest.skipUnless(shutil.which('openssl'), 'openssl binary not available')
+class TestTLSContext(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cert, self.key = make_certificate(Path(self.tmp.name))
+        self.tls = TLSContext(self.cert, self.key, reload_interval=0)
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        self.client = client_context()
+
+    def tearDown(self):
+        self.listener.close()
+        self.tmp.cleanup()
+
+    def _serve_once(self):
+        def run():
+            raw, _ = self.listener.accept()
+            sock = self.tls.wrap(raw)
+            try:
+                self.tls.handshake(sock, 5)
+                sock.recv(1)
+                sock.sendall(b'ok')
+            finally:
+                sock.close()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def _connect(self, session=None):
+        raw = socket.create_connection(('127.0.0.1', self.port), timeout=5)
+        sock = self.client.wrap_socket(raw, server_hostname='localhost', session=session)
+        sock.sendall(b'x')
+        self.assertEqual(sock.recv(2), b'ok')  # also receives the TLS 1.3 session ticket
+        return sock
+
+    def test_session_resumption(self):
+        thread = self._serve_once()
+        with self._connect() as first:
+            session = first.session
+        thread.join()
+        thread = self._serve_once()
+        with self._connect(session) as second:
+            self.assertTrue(second.session_reused)
+        thread.join()
+        self.assertEqual((self.tls.handshakes, self.tls.resumed), (2, 1))
+
+    def test_reload_keeps_serving(self):
+        mtime = os.stat(self.cert).st_mtime + 5
+        os.utime(self.cert, (mtime, mtime))
+        self.tls.maybe_reload()
+        self.assertEqual(self.tls._mtimes[0], mtime)
+        thread = self._serve_once()
+        self._connect().close()
+        thread.join()
+
+class TestSendFile(unittest.TestCase):
+    def test_send_file(self):
+        server, client = socket.socketpair()
+        data = os.urandom(200000)
+        with tempfile.TemporaryFile() as f, server, client:
+            f.write(data)
+            f.flush()
+            received = []
+            reader = threading.Thread(target=lambda: received.append(b''.join(iter(lambda: client.recv(65536), b''))))
+            reader.start()
+            send_file(server, f, len(data), min_rate=1024, grace=1.0)
+            server.shutdown(socket.SHUT_WR)
+            reader.join()
+        self.assertEqual(received[0], data)
+
+if __name__ == '__main__':
+    unittest.main()
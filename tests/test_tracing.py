@@ -0,0 +1,53 @@
+import threading
+import time
+import unittest
+from src.webserver.handlers import HTTPError
+from src.webserver.http import HTTPRequest
+from src.webserver.routing import Router
+from src.webserver.tracing import RequestTrace, SamplingProfiler, SlowRequestLog, register_admin_routes
+
+class TestTracing(unittest.TestCase):
+    def test_phases_and_slow_log(self):
+        trace = RequestTrace(accepted=10.0)
+        trace.first_byte, trace.headers_parsed, trace.handler_done, trace.last_byte = 10.001, 10.002, 10.050, 10.051
+        self.assertEqual(trace.phases_ms(), {'first_byte': 1.0, 'headers_parsed': 1.0, 'handler_done': 48.0, 'last_byte': 1.0})
+        self.assertIsNone(SlowRequestLog(100).record(trace))
+        log = SlowRequestLog(50)
+        self.assertIsNotNone(log.record(trace))
+        self.assertEqual(len(log.entries()), 1)
+
+    def test_profiler_samples_other_threads(self):
+        stop = threading.Event()
+
+        def busy_loop():
+            while not stop.is_set():
+                sum(range(100))
+        t = threading.Thread(target=busy_loop)
+        t.start()
+        profiler = SamplingProfiler()
+        profiler.start(interval=0.001)
+        time.sleep(0.05)
+        report = profiler.stop()
+        stop.set()
+        t.join()
+        self.assertIn('busy_loop', report)
+
+    def test_admin_routes_are_local_only(self):
+        admin = Router(builtin=False)
+        register_admin_routes(admin, None)
+        remote = HTTPRequest('GET', '/slow', 'HTTP/1.1', {}, client=('10.0.0.5', 1234))
+        with self.assertRaises(HTTPError):
+            admin.dispatch('/slow', request=remote)
+        local = HTTPRequest('GET', '/slow', 'HTTP/1.1', {}, client=('127.0.0.1', 1234))
+        self.assertEqual(admin.dispatch('/slow', request=local), (b'[]', 'application/json'))
+        behind_proxy = HTTPRequest('GET', '/slow', 'HTTP/1.1', {}, client='')  # Unix peer on a public listener
+        for request in (None, HTTPRequest('GET', '/slow', 'HTTP/1.1', {}), behind_proxy):  # unknown peer
+            with self.assertRaises(HTTPError):
+                admin.dispatch('/slow', request=request)
+        for interval in ('fast', '0', '-1', 'nan'):
+            with self.assertRaises(HTTPError) as ctx:
+                admin.dispatch(f'/profile/start?interval={interval}', 'POST', request=local)
+            self.assertEqual(ctx.exception.status, 400)
+
+if __name__ == '__main__':
+    unittest.main()
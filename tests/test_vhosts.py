@@ -0,0 +1,91 @@
+import os
+import socket
+import tempfile
+import unittest
+from src.webserver.cache import LRUCache
+from src.webserver.config import ServerConfig
+from src.webserver.http import HTTPRequest
+from src.webserver.routing import Router
+from src.webserver.server import ServerContext, build_sites, serve_request, share_routes
+from src.webserver.vhosts import VirtualHost, VirtualHostTable, build_site, normalize_host
+
+def site(name, *aliases, root='/tmp'):
+    return build_site([name, *aliases], root, Router(builtin=False), 8, 1024, 1024)
+
+class TestVirtualHostTable(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_host('Example.COM:8080'), 'example.com')
+        self.assertEqual(normalize_host('example.com.'), 'example.com')
+        self.assertEqual(normalize_host('[::1]:8080'), '[::1]')
+        self.assertEqual(normalize_host(None), '')
+
+    def test_lookup(self):
+        default = site('default')
+        table = VirtualHostTable(default)
+        a = table.add(site('a.test', 'www.a.test'))
+        wild = table.add(site('*.b.test'))
+        deeper = table.add(site('*.x.b.test'))
+        self.assertIs(table.lookup('WWW.a.test:80'), a)
+        self.assertIs(table.lookup('one.b.test'), wild)
+        self.assertIs(table.lookup('y.x.b.test'), deeper)
+        self.assertIs(table.lookup('b.test'), default)
+        self.assertIs(table.lookup(None), default)
+        self.assertIsNone(VirtualHostTable().lookup('a.test'))
+        self.assertEqual(len(table.sites()), 4)
+
+class TestVirtualHostServing(unittest.TestCase):
+    def setUp(self):
+        self.roots = []
+        for text in (b'site one', b'site two'):
+            root = tempfile.mkdtemp()
+            with open(os.path.join(root, 'index.txt'), 'wb') as f:
+                f.write(text)
+            self.roots.append(root)
+        self.config = ServerConfig(root=self.roots[0], log_enabled=False)
+
+    def fetch(self, ctx, host):
+        server, client = socket.socketpair()
+        with server, client:
+            request = HTTPRequest('GET', '/index.txt', 'HTTP/1.1', {'host': host, 'connection': 'close'})
+            serve_request(ctx, server, ('127.0.0.1', 1), request)
+            server.shutdown(socket.SHUT_WR)
+            data = b''
+            while chunk := client.recv(65536):
+                data += chunk
+        head, _, body = data.partition(b'\r\n\r\n')
+        return int(head.split()[1]), body
+
+    def test_hosts_have_own_root_and_cache(self):
+        cache = LRUCache(8, 1024)
+        table = VirtualHostTable(VirtualHost('default', self.roots[0], Router(builtin=False), cache))
+        two = table.add(site('two.test', root=self.roots[1]))
+        ctx = ServerContext(self.config, cache, sites=table)
+        self.assertEqual(self.fetch(ctx, 'two.test'), (200, b'site two'))
+        self.assertEqual(self.fetch(ctx, 'other.test'), (200, b'site one'))
+        self.assertEqual((len(two.cache), len(cache)), (1, 1))
+
+    def test_own_routers_share_proxy_and_admin_routes(self):
+        table = VirtualHostTable()
+        own = table.add(site('own.test'))
+        main = Router(builtin=False)
+        pool = main.proxy('/shared-upstream', ['127.0.0.1:9'], health_interval=0)
+        self.addCleanup(pool.close)
+        admin = Router(builtin=False)
+        admin.register('/ping', lambda path, params: (b'pong', 'text/plain'))
+        share_routes(table, main, admin)
+        self.assertIs(own.router.upstreams['/shared-upstream'], pool)
+        self.assertEqual(own.router.dispatch('/_admin/ping'), (b'pong', 'text/plain'))
+
+    def test_default_site_cache_has_budget(self):
+        cache = LRUCache(8, 1024)
+        config = ServerConfig(root=self.roots[0], log_enabled=False, virtual_hosts={'two.test': self.roots[1]},
+                              vhost_cache_bytes=2048)
+        sites = build_sites(config, cache)
+        self.assertEqual([s.cache.max_bytes for s in sites.sites()], [2048, 2048])
+
+    def test_strict_unknown_host(self):
+        ctx = ServerContext(self.config, LRUCache(8, 1024), sites=VirtualHostTable())
+        self.assertEqual(self.fetch(ctx, 'nobody.test')[0], 404)
+
+if __name__ == '__main__':
+    unittest.main()